@@ -1,8 +1,10 @@
-from py2neo import Graph, Node, Relationship
+from py2neo import Node, Relationship
 import uuid
+from cache import bump_version
+from gateway import GraphGateway
 
-# Connect to Neo4j
-graph = Graph("bolt://neo4j:7687", auth=("neo4j", "password"))
+# Connect to Neo4j (configured from NEO4J_* variables)
+graph = GraphGateway()
 
 # Create a new Threat Scenario node with a unique ID
 threat_scenario = Node(
@@ -39,4 +41,7 @@ for technique_id in technique_ids:
     else:
         print(f"Technique with ID {technique_id} not found.")
 
+# Invalidate the API response caches
+bump_version(graph)
+
 print("All relationships processed.")
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Async variants of the read views and create_relationship, used when the
+API is served under ASGI with API_ASYNC_VIEWS enabled. Queries go through
+an AsyncGraphGateway, so a request waiting on Neo4j does not hold a worker
+thread. The response cache, graph version and typeahead index are shared
+with the sync views.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+
+from async_gateway import AsyncGraphGateway
+from cache import etag_matches
+from neighborhood import fetch_neighborhood_async, neighborhood_options
+import pagination
+from pagination import cursor_after, cursor_offset, page_headers, wants_total
+from projection import fetch_node_details_async, parse_fields, project, project_scenario
+from related import fetch_related_async, seed_ids
+from scenarios import count_scenarios_async, iter_scenarios_async, scenario_page_async
+from schema import merge_relationship_query
+from search import VALID_TYPES, count_matches_async, iter_search_async, parse_limit, search_page_async
+from streaming import NDJSON_TYPE
+
+from . import views
+from .views import coverage, graph_version, response_cache, similarity, snapshot, streaming_requested, suggestions
+
+logger = logging.getLogger(__name__)
+
+agraph = AsyncGraphGateway()
+
+
+async def cached_response(request, endpoint, compute):
+    """
+    cached_response() of the sync views, for a coroutine compute().
+    """
+    key = (endpoint, tuple(sorted((k, v) for k, values in request.GET.lists() for v in values)))
+    version = await graph_version.current_async(agraph)
+    etag = response_cache.etag(key, version)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    else:
+        body, headers = await response_cache.fetch_async(key, version, compute)
+        response = HttpResponse(body, content_type='application/json')
+        for name, value in headers.items():
+            response[name] = value
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+async def ndjson_lines_async(records):
+    async for record in records:
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+
+async def current_snapshot():
+    # A rebuild runs py2neo queries, so it is kept off the event loop
+    if not snapshot.enabled:
+        return None
+    version = await graph_version.current_async(agraph)
+    return await sync_to_async(snapshot.get)(views.graph, version)
+
+
+async def iterate(records):
+    for record in records:
+        yield record
+
+
+async def projected(records, fields, projection=project):
+    async for record in records:
+        yield projection(record, fields)
+
+
+def ndjson_response(records):
+    return StreamingHttpResponse(ndjson_lines_async(records), content_type=NDJSON_TYPE)
+
+
+@require_http_methods(["GET"])
+async def get_threat_scenarios(request):
+    try:
+        fields = parse_fields(request.GET.getlist('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    descriptions = 'description' in fields
+
+    if streaming_requested(request):
+        current = await current_snapshot()
+        scenarios = iterate(current.iter_scenarios()) if current else iter_scenarios_async(agraph, descriptions)
+        return ndjson_response(projected(scenarios, fields, project_scenario))
+
+    try:
+        limit = parse_limit(request.GET.get('limit'), pagination.DEFAULT_PAGE_SIZE, pagination.MAX_PAGE_SIZE)
+        after = cursor_after(request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    with_total = wants_total(request.GET.get('total'))
+
+    async def build():
+        current = await current_snapshot()
+        if current:
+            (data, last_id), total = current.scenario_page(after, limit), (current.count_scenarios() if with_total else None)
+        elif with_total:
+            (data, last_id), total = await asyncio.gather(
+                scenario_page_async(agraph, after, limit, descriptions), count_scenarios_async(agraph))
+        else:
+            (data, last_id), total = await scenario_page_async(agraph, after, limit, descriptions), None
+        next_position = {'after': last_id} if last_id else None
+        return [project_scenario(scenario, fields) for scenario in data], page_headers(next_position, total)
+
+    return await cached_response(request, 'threat_scenarios', build)
+
+
+@require_http_methods(["GET"])
+async def search(request):
+    query_param = request.GET.get('query', '').strip()
+    type_list = request.GET.getlist('type', [])
+    if '' in type_list:
+        type_list = []
+
+    invalid_types = [t for t in type_list if t not in VALID_TYPES]
+    if invalid_types:
+        return JsonResponse({'error': f'Invalid types: {", ".join(invalid_types)}'}, status=400)
+
+    try:
+        fields = parse_fields(request.GET.getlist('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    descriptions = 'description' in fields
+
+    if streaming_requested(request):
+        return ndjson_response(projected(iter_search_async(agraph, query_param, type_list, descriptions), fields))
+
+    try:
+        limit = parse_limit(request.GET.get('limit'))
+        offset = cursor_offset(request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    with_total = wants_total(request.GET.get('total'))
+
+    async def build():
+        if with_total:
+            (nodes, next_offset), total = await asyncio.gather(
+                search_page_async(agraph, query_param, type_list, limit, offset, descriptions),
+                count_matches_async(agraph, query_param, type_list))
+        else:
+            (nodes, next_offset), total = await search_page_async(
+                agraph, query_param, type_list, limit, offset, descriptions), None
+        next_position = {'offset': next_offset} if next_offset else None
+        return [project(node, fields) for node in nodes], page_headers(next_position, total)
+
+    return await cached_response(request, 'search', build)
+
+
+@require_http_methods(["GET"])
+async def health(request):
+    status = await agraph.health()
+    return JsonResponse(status, status=200 if status['status'] == 'ok' else 503)
+
+
+@require_http_methods(["GET"])
+async def suggest(request):
+    # Answered from the in-memory index, reloaded through the async driver
+    # when the graph version has moved
+    await suggestions.refresh_async(agraph, await graph_version.current_async(agraph))
+    return views.suggest_response(request)
+
+
+@require_http_methods(["GET"])
+async def get_related_nodes(request):
+    try:
+        node_ids = seed_ids(request.GET.getlist('nodeId'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    async def build():
+        current = await current_snapshot()
+        if current:
+            return current.related(node_ids), {}
+        return await fetch_related_async(agraph, node_ids), {}
+
+    try:
+        return await cached_response(request, 'related_nodes', build)
+    except Exception as e:
+        logger.error(f"Error fetching related nodes for {', '.join(node_ids)}: {e}")
+        return JsonResponse({'error': f"Server error: {e}"}, status=500)
+
+
+@require_http_methods(["GET"])
+async def get_node_details(request):
+    try:
+        node_ids = seed_ids(request.GET.getlist('nodeId'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    async def build():
+        current = await current_snapshot()
+        if current:
+            return current.details(node_ids), {}
+        return await fetch_node_details_async(agraph, node_ids), {}
+
+    return await cached_response(request, 'nodes', build)
+
+
+@require_http_methods(["GET"])
+async def get_neighborhood(request):
+    try:
+        options = neighborhood_options(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    async def build():
+        current = await current_snapshot()
+        subgraph = current.neighborhood(options) if current else await fetch_neighborhood_async(agraph, options)
+        if subgraph is None:
+            raise LookupError(options['node_id'])
+        return subgraph, {}
+
+    try:
+        return await cached_response(request, 'neighborhood', build)
+    except LookupError:
+        return JsonResponse({'error': 'Node not found'}, status=404)
+
+
+@require_http_methods(["POST"])
+async def create_relationship(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+    source_id, target_id, relationship_type = data.get('sourceId'), data.get('targetId'), data.get('relationship')
+    if not source_id or not target_id or not relationship_type:
+        return JsonResponse({'error': 'sourceId, targetId, and relationship are required'}, status=400)
+
+    # Lookup and merge in one round trip; no row means an endpoint is missing
+    query, parameters = merge_relationship_query(source_id, relationship_type, target_id)
+    created = await agraph.evaluate(query, parameters)
+    if created is None:
+        return JsonResponse({'error': 'Source or target node not found'}, status=404)
+    if not created:
+        return JsonResponse({'message': f'Relationship {relationship_type} already exists between {source_id} and {target_id}', 'created': False}, status=200)
+
+    version = await graph_version.bump_async(agraph)
+    suggestions.add_relationship(source_id, relationship_type, target_id, version=version)
+    coverage.add_relationship(source_id, relationship_type, target_id, version=version)
+    similarity.add_relationship(source_id, relationship_type, target_id, version=version)
+    snapshot.add_relationships([(source_id, relationship_type, target_id)], version=version)
+    return JsonResponse({'message': f'Relationship {relationship_type} created between {source_id} and {target_id}', 'created': True}, status=201)
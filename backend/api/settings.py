@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -72,6 +73,13 @@ WSGI_APPLICATION = 'api.wsgi.application'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Let the frontend read the caching and paging headers
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Next-Cursor', 'X-Total-Count']
+
+# Serve the read endpoints and create_relationship with the async views
+# (api/async_views.py); only useful when running under an ASGI server
+ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
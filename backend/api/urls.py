@@ -1,10 +1,27 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under ASGI the read endpoints and create_relationship can run as
+# coroutines; everything else stays sync either way
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
-    path('api/threat_scenarios', views.get_threat_scenarios, name='get_threat_scenarios'),
-    path('api/search', views.search, name='search'),
+    path('api/threat_scenarios', read_views.get_threat_scenarios, name='get_threat_scenarios'),
+    path('api/search', read_views.search, name='search'),
+    path('api/suggest', read_views.suggest, name='suggest'),
+    path('api/export', views.export_graph, name='export_graph'),
+    path('api/health', read_views.health, name='health'),
     path('api/threat_scenarios', views.create_threat_scenario, name='create_threat_scenario'),
-    path('api/create_relationship', views.create_relationship, name='create_relationship'),
-    path('api/related_nodes', views.get_related_nodes, name='get_related_nodes'),
-]
\ No newline at end of file
+    path('api/threat_scenarios/bulk', views.create_threat_scenario_bulk, name='create_threat_scenario_bulk'),
+    path('api/create_relationship', read_views.create_relationship, name='create_relationship'),
+    path('api/related_nodes', read_views.get_related_nodes, name='get_related_nodes'),
+    path('api/nodes', read_views.get_node_details, name='get_node_details'),
+    path('api/neighborhood', read_views.get_neighborhood, name='get_neighborhood'),
+    path('api/coverage', views.get_coverage, name='get_coverage'),
+    path('api/paths', views.get_paths, name='get_paths'),
+    path('api/similar_scenarios', views.get_similar_scenarios, name='get_similar_scenarios'),
+]
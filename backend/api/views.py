@@ -1,37 +1,124 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from py2neo import Graph, Node, Relationship
+from py2neo import Node
+import json
+import logging
 import uuid
+from gateway import GraphGateway
+from cache import GraphVersion, ResponseCache, etag_matches
+from coverage import CoverageMatrix
+import pagination
+from pagination import cursor_after, cursor_offset, page_headers, wants_total
+from paths import PathSearch, find_paths, path_options
+from projection import fetch_node_details, parse_fields, project, project_scenario
+from scenarios import count_scenarios, create_scenario, iter_scenarios, parse_targets, scenario_page
+from schema import merge_relationship_query
+from search import VALID_TYPES, count_matches, iter_search, parse_limit, search_page
+from similarity import SimilarityIndex, similarity_options
+from snapshot import SnapshotEngine
+from streaming import NDJSON_TYPE, iter_graph_export, ndjson_lines, wants_ndjson
+from neighborhood import fetch_neighborhood, neighborhood_options
+from related import fetch_related, seed_ids
+import typeahead
+from typeahead import TypeaheadIndex
+
+logger = logging.getLogger(__name__)
+
+# Connect to Neo4j through the shared pooled gateway (configured from NEO4J_* variables)
+graph = GraphGateway()
+try:
+    graph.warm()
+except Exception as e:
+    logger.warning(f"Could not connect to Neo4j: {e}")
+
+# Read responses are cached per graph version; writes advance the version
+graph_version = GraphVersion(graph)
+response_cache = ResponseCache()
+
+# In-memory typeahead index for /api/suggest, filled at startup, updated by
+# writes and reloaded when the graph version moves
+suggestions = TypeaheadIndex()
+try:
+    suggestions.load(graph, graph_version.current())
+except Exception as e:
+    logger.warning(f"Could not load typeahead index: {e}")
+
+# Scenario x tactic coverage, loaded on first use and updated by writes
+coverage = CoverageMatrix()
+
+# Technique-set bitsets per scenario for similar-scenario search, kept like coverage
+similarity = SimilarityIndex()
+
+# Optional in-memory read engine (GRAPH_SNAPSHOT=true); reads fall back to Cypher without it
+snapshot = SnapshotEngine()
+
+def current_snapshot():
+    return snapshot.get(graph, graph_version.current())
+
+def cached_response(request, endpoint, compute):
+    """
+    Serves the (data, headers) returned by compute() through the response
+    cache. A client that sends the ETag of the current graph version gets
+    a 304.
+    """
+    key = (endpoint, tuple(sorted((k, v) for k, values in request.GET.lists() for v in values)))
+    version = graph_version.current()
+    etag = response_cache.etag(key, version)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    else:
+        body, headers = response_cache.fetch(key, version, compute)
+        response = HttpResponse(body, content_type='application/json')
+        for name, value in headers.items():
+            response[name] = value
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def ndjson_response(records):
+    """
+    Streams records as newline-delimited JSON while the Cypher cursor is
+    still being read, instead of building the whole body first.
+    """
+    return StreamingHttpResponse(ndjson_lines(records), content_type=NDJSON_TYPE)
 
-# Connect to Neo4j
-graph = Graph("bolt://neo4j:7687", auth=("neo4j", "password"))
+def streaming_requested(request):
+    return wants_ndjson(request.headers.get('Accept'), request.GET.get('format'))
 
 @require_http_methods(["GET"])
 def get_threat_scenarios(request):
-    query = """
-    MATCH (ts:ThreatScenario)-[:USES_TECHNIQUE]->(t:Technique)
-    RETURN ts, collect(t) as techniques
-    """
-    results = graph.run(query).data()
-    data = []
-    for record in results:
-        ts_node = record['ts']
-        ts = {
-            'id': ts_node['id'],
-            'name': ts_node['name'],
-            'description': ts_node.get('description', ''),
-            'techniques': []
-        }
-        for technique_node in record['techniques']:
-            technique = {
-                'id': technique_node['id'],
-                'name': technique_node['name'],
-                'description': technique_node.get('description', ''),
-                'external_id': technique_node.get('external_id', '')
-            }
-            ts['techniques'].append(technique)
-        data.append(ts)
-    return JsonResponse(data, safe=False)
+    try:
+        fields = parse_fields(request.GET.getlist('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    descriptions = 'description' in fields
+
+    # Streaming mode returns every scenario, so paging does not apply
+    if streaming_requested(request):
+        current = current_snapshot()
+        scenarios = current.iter_scenarios() if current else iter_scenarios(graph, descriptions)
+        return ndjson_response(project_scenario(scenario, fields) for scenario in scenarios)
+
+    try:
+        limit = parse_limit(request.GET.get('limit'), pagination.DEFAULT_PAGE_SIZE, pagination.MAX_PAGE_SIZE)
+        after = cursor_after(request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    with_total = wants_total(request.GET.get('total'))
+
+    # One page of scenarios, ordered by id; the next cursor goes in a header
+    def build():
+        current = current_snapshot()
+        if current:
+            data, last_id = current.scenario_page(after, limit)
+            total = current.count_scenarios() if with_total else None
+        else:
+            data, last_id = scenario_page(graph, after, limit, descriptions)
+            total = count_scenarios(graph) if with_total else None
+        next_position = {'after': last_id} if last_id else None
+        return [project_scenario(scenario, fields) for scenario in data], page_headers(next_position, total)
+
+    return cached_response(request, 'threat_scenarios', build)
 
 @require_http_methods(["GET"])
 def search(request):
@@ -40,111 +127,226 @@ def search(request):
     if '' in type_list:
         type_list = []
 
-    valid_types = [
-        'ThreatScenario', 'Technique', 'SubTechnique', 'Campaign', 
-        'Tool', 'Tactic', 'DataSource', 'DataComponent', 'Mitigation'
-    ]
-    invalid_types = [t for t in type_list if t not in valid_types]
+    invalid_types = [t for t in type_list if t not in VALID_TYPES]
     if invalid_types:
         return JsonResponse({'error': f'Invalid types: {", ".join(invalid_types)}'}, status=400)
 
-    cypher_query = """
-        MATCH (n)
-        WHERE ANY(label IN labels(n) WHERE label IN $types)
-        AND toLower(n.name) CONTAINS toLower($searchTerm)
-        RETURN n.id AS id, n.name AS name, labels(n) AS labels
-    """ if type_list else """
-        MATCH (n)
-        WHERE toLower(n.name) CONTAINS toLower($searchTerm)
-        RETURN n.id AS id, n.name AS name, labels(n) AS labels
-    """
-    params = {'types': type_list, 'searchTerm': query_param}
-    results = graph.run(cypher_query, params).data()
-    nodes = [{'id': record['id'], 'name': record['name'], 'labels': list(record['labels'])} for record in results]
-    return JsonResponse(nodes, safe=False)
+    try:
+        fields = parse_fields(request.GET.getlist('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    descriptions = 'description' in fields
+
+    if streaming_requested(request):
+        nodes = iter_search(graph, query_param, type_list, descriptions)
+        return ndjson_response(project(node, fields) for node in nodes)
+
+    try:
+        limit = parse_limit(request.GET.get('limit'))
+        offset = cursor_offset(request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    with_total = wants_total(request.GET.get('total'))
+
+    def build():
+        nodes, next_offset = search_page(graph, query_param, type_list, limit, offset, descriptions)
+        next_position = {'offset': next_offset} if next_offset else None
+        total = count_matches(graph, query_param, type_list) if with_total else None
+        return [project(node, fields) for node in nodes], page_headers(next_position, total)
+
+    return cached_response(request, 'search', build)
+
+@require_http_methods(["GET"])
+def health(request):
+    status = graph.health()
+    return JsonResponse(status, status=200 if status['status'] == 'ok' else 503)
+
+@require_http_methods(["GET"])
+def export_graph(request):
+    # Whole-graph export, always streamed as NDJSON
+    return ndjson_response(iter_graph_export(graph))
+
+@require_http_methods(["GET"])
+def suggest(request):
+    suggestions.refresh(graph, graph_version.current())
+    return suggest_response(request)
+
+def suggest_response(request):
+    query_param = request.GET.get('query', '')
+    type_list = [t for t in request.GET.getlist('type', []) if t]
+    invalid_types = [t for t in type_list if t not in VALID_TYPES]
+    if invalid_types:
+        return JsonResponse({'error': f'Invalid types: {", ".join(invalid_types)}'}, status=400)
+
+    try:
+        limit = parse_limit(request.GET.get('limit'), typeahead.DEFAULT_LIMIT, typeahead.MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a positive integer'}, status=400)
+
+    # Answered from memory; the index only goes back to the graph after a load
+    return JsonResponse(suggestions.suggest(query_param, type_list, limit), safe=False)
 
 @require_http_methods(["POST"])
 def create_threat_scenario(request):
-    data = request.json
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
     name = data.get('name')
     description = data.get('description', '')
     threat_id = str(uuid.uuid4())
     ts_node = Node("ThreatScenario", id=threat_id, name=name, description=description)
     graph.create(ts_node)
+    version = graph_version.bump()
+    suggestions.add(threat_id, name, labels=['ThreatScenario'], version=version)
+    coverage.add_scenario(threat_id, name, version=version)
+    similarity.add_scenario(threat_id, name, version=version)
+    snapshot.add_node(threat_id, ['ThreatScenario'], name, description, version=version)
     return JsonResponse({'id': threat_id, 'name': name, 'description': description}, status=201)
 
+@require_http_methods(["POST"])
+def create_threat_scenario_bulk(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+    name = data.get('name')
+    description = data.get('description', '')
+    if not name:
+        return JsonResponse({'error': 'name is required'}, status=400)
+    try:
+        targets = parse_targets(data)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Scenario and relationships are written in one transaction
+    result = create_scenario(graph, name, description, targets)
+    version = graph_version.bump()
+    suggestions.add(result['id'], name, labels=['ThreatScenario'], version=version)
+    techniques = [c['id'] for c in result['created'] if c['relationship'] == 'USES_TECHNIQUE']
+    coverage.add_scenario(result['id'], name, techniques, version=version)
+    similarity.add_scenario(result['id'], name, techniques, version=version)
+    snapshot.add_node(result['id'], ['ThreatScenario'], name, description)
+    snapshot.add_relationships([(result['id'], c['relationship'], c['id']) for c in result['created']], version=version)
+    return JsonResponse(result, status=201)
+
 @require_http_methods(["POST"])
 def create_relationship(request):
-    data = request.json
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
     source_id, target_id, relationship_type = data.get('sourceId'), data.get('targetId'), data.get('relationship')
     if not source_id or not target_id or not relationship_type:
         return JsonResponse({'error': 'sourceId, targetId, and relationship are required'}, status=400)
 
-    source_node = graph.nodes.match(id=source_id).first()
-    target_node = graph.nodes.match(id=target_id).first()
-    if not source_node or not target_node:
+    # Merged on (source, type, target): a retry or double submit finds the existing edge
+    query, parameters = merge_relationship_query(source_id, relationship_type, target_id)
+    created = graph.run(query, parameters).evaluate()
+    if created is None:
         return JsonResponse({'error': 'Source or target node not found'}, status=404)
+    if not created:
+        return JsonResponse({'message': f'Relationship {relationship_type} already exists between {source_id} and {target_id}', 'created': False}, status=200)
 
-    relationship = Relationship(source_node, relationship_type, target_node)
-    graph.create(relationship)
-    return JsonResponse({'message': f'Relationship {relationship_type} created between {source_id} and {target_id}'}, status=201)
+    version = graph_version.bump()
+    suggestions.add_relationship(source_id, relationship_type, target_id, version=version)
+    coverage.add_relationship(source_id, relationship_type, target_id, version=version)
+    similarity.add_relationship(source_id, relationship_type, target_id, version=version)
+    snapshot.add_relationships([(source_id, relationship_type, target_id)], version=version)
+    return JsonResponse({'message': f'Relationship {relationship_type} created between {source_id} and {target_id}', 'created': True}, status=201)
 
-import logging
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+@require_http_methods(["GET"])
+def get_related_nodes(request):
+    # One or many seeds (repeated or comma-separated nodeId), one query
+    try:
+        node_ids = seed_ids(request.GET.getlist('nodeId'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-logger = logging.getLogger(__name__)
+    def build():
+        current = current_snapshot()
+        return (current.related(node_ids) if current else fetch_related(graph, node_ids)), {}
 
-import logging
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+    try:
+        return cached_response(request, 'related_nodes', build)
 
-logger = logging.getLogger(__name__)
+    except Exception as e:
+        logger.error(f"Error fetching related nodes for {', '.join(node_ids)}: {e}")
+        return JsonResponse({'error': f"Server error: {e}"}, status=500)
 
 @require_http_methods(["GET"])
-def get_related_nodes(request):
-    node_id = request.GET.get('nodeId', '')
-    if not node_id:
-        return JsonResponse({'error': 'nodeId parameter is required'}, status=400)
-
-    cypher_query = """
-    MATCH (n {id: $nodeId})-[r]->(m)
-    RETURN m, type(r) as relationship
-    UNION
-    MATCH (m)-[r]->(n {id: $nodeId})
-    RETURN m, type(r) as relationship
-    """
-    
-    try:
-        results = graph.run(cypher_query, nodeId=node_id).data()
-        
-        # Prepare nodes and links, with error handling for missing fields
-        nodes = []
-        for record in results:
-            try:
-                labels = list(record['m'].labels)  # Convert labels to a list to avoid subscript issues
-                node_data = {
-                    'id': record['m']['id'],
-                    'name': record['m']['name'],
-                    'group': labels[0] if labels else 'default',  # Use first label as group if available
-                    'labels': labels
-                }
-                nodes.append(node_data)
-            except KeyError as e:
-                logger.error(f"Missing expected field in node data: {e}")
-                continue  # Skip this record if fields are missing
-
-        links = [
-            {
-                'source': node_id,
-                'target': record['m']['id'],
-                'relationship': record['relationship']
-            }
-            for record in results
-        ]
-
-        return JsonResponse({'nodes': nodes, 'links': links}, safe=False)
+def get_node_details(request):
+    # Full details, descriptions included, for the nodes a client opens
+    try:
+        node_ids = seed_ids(request.GET.getlist('nodeId'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    except Exception as e:
-        logger.error(f"Error fetching related nodes for node ID {node_id}: {e}")
-        return JsonResponse({'error': f"Server error: {e}"}, status=500)
\ No newline at end of file
+    def build():
+        current = current_snapshot()
+        return (current.details(node_ids) if current else fetch_node_details(graph, node_ids)), {}
+
+    return cached_response(request, 'nodes', build)
+
+@require_http_methods(["GET"])
+def get_neighborhood(request):
+    try:
+        options = neighborhood_options(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Several hops in one bounded traversal, with the real link directions
+    def build():
+        current = current_snapshot()
+        subgraph = current.neighborhood(options) if current else fetch_neighborhood(graph, options)
+        if subgraph is None:
+            raise LookupError(options['node_id'])
+        return subgraph, {}
+
+    try:
+        return cached_response(request, 'neighborhood', build)
+    except LookupError:
+        return JsonResponse({'error': 'Node not found'}, status=404)
+
+@require_http_methods(["GET"])
+def get_paths(request):
+    try:
+        options = path_options(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # k shortest paths within the time budget, in memory when the snapshot is on
+    current = current_snapshot()
+    result = PathSearch(current, options).run() if current else find_paths(graph, options)
+    if result is None:
+        return JsonResponse({'error': 'Source or target node not found'}, status=404)
+    return JsonResponse(result)
+
+@require_http_methods(["GET"])
+def get_coverage(request):
+    # Served from the materialized matrix; reloaded only after outside writes
+    def build():
+        coverage.refresh(graph, graph_version.current())
+        return coverage.matrix(), {}
+
+    return cached_response(request, 'coverage', build)
+
+@require_http_methods(["GET"])
+def get_similar_scenarios(request):
+    try:
+        options = similarity_options(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Top-k by technique overlap, scored over in-memory bitsets
+    def build():
+        similarity.refresh(graph, graph_version.current())
+        result = similarity.similar(options)
+        if result is None:
+            raise LookupError(options['scenario_id'])
+        return result, {}
+
+    try:
+        return cached_response(request, 'similar_scenarios', build)
+    except LookupError:
+        return JsonResponse({'error': 'Threat scenario not found'}, status=404)
@@ -1,40 +1,122 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from py2neo import Graph, Node, Relationship
+from py2neo import Node
 import uuid
+from gateway import GraphGateway
+from cache import GraphVersion, ResponseCache, etag_matches
+from coverage import CoverageMatrix
+import pagination
+from pagination import EXPOSED_HEADERS, cursor_after, cursor_offset, page_headers, wants_total
+from paths import PathSearch, find_paths, path_options
+from projection import fetch_node_details, parse_fields, project, project_scenario
+from scenarios import count_scenarios, create_scenario, iter_scenarios, parse_targets, scenario_page
+from schema import merge_relationship_query
+from search import VALID_TYPES, count_matches, iter_search, parse_limit, search_page
+from similarity import SimilarityIndex, similarity_options
+from snapshot import SnapshotEngine
+from streaming import NDJSON_TYPE, iter_graph_export, ndjson_lines, wants_ndjson
+from neighborhood import fetch_neighborhood, neighborhood_options
+from related import fetch_related, seed_ids
+import typeahead
+from typeahead import TypeaheadIndex
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=EXPOSED_HEADERS)
 
-# Connect to Neo4j
-graph = Graph("bolt://neo4j:7687", auth=("neo4j", "password"))
+# Connect to Neo4j through the shared pooled gateway (configured from NEO4J_* variables)
+graph = GraphGateway()
+try:
+    graph.warm()
+except Exception as e:
+    app.logger.warning(f"Could not connect to Neo4j: {e}")
+
+# Read responses are cached per graph version; writes advance the version
+graph_version = GraphVersion(graph)
+response_cache = ResponseCache()
+
+# In-memory typeahead index for /api/suggest, filled at startup, updated by
+# writes and reloaded when the graph version moves
+suggestions = TypeaheadIndex()
+try:
+    suggestions.load(graph, graph_version.current())
+except Exception as e:
+    app.logger.warning(f"Could not load typeahead index: {e}")
+
+# Scenario x tactic coverage, loaded on first use and updated by writes
+coverage = CoverageMatrix()
+
+# Technique-set bitsets per scenario for similar-scenario search, kept like coverage
+similarity = SimilarityIndex()
+
+# Optional in-memory read engine (GRAPH_SNAPSHOT=true); reads fall back to Cypher without it
+snapshot = SnapshotEngine()
+
+def current_snapshot():
+    return snapshot.get(graph, graph_version.current())
+
+def cached_response(endpoint, compute):
+    """
+    Serves the (data, headers) returned by compute() through the response
+    cache. A client that sends the ETag of the current graph version gets
+    a 304.
+    """
+    key = (endpoint, tuple(sorted(request.args.items(multi=True))))
+    version = graph_version.current()
+    etag = response_cache.etag(key, version)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = Response(status=304)
+    else:
+        body, headers = response_cache.fetch(key, version, compute)
+        response = Response(body, mimetype='application/json')
+        response.headers.update(headers)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def ndjson_response(records):
+    """
+    Streams records as newline-delimited JSON while the Cypher cursor is
+    still being read, instead of building the whole body first.
+    """
+    return Response(ndjson_lines(records), mimetype=NDJSON_TYPE)
+
+def streaming_requested():
+    return wants_ndjson(request.headers.get('Accept'), request.args.get('format'))
 
 @app.route('/api/threat_scenarios', methods=['GET'])
 def get_threat_scenarios():
-    query = """
-    MATCH (ts:ThreatScenario)-[:USES_TECHNIQUE]->(t:Technique)
-    RETURN ts, collect(t) as techniques
-    """
-    results = graph.run(query).data()
-    data = []
-    for record in results:
-        ts_node = record['ts']
-        ts = {
-            'id': ts_node['id'],
-            'name': ts_node['name'],
-            'description': ts_node.get('description', ''),
-            'techniques': []
-        }
-        for technique_node in record['techniques']:
-            technique = {
-                'id': technique_node['id'],
-                'name': technique_node['name'],
-                'description': technique_node.get('description', ''),
-                'external_id': technique_node.get('external_id', '')
-            }
-            ts['techniques'].append(technique)
-        data.append(ts)
-    return jsonify(data)
+    try:
+        fields = parse_fields(request.args.getlist('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    descriptions = 'description' in fields
+
+    # Streaming mode returns every scenario, so paging does not apply
+    if streaming_requested():
+        current = current_snapshot()
+        scenarios = current.iter_scenarios() if current else iter_scenarios(graph, descriptions)
+        return ndjson_response(project_scenario(scenario, fields) for scenario in scenarios)
+
+    try:
+        limit = parse_limit(request.args.get('limit'), pagination.DEFAULT_PAGE_SIZE, pagination.MAX_PAGE_SIZE)
+        after = cursor_after(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with_total = wants_total(request.args.get('total'))
+
+    # One page of scenarios, ordered by id; the next cursor goes in a header
+    def build():
+        current = current_snapshot()
+        if current:
+            data, last_id = current.scenario_page(after, limit)
+            total = current.count_scenarios() if with_total else None
+        else:
+            data, last_id = scenario_page(graph, after, limit, descriptions)
+            total = count_scenarios(graph) if with_total else None
+        next_position = {'after': last_id} if last_id else None
+        return [project_scenario(scenario, fields) for scenario in data], page_headers(next_position, total)
+
+    return cached_response('threat_scenarios', build)
 
 @app.route('/api/search', methods=['GET'])
 def search():
@@ -53,67 +135,73 @@ def search():
         if '' in type_list:
             type_list = []  # Empty list signifies no type filtering
 
-        # Define valid types to prevent invalid queries
-        valid_types = [
-            'ThreatScenario',
-            'Technique',
-            'SubTechnique',
-            'Campaign',
-            'Tool',
-            'Tactic',
-            'DataSource',
-            'DataComponent',
-            'Mitigation'
-        ]
-        invalid_types = [t for t in type_list if t not in valid_types]
+        invalid_types = [t for t in type_list if t not in VALID_TYPES]
 
         # If there are invalid types, return a 400 error
         if invalid_types:
             app.logger.warning(f"Invalid types received: {invalid_types}")
             return jsonify({'error': f'Invalid types: {", ".join(invalid_types)}'}), 400
 
-        # Define the Cypher query with case-insensitive and partial matching
-        if type_list:
-            # Apply type filtering
-            cypher_query = """
-                MATCH (n)
-                WHERE ANY(label IN labels(n) WHERE label IN $types)
-                AND toLower(n.name) CONTAINS toLower($searchTerm)
-                RETURN n.id AS id, n.name AS name, labels(n) AS labels
-            """
-            params = {
-                'types': type_list,
-                'searchTerm': query_param
-            }
-        else:
-            # No type filtering
-            cypher_query = """
-                MATCH (n)
-                WHERE toLower(n.name) CONTAINS toLower($searchTerm)
-                RETURN n.id AS id, n.name AS name, labels(n) AS labels
-            """
-            params = {
-                'searchTerm': query_param
-            }
-
-        # Execute the Cypher query
-        result = graph.run(cypher_query, params)
-        nodes = []
-        for record in result:
-            node = {
-                'id': record['id'],
-                'name': record['name'],
-                'labels': list(record['labels'])
-            }
-            nodes.append(node)
-        app.logger.info(f"Found {len(nodes)} matching nodes.")
-        return jsonify(nodes), 200
+        try:
+            fields = parse_fields(request.args.getlist('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        descriptions = 'description' in fields
+
+        if streaming_requested():
+            nodes = iter_search(graph, query_param, type_list, descriptions)
+            return ndjson_response(project(node, fields) for node in nodes)
+
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            offset = cursor_offset(request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        with_total = wants_total(request.args.get('total'))
+
+        # Ranked lookup through the full-text index
+        def build():
+            nodes, next_offset = search_page(graph, query_param, type_list, limit, offset, descriptions)
+            app.logger.info(f"Found {len(nodes)} matching nodes.")
+            next_position = {'offset': next_offset} if next_offset else None
+            total = count_matches(graph, query_param, type_list) if with_total else None
+            return [project(node, fields) for node in nodes], page_headers(next_position, total)
+
+        return cached_response('search', build)
 
     except Exception as e:
         # Log the full exception traceback for easier debugging
         app.logger.exception("Error in /api/search:")
         return jsonify({'error': 'Internal server error.'}), 500
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    status = graph.health()
+    return jsonify(status), 200 if status['status'] == 'ok' else 503
+
+@app.route('/api/export', methods=['GET'])
+def export_graph():
+    # Whole-graph export, always streamed as NDJSON
+    return ndjson_response(iter_graph_export(graph))
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    query_param = request.args.get('query', '')
+    type_list = [t for t in request.args.getlist('type') if t]
+
+    invalid_types = [t for t in type_list if t not in VALID_TYPES]
+    if invalid_types:
+        return jsonify({'error': f'Invalid types: {", ".join(invalid_types)}'}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'), typeahead.DEFAULT_LIMIT, typeahead.MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+
+    # Answered from memory; the index only goes back to the graph after a load
+    suggestions.refresh(graph, graph_version.current())
+    return jsonify(suggestions.suggest(query_param, type_list, limit)), 200
+
 @app.route('/api/threat_scenarios', methods=['POST'])
 def create_threat_scenario():
     data = request.get_json()
@@ -123,9 +211,38 @@ def create_threat_scenario():
 
     ts_node = Node("ThreatScenario", id=threat_id, name=name, description=description)
     graph.create(ts_node)
+    version = graph_version.bump()
+    suggestions.add(threat_id, name, labels=['ThreatScenario'], version=version)
+    coverage.add_scenario(threat_id, name, version=version)
+    similarity.add_scenario(threat_id, name, version=version)
+    snapshot.add_node(threat_id, ['ThreatScenario'], name, description, version=version)
 
     return jsonify({'id': threat_id, 'name': name, 'description': description}), 201
 
+@app.route('/api/threat_scenarios/bulk', methods=['POST'])
+def create_threat_scenario_bulk():
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    description = data.get('description', '')
+    if not name:
+        return jsonify({'error': 'name is required'}), 400
+    try:
+        targets = parse_targets(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Scenario and relationships are written in one transaction
+    result = create_scenario(graph, name, description, targets)
+    version = graph_version.bump()
+    suggestions.add(result['id'], name, labels=['ThreatScenario'], version=version)
+    techniques = [c['id'] for c in result['created'] if c['relationship'] == 'USES_TECHNIQUE']
+    coverage.add_scenario(result['id'], name, techniques, version=version)
+    similarity.add_scenario(result['id'], name, techniques, version=version)
+    snapshot.add_node(result['id'], ['ThreatScenario'], name, description)
+    snapshot.add_relationships([(result['id'], c['relationship'], c['id']) for c in result['created']], version=version)
+
+    return jsonify(result), 201
+
 @app.route('/api/create_relationship', methods=['POST'])
 def create_relationship():
     data = request.get_json()
@@ -136,58 +253,114 @@ def create_relationship():
     if not source_id or not target_id or not relationship_type:
         return jsonify({'error': 'sourceId, targetId, and relationship are required'}), 400
 
-    # Fetch the source and target nodes
-    source_node = graph.nodes.match("ThreatScenario", id=source_id).first()
-    if not source_node:
-        source_node = graph.nodes.match(id=source_id).first()
-    target_node = graph.nodes.match(id=target_id).first()
+    # Merged on (source, type, target): a retry or double submit finds the existing edge
+    query, parameters = merge_relationship_query(source_id, relationship_type, target_id)
+    created = graph.run(query, parameters).evaluate()
 
-    if not source_node or not target_node:
+    if created is None:
         return jsonify({'error': 'Source or target node not found'}), 404
+    if not created:
+        return jsonify({'message': f'Relationship {relationship_type} already exists between {source_id} and {target_id}', 'created': False}), 200
 
-    # Create the relationship
-    relationship = Relationship(source_node, relationship_type, target_node)
-    graph.create(relationship)
+    version = graph_version.bump()
+    suggestions.add_relationship(source_id, relationship_type, target_id, version=version)
+    coverage.add_relationship(source_id, relationship_type, target_id, version=version)
+    similarity.add_relationship(source_id, relationship_type, target_id, version=version)
+    snapshot.add_relationships([(source_id, relationship_type, target_id)], version=version)
 
-    return jsonify({'message': f'Relationship {relationship_type} created between {source_id} and {target_id}'}), 201
+    return jsonify({'message': f'Relationship {relationship_type} created between {source_id} and {target_id}', 'created': True}), 201
 
 
 @app.route('/api/related_nodes', methods=['GET'])
 def get_related_nodes():
-    node_id = request.args.get('nodeId', '')
-    if not node_id:
-        return jsonify({'error': 'nodeId parameter is required'}), 400
-
-    # Fetch related nodes and their relationships
-    cypher_query = """
-    MATCH (n {id: $nodeId})-[r]->(m)
-    RETURN m, type(r) as relationship
-    UNION
-    MATCH (m)-[r]->(n {id: $nodeId})
-    RETURN m, type(r) as relationship
-    """
+    # One or many seeds (repeated or comma-separated nodeId), one query
+    try:
+        node_ids = seed_ids(request.args.getlist('nodeId'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    results = graph.run(cypher_query, nodeId=node_id).data()
+    def build():
+        current = current_snapshot()
+        return (current.related(node_ids) if current else fetch_related(graph, node_ids)), {}
 
-    related_nodes = []
-    related_links = []
+    return cached_response('related_nodes', build)
 
-    for record in results:
-        related_node = record['m']
-        relationship = record['relationship']
-        related_nodes.append({
-            'id': related_node['id'],
-            'name': related_node['name'],
-            'labels': list(related_node.labels)
-        })
-        # Add link from original node to related node with relationship type
-        related_links.append({
-            'source': node_id,
-            'target': related_node['id'],
-            'relationship': relationship
-        })
+@app.route('/api/nodes', methods=['GET'])
+def get_node_details():
+    # Full details, descriptions included, for the nodes a client opens
+    try:
+        node_ids = seed_ids(request.args.getlist('nodeId'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    return jsonify({'nodes': related_nodes, 'links': related_links}), 200
+    def build():
+        current = current_snapshot()
+        return (current.details(node_ids) if current else fetch_node_details(graph, node_ids)), {}
+
+    return cached_response('nodes', build)
+
+@app.route('/api/neighborhood', methods=['GET'])
+def get_neighborhood():
+    try:
+        options = neighborhood_options(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Several hops in one bounded traversal, with the real link directions
+    def build():
+        current = current_snapshot()
+        subgraph = current.neighborhood(options) if current else fetch_neighborhood(graph, options)
+        if subgraph is None:
+            raise LookupError(options['node_id'])
+        return subgraph, {}
+
+    try:
+        return cached_response('neighborhood', build)
+    except LookupError:
+        return jsonify({'error': 'Node not found'}), 404
+
+@app.route('/api/paths', methods=['GET'])
+def get_paths():
+    try:
+        options = path_options(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # k shortest paths within the time budget, in memory when the snapshot is on
+    current = current_snapshot()
+    result = PathSearch(current, options).run() if current else find_paths(graph, options)
+    if result is None:
+        return jsonify({'error': 'Source or target node not found'}), 404
+    return jsonify(result), 200
+
+@app.route('/api/coverage', methods=['GET'])
+def get_coverage():
+    # Served from the materialized matrix; reloaded only after outside writes
+    def build():
+        coverage.refresh(graph, graph_version.current())
+        return coverage.matrix(), {}
+
+    return cached_response('coverage', build)
+
+@app.route('/api/similar_scenarios', methods=['GET'])
+def get_similar_scenarios():
+    try:
+        options = similarity_options(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Top-k by technique overlap, scored over in-memory bitsets
+    def build():
+        similarity.refresh(graph, graph_version.current())
+        result = similarity.similar(options)
+        if result is None:
+            raise LookupError(options['scenario_id'])
+        return result, {}
+
+    try:
+        return cached_response('similar_scenarios', build)
+    except LookupError:
+        return jsonify({'error': 'Threat scenario not found'}), 404
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,107 @@
+"""
+Async counterpart of gateway.GraphGateway for the ASGI views.
+
+py2neo has no asyncio support, so this wraps the official neo4j driver's
+AsyncDriver. It reads the same NEO4J_* configuration, and because that
+driver sends transaction timeouts over Bolt, Neo4j itself stops a query at
+NEO4J_QUERY_TIMEOUT. Records are neo4j.Record objects, which support the
+same record['key'] / node['property'] / node.labels access as py2neo, so
+the shared row-to-dict helpers work with either client.
+"""
+import asyncio
+import logging
+
+from neo4j import AsyncGraphDatabase, Query
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+import gateway
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+
+class AsyncGraphGateway:
+    """
+    Pooled async access to Neo4j with per-query timeouts and retries.
+    One instance is shared by all requests of an ASGI process; many
+    queries can be in flight on it at once.
+    """
+
+    def __init__(self, uri=None, auth=None, pool_size=None, query_timeout=None,
+                 max_retries=None, retry_backoff=None):
+        self.uri = uri or gateway.NEO4J_URI
+        self.auth = auth or gateway.NEO4J_AUTH
+        self.pool_size = pool_size or gateway.POOL_SIZE
+        self.query_timeout = gateway.QUERY_TIMEOUT if query_timeout is None else query_timeout
+        self.max_retries = gateway.MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = gateway.RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self._driver = None
+
+    @property
+    def driver(self):
+        # Created lazily: the driver binds to the running event loop
+        if self._driver is None:
+            self._driver = AsyncGraphDatabase.driver(self.uri, auth=self.auth, max_connection_pool_size=self.pool_size)
+        return self._driver
+
+    def _query(self, cypher, timeout):
+        timeout = self.query_timeout if timeout is None else timeout
+        return Query(cypher, timeout=timeout or None)
+
+    async def run(self, cypher, parameters=None, timeout=None, **kwparameters):
+        """
+        Runs a query and returns all of its records. Transient and
+        connection errors are retried with exponential backoff.
+        """
+        parameters = dict(parameters or {}, **kwparameters)
+        attempt = 0
+        while True:
+            try:
+                async with self.driver.session() as session:
+                    result = await session.run(self._query(cypher, timeout), parameters)
+                    return [record async for record in result]
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning(f"Retrying query after {type(e).__name__} (attempt {attempt}/{self.max_retries}): {e}")
+                await asyncio.sleep(delay)
+
+    async def evaluate(self, cypher, parameters=None, timeout=None, **kwparameters):
+        """
+        Returns the first value of the first record, or None.
+        """
+        records = await self.run(cypher, parameters, timeout, **kwparameters)
+        return records[0][0] if records else None
+
+    async def stream(self, cypher, parameters=None, timeout=None, **kwparameters):
+        """
+        Yields records as the server sends them, without buffering the
+        result. Not retried, since records may already have been consumed.
+        """
+        parameters = dict(parameters or {}, **kwparameters)
+        async with self.driver.session() as session:
+            result = await session.run(self._query(cypher, timeout), parameters)
+            async for record in result:
+                yield record
+
+    async def health(self, timeout=5):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            await self.run("RETURN 1", timeout=timeout)
+        except Exception as e:
+            return {'status': 'unavailable', 'uri': self.uri, 'error': str(e)}
+        return {
+            'status': 'ok',
+            'uri': self.uri,
+            'latency_ms': round((loop.time() - start) * 1000, 2),
+            'pool_size': self.pool_size,
+        }
+
+    async def close(self):
+        if self._driver is not None:
+            await self._driver.close()
+            self._driver = None
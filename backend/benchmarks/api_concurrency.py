@@ -0,0 +1,114 @@
+"""
+API concurrency benchmark.
+
+Sends the same mix of read requests to one or more running API servers at
+a fixed concurrency and reports requests/sec and latency percentiles, so
+the sync (WSGI) and async (ASGI) views can be compared under load. Start
+both servers against the same Neo4j, then run from the backend directory:
+
+    python manage.py runserver 8000
+    API_ASYNC_VIEWS=true uvicorn api.asgi:application --port 8001
+    python -m benchmarks.api_concurrency --target sync=http://localhost:8000 \
+        --target async=http://localhost:8001 --concurrency 64 --requests 2000
+
+Responses are requested without If-None-Match, and --no-cache adds a
+unique parameter to every request so each one reaches Neo4j.
+"""
+import argparse
+import itertools
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PATHS = [
+    '/api/threat_scenarios?limit=50',
+    '/api/search?query=powershell',
+    '/api/search?query=T1059',
+    '/api/suggest?query=cred',
+]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def fetch(url, timeout):
+    """
+    Returns (latency in seconds, HTTP status or None on a connection error).
+    """
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return time.perf_counter() - start, status
+
+
+def run_target(name, base_url, paths, requests, concurrency, timeout, no_cache):
+    counter = itertools.count()
+
+    def url_for(i):
+        path = paths[i % len(paths)]
+        if no_cache:
+            path += ('&' if '?' in path else '?') + f'bench={i}'
+        return base_url.rstrip('/') + path
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: fetch(url_for(next(counter)), timeout), range(requests)))
+    seconds = time.perf_counter() - start
+
+    latencies = [latency for latency, status in results if status and status < 400]
+    return {
+        'target': name,
+        'requests': requests,
+        'errors': requests - len(latencies),
+        'seconds': round(seconds, 3),
+        'requests_per_sec': round(requests / max(seconds, 1e-9), 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare API throughput and latency under concurrent load.')
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='server to benchmark, e.g. async=http://localhost:8001 (repeatable)')
+    parser.add_argument('--path', action='append', help='request path, repeatable (default: a read mix)')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--no-cache', action='store_true', help='make every request miss the response cache')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    paths = args.path or DEFAULT_PATHS
+    results = []
+    for target in args.target:
+        name, _, url = target.partition('=')
+        if not url:
+            name, url = target, target
+        results.append(run_target(name, url, paths, args.requests, args.concurrency, args.timeout, args.no_cache))
+
+    print(f"{'target':<12}{'requests':>10}{'errors':>8}{'req/sec':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        print(f"{r['target']:<12}{r['requests']:>10}{r['errors']:>8}{r['requests_per_sec']:>10.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
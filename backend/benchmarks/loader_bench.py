@@ -0,0 +1,151 @@
+"""
+Loader throughput benchmark.
+
+Generates (or reads) a STIX bundle, runs each stix_data_loader.py stage
+against the in-process MemoryGraph, and reports objects/sec, peak traced
+memory and round trips per stage. Run from the backend directory:
+
+    python -m benchmarks.loader_bench --techniques 600 --latency-ms 0.5
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+import stix_data_loader as loader
+from benchmarks.memory_graph import MemoryGraph
+from benchmarks.synthetic_stix import write_bundle
+from stix_reader import iter_stix_objects
+
+
+def reset_peak():
+    # tracemalloc.reset_peak() is new in Python 3.9; restarting tracing
+    # clears the peak on 3.8
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+def measure(name, graph, fn):
+    """
+    Runs fn() and returns its timing, memory and round-trip figures.
+    fn returns the number of objects it processed.
+    """
+    round_trips = graph.round_trips if graph else 0
+    transactions = graph.transactions if graph else 0
+    reset_peak()
+    start = time.perf_counter()
+    count = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    result = {
+        'stage': name,
+        'objects': count,
+        'seconds': round(seconds, 4),
+        'objects_per_sec': round(count / max(seconds, 1e-9), 1),
+        'peak_memory_mb': round(peak / (1024 * 1024), 2),
+        'round_trips': (graph.round_trips - round_trips) if graph else 0,
+        'transactions': (graph.transactions - transactions) if graph else 0,
+    }
+    return result
+
+
+def run_read(bundle):
+    return sum(1 for _ in iter_stix_objects(bundle))
+
+
+def run_mode(bundle, mode, batch_size, workers, latency):
+    """
+    Runs the node and relationship stages of one loader mode against a
+    fresh MemoryGraph.
+    """
+    graph = MemoryGraph(latency=latency)
+    loader.reset_state()
+    loader.graph = graph
+    loader.open_graph = lambda: graph
+    loader.WORKERS = workers if mode == 'bulk' else 1
+
+    def nodes():
+        objects = iter_stix_objects(bundle)
+        if mode == 'bulk':
+            loader.bulk_create_nodes(objects, batch_size)
+        else:
+            loader.create_nodes_from_stix(objects)
+        return loader.metrics.nodes
+
+    def relationships():
+        if mode == 'bulk':
+            loader.bulk_create_relationships(loader.collect_relationship_rows(), batch_size)
+        else:
+            loader.create_relationships_from_stix(loader.stix_relationships)
+            loader.create_data_source_component_relationships(loader.data_component_links)
+            loader.create_tactic_technique_relationships(loader.technique_phases)
+        return loader.metrics.relationships
+
+    results = [
+        measure(f'{mode} nodes', graph, nodes),
+        measure(f'{mode} relationships', graph, relationships),
+    ]
+    for result in results:
+        result['warnings'] = loader.metrics.warning_count
+    return results
+
+
+def run_export(bundle):
+    loader.reset_state()
+    with tempfile.TemporaryDirectory() as directory:
+        def export():
+            loader.export_csv(iter_stix_objects(bundle), directory)
+            return loader.metrics.nodes
+        return measure('csv export', None, export)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the STIX loader stages against an in-process graph.')
+    parser.add_argument('--bundle', help='existing STIX bundle; a synthetic one is generated when omitted')
+    parser.add_argument('--techniques', type=int, default=600)
+    parser.add_argument('--density', type=float, default=3.0, help='relationships per object')
+    parser.add_argument('--modes', default='bulk,per-object', help='comma-separated: bulk, per-object, export')
+    parser.add_argument('--batch-size', type=int, default=loader.BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated latency per round trip')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help='keep the loader INFO logs')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger(loader.__name__).setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        bundle = args.bundle
+        if not bundle:
+            bundle = os.path.join(directory, 'synthetic-attack.json')
+            total = write_bundle(bundle, techniques=args.techniques, density=args.density)
+            print(f"Generated {total} synthetic STIX objects")
+
+        tracemalloc.start()
+        results = [measure('read', None, lambda: run_read(bundle))]
+        for mode in args.modes.split(','):
+            if mode == 'export':
+                results.append(run_export(bundle))
+            else:
+                results.extend(run_mode(bundle, mode, args.batch_size, args.workers, args.latency_ms / 1000))
+        tracemalloc.stop()
+
+    print(f"{'stage':<26}{'objects':>9}{'seconds':>10}{'obj/sec':>12}{'peak MB':>10}{'round trips':>13}{'txs':>7}")
+    for r in results:
+        print(f"{r['stage']:<26}{r['objects']:>9}{r['seconds']:>10.3f}{r['objects_per_sec']:>12.1f}"
+              f"{r['peak_memory_mb']:>10.2f}{r['round_trips']:>13}{r['transactions']:>7}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
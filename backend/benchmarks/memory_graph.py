@@ -0,0 +1,174 @@
+"""
+In-process stand-in for the py2neo Graph used by stix_data_loader.py.
+
+It understands exactly the statements the loader issues, keeps nodes and
+relationships in dicts, and counts round trips so loader changes can be
+compared without a Neo4j server. An optional per-round-trip latency models
+the Bolt network cost that dominates real loads.
+"""
+import itertools
+import re
+import threading
+import time
+
+NODE_MERGE = re.compile(r'MERGE \(n:`(?P<label>[^`]+)` \{id: row\.id\}\)')
+RELATIONSHIP_MERGE = re.compile(r'MERGE \(s\)-\[r:`(?P<type>[^`]+)`\]->\(t\)')
+STIX_ID_DETACH = re.compile(r'\[r:`(?P<type>[^`]+)` \{stix_id: stix_id\}\]')
+DERIVED_DETACH = re.compile(r'MATCH \(s\)-\[r:`(?P<type>[^`]+)`\]->\(\) WHERE id\(s\) = identity')
+
+
+class MemoryCursor:
+    def __init__(self, records):
+        self.records = records
+
+    def data(self):
+        return self.records
+
+    def evaluate(self):
+        if not self.records:
+            return None
+        return next(iter(self.records[0].values()))
+
+    def plan(self):
+        return None
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class MemoryTransaction:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, statement, parameters=None, **kwparameters):
+        return self.graph.run(statement, parameters, **kwparameters)
+
+
+class MemoryGraph:
+    """
+    Dict-backed graph implementing the subset of py2neo.Graph the loader
+    uses: run, begin/commit/rollback and merge of single nodes.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.identities = itertools.count()
+        self.nodes = {}          # STIX id -> {'identity', 'labels', 'properties'}
+        self.ids_by_identity = {}
+        self.relationships = {}  # (source identity, type, target identity) -> properties
+        self.round_trips = 0
+        self.transactions = 0
+        self.version = 0         # :GraphVersion counter
+
+    def _round_trip(self):
+        with self.lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def begin(self):
+        return MemoryTransaction(self)
+
+    def commit(self, tx):
+        self._round_trip()
+        with self.lock:
+            self.transactions += 1
+
+    def rollback(self, tx):
+        self._round_trip()
+
+    def merge(self, subgraph, label=None, key=None):
+        """
+        Merges a single py2neo Node on (label, key), as graph.merge does.
+        """
+        self._round_trip()
+        with self.lock:
+            node = self._merge_node(label, dict(subgraph))
+        subgraph.identity = node['identity']
+
+    def _merge_node(self, label, properties):
+        node = self.nodes.get(properties['id'])
+        if node is None:
+            node = {'identity': next(self.identities), 'labels': {label}, 'properties': {}}
+            self.nodes[properties['id']] = node
+            self.ids_by_identity[node['identity']] = properties['id']
+        node['labels'].add(label)
+        node['properties'].update(properties)
+        return node
+
+    def _merge_relationship(self, source, relationship_type, target, stix_id):
+        if source not in self.ids_by_identity or target not in self.ids_by_identity:
+            return 0
+        self.relationships[(source, relationship_type, target)] = {'stix_id': stix_id}
+        return 1
+
+    def run(self, statement, parameters=None, **kwparameters):
+        self._round_trip()
+        parameters = dict(parameters or {}, **kwparameters)
+        with self.lock:
+            return MemoryCursor(self._execute(statement, parameters))
+
+    def _execute(self, statement, parameters):
+        rows = parameters.get('rows')
+        node_merge = NODE_MERGE.search(statement)
+        relationship_merge = RELATIONSHIP_MERGE.search(statement)
+
+        if statement.lstrip().startswith(('CREATE CONSTRAINT', 'CREATE INDEX', 'CREATE FULLTEXT', 'CALL db.awaitIndexes')):
+            return []
+        if node_merge:
+            label = node_merge.group('label')
+            return [{'id': row['id'], 'identity': self._merge_node(label, row)['identity']} for row in rows]
+        if relationship_merge:
+            relationship_type = relationship_merge.group('type')
+            if rows is None:
+                rows = [{'source': parameters['source'], 'target': parameters['target'], 'stix_id': parameters.get('stix_id')}]
+            written = sum(self._merge_relationship(row['source'], relationship_type, row['target'], row.get('stix_id')) for row in rows)
+            return [{'written': written}]
+        if 'MERGE (v:GraphVersion' in statement:
+            self.version += 1
+            return [{'version': self.version}]
+        if 'n.content_hash AS content_hash' in statement:
+            return [
+                {'id': stix_id, 'content_hash': node['properties'].get('content_hash'), 'identity': node['identity']}
+                for stix_id, node in self.nodes.items()
+                if node['properties'].get('stix_type') and not node['properties'].get('removed')
+            ]
+        if 'SET n.removed = true' in statement:
+            flagged = 0
+            for identity in rows:
+                node = self.nodes.get(self.ids_by_identity.get(identity))
+                if node:
+                    node['properties']['removed'] = True
+                    flagged += 1
+            return [{'flagged': flagged}]
+        if 'db.relationshipTypes' in statement:
+            return [{'relationshipType': relationship_type} for relationship_type in sorted({key[1] for key in self.relationships})]
+        stix_id_detach = STIX_ID_DETACH.search(statement)
+        if stix_id_detach:
+            stix_ids = set(rows)
+            return [{'detached': self._detach(lambda key, properties: key[1] == stix_id_detach.group('type') and properties['stix_id'] in stix_ids)}]
+        derived_detach = DERIVED_DETACH.search(statement)
+        if derived_detach:
+            identities = set(rows)
+            return [{'detached': self._detach(lambda key, properties: key[1] == derived_detach.group('type') and key[0] in identities)}]
+        if 'SET owner.content_hash = null' in statement:
+            identities = set(rows)
+
+            def loader_edge(key, properties):
+                if key[0] not in identities and key[2] not in identities:
+                    return False
+                if properties['stix_id'] is None and key[1] not in ('SUPPORTS', 'BELONGS_TO'):
+                    return False
+                owner = self.nodes.get(properties['stix_id']) or self.nodes[self.ids_by_identity[key[0]]]
+                owner['properties']['content_hash'] = None
+                return True
+
+            return [{'detached': self._detach(loader_edge)}]
+        raise ValueError(f"MemoryGraph does not understand statement: {statement.strip()[:80]}")
+
+    def _detach(self, doomed):
+        keys = [key for key, properties in self.relationships.items() if doomed(key, properties)]
+        for key in keys:
+            del self.relationships[key]
+        return len(keys)
@@ -0,0 +1,174 @@
+"""
+Synthetic STIX bundle generator shaped like the MITRE ATT&CK enterprise
+bundle, for loader benchmarks that must not depend on the real file.
+"""
+import argparse
+import json
+import random
+import uuid
+
+# Enterprise tactic shortnames, in matrix order
+TACTIC_SHORTNAMES = [
+    'reconnaissance', 'resource-development', 'initial-access', 'execution',
+    'persistence', 'privilege-escalation', 'defense-evasion', 'credential-access',
+    'discovery', 'lateral-movement', 'collection', 'command-and-control',
+    'exfiltration', 'impact',
+]
+
+# Object counts per technique, roughly matching enterprise-attack.json
+TYPE_RATIOS = {
+    'intrusion-set': 0.25,
+    'malware': 1.0,
+    'tool': 0.14,
+    'campaign': 0.05,
+    'course-of-action': 0.45,
+    'x-mitre-data-source': 0.07,
+    'x-mitre-data-component': 0.17,
+}
+
+# Relationship types by (source type, target type), weighted by frequency
+RELATIONSHIP_KINDS = [
+    ('uses', 'intrusion-set', 'attack-pattern', 4),
+    ('uses', 'malware', 'attack-pattern', 6),
+    ('uses', 'tool', 'attack-pattern', 1),
+    ('uses', 'campaign', 'attack-pattern', 1),
+    ('uses', 'intrusion-set', 'malware', 1),
+    ('mitigates', 'course-of-action', 'attack-pattern', 2),
+    ('detects', 'x-mitre-data-component', 'attack-pattern', 2),
+]
+
+WORDS = (
+    'adversaries may abuse command interpreters to execute scripts binaries '
+    'credentials network traffic persistence registry service process access '
+    'token payload remote system discovery collection exfiltration channel'
+).split()
+
+
+def _stix_id(object_type, rng):
+    return f"{object_type}--{uuid.UUID(int=rng.getrandbits(128), version=4)}"
+
+
+def _text(rng, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def _base(object_type, name, rng, description_size, external_id=None):
+    obj = {
+        'type': object_type,
+        'id': _stix_id(object_type, rng),
+        'spec_version': '2.1',
+        'created': '2020-01-01T00:00:00.000Z',
+        'modified': '2024-04-01T00:00:00.000Z',
+        'name': name,
+        'description': _text(rng, description_size),
+        'x_mitre_version': '1.0',
+    }
+    if external_id:
+        obj['external_references'] = [{'source_name': 'mitre-attack', 'external_id': external_id}]
+    return obj
+
+
+def iter_synthetic_objects(techniques=600, density=3.0, description_size=1500, seed=0):
+    """
+    Yields STIX objects for a synthetic bundle with the given number of
+    techniques. Other object types are scaled from TYPE_RATIOS and
+    `density` is the number of relationships per non-relationship object.
+    """
+    rng = random.Random(seed)
+    ids_by_type = {}
+
+    tactics = []
+    for number, shortname in enumerate(TACTIC_SHORTNAMES, start=1):
+        tactic = _base('x-mitre-tactic', shortname.replace('-', ' ').title(), rng, 200, f'TA{number:04d}')
+        tactic['x_mitre_shortname'] = shortname
+        tactics.append(tactic['id'])
+        yield tactic
+    ids_by_type['x-mitre-tactic'] = tactics
+
+    technique_ids = []
+    parents = []
+    for number in range(techniques):
+        is_subtechnique = bool(parents) and rng.random() < 0.6
+        external_id = f'T{1000 + number}'
+        if is_subtechnique:
+            parent_id, parent_external_id = rng.choice(parents)
+            external_id = f'{parent_external_id}.{number % 1000:03d}'
+        technique = _base('attack-pattern', f'Technique {number}', rng, description_size, external_id)
+        technique['x_mitre_is_subtechnique'] = is_subtechnique
+        technique['kill_chain_phases'] = [
+            {'kill_chain_name': 'mitre-attack', 'phase_name': shortname}
+            for shortname in rng.sample(TACTIC_SHORTNAMES, rng.choice([1, 1, 1, 2]))
+        ]
+        technique_ids.append(technique['id'])
+        yield technique
+        if is_subtechnique:
+            relationship = _base('relationship', '', rng, 0)
+            relationship.update({
+                'relationship_type': 'subtechnique-of',
+                'source_ref': technique['id'],
+                'target_ref': parent_id,
+            })
+            yield relationship
+        else:
+            parents.append((technique['id'], external_id))
+    ids_by_type['attack-pattern'] = technique_ids
+
+    data_sources = []
+    for object_type, ratio in TYPE_RATIOS.items():
+        ids = []
+        for number in range(max(1, int(techniques * ratio))):
+            obj = _base(object_type, f'{object_type} {number}', rng, description_size // 2, f'S{number:04d}')
+            if object_type == 'x-mitre-data-source':
+                data_sources.append(obj['id'])
+            if object_type == 'x-mitre-data-component':
+                obj['x_mitre_data_source_ref'] = rng.choice(data_sources)
+            ids.append(obj['id'])
+            yield obj
+        ids_by_type[object_type] = ids
+
+    objects = sum(len(ids) for ids in ids_by_type.values())
+    weights = [weight for *_, weight in RELATIONSHIP_KINDS]
+    for _ in range(int(objects * density)):
+        relationship_type, source_type, target_type, _weight = rng.choices(RELATIONSHIP_KINDS, weights)[0]
+        relationship = _base('relationship', '', rng, 100)
+        relationship.update({
+            'relationship_type': relationship_type,
+            'source_ref': rng.choice(ids_by_type[source_type]),
+            'target_ref': rng.choice(ids_by_type[target_type]),
+        })
+        yield relationship
+
+
+def write_bundle(path, **options):
+    """
+    Streams a synthetic bundle to path and returns the number of objects.
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"type": "bundle", "id": "bundle--00000000-0000-4000-8000-000000000000", "objects": [\n')
+        for obj in iter_synthetic_objects(**options):
+            if count:
+                f.write(',\n')
+            json.dump(obj, f)
+            count += 1
+        f.write('\n]}\n')
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic ATT&CK-shaped STIX bundle.')
+    parser.add_argument('path')
+    parser.add_argument('--techniques', type=int, default=600)
+    parser.add_argument('--density', type=float, default=3.0, help='relationships per object')
+    parser.add_argument('--description-size', type=int, default=1500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    total = write_bundle(args.path, techniques=args.techniques, density=args.density,
+                         description_size=args.description_size, seed=args.seed)
+    print(f"Wrote {total} STIX objects to {args.path}")
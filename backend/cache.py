@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Entries kept per API process, least recently used evicted first
+CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '256'))
+
+# How long a process trusts its last read of the graph version before
+# asking Neo4j again. Writes made by the process itself are seen at once;
+# writes made by other processes (or the loader) within this many seconds.
+VERSION_TTL = float(os.environ.get('GRAPH_VERSION_TTL', '1.0'))
+
+VERSION_READ = "MATCH (v:GraphVersion {id: 'graph'}) RETURN v.version AS version"
+VERSION_BUMP = """
+MERGE (v:GraphVersion {id: 'graph'})
+SET v.version = coalesce(v.version, 0) + 1
+RETURN v.version AS version
+"""
+
+
+def bump_version(graph):
+    """
+    Advances the graph version stored in Neo4j and returns the new value.
+    Every write to the graph must call this (directly or through
+    GraphVersion.bump) so cached responses are invalidated.
+    """
+    return graph.run(VERSION_BUMP).evaluate()
+
+
+class GraphVersion:
+    """
+    Monotonic graph version shared by all API processes through a single
+    :GraphVersion node, cached locally for VERSION_TTL seconds.
+    """
+
+    def __init__(self, graph, ttl=VERSION_TTL):
+        self.graph = graph
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked = 0.0
+
+    def fresh(self):
+        """
+        True while the locally known version can be trusted without
+        asking Neo4j.
+        """
+        return self.version is not None and time.monotonic() - self.checked < self.ttl
+
+    def store(self, version):
+        with self.lock:
+            self.version = version
+            self.checked = time.monotonic()
+        return version
+
+    def current(self):
+        if self.fresh():
+            return self.version
+        return self.store(self.graph.run(VERSION_READ).evaluate() or 0)
+
+    async def current_async(self, async_graph):
+        """
+        current() for async views: refreshes through an AsyncGraphGateway
+        but shares the state, so bumps made by sync views are seen at once.
+        """
+        if self.fresh():
+            return self.version
+        return self.store(await async_graph.evaluate(VERSION_READ) or 0)
+
+    def bump(self):
+        return self.store(bump_version(self.graph))
+
+    async def bump_async(self, async_graph):
+        return self.store(await async_graph.evaluate(VERSION_BUMP))
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True when an If-None-Match header value lists etag (or is '*').
+    """
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized JSON responses keyed by endpoint and request
+    parameters. Each entry remembers the graph version it was built at and
+    is ignored once the version moves on. Since a response depends only on
+    its key and the graph version, the ETag is derived from those two and a
+    304 can be answered without building or even finding the body.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()   # key -> (version, body, headers)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag(key, version):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        return f'"{version}-{digest}"'
+
+    def lookup(self, key, version):
+        """
+        Returns the cached (body, headers) for key at version, or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+            return None
+
+    def store(self, key, version, data, headers):
+        """
+        Serializes data, caches it for key at version and returns
+        (body, headers).
+        """
+        body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        with self.lock:
+            self.entries[key] = (version, body, headers)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return body, headers
+
+    def fetch(self, key, version, compute):
+        """
+        Returns (JSON body, extra headers) for key at version. On a miss,
+        compute() is called and must return (response data, headers).
+        """
+        cached = self.lookup(key, version)
+        if cached:
+            return cached
+        data, headers = compute()
+        return self.store(key, version, data, headers)
+
+    async def fetch_async(self, key, version, compute):
+        """
+        fetch() for async views; compute() is a coroutine function.
+        """
+        cached = self.lookup(key, version)
+        if cached:
+            return cached
+        data, headers = await compute()
+        return self.store(key, version, data, headers)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,155 @@
+"""
+Graph maintenance: collapses duplicate relationships and removes dangling
+threat scenarios.
+
+Before create_relationship merged its writes, every retry or double submit
+added another parallel edge, and the frontend's old create flow left
+ThreatScenario nodes without any relationship behind. This command finds
+both in batches, removes them and reports what it removed. Run it from
+the backend directory:
+
+    python compact_graph.py --dry-run
+    python compact_graph.py --batch-size 500 --report compaction.json
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+from cache import bump_version
+from gateway import GraphGateway
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get('COMPACT_BATCH_SIZE', '1000'))
+
+# Parallel edges with the same source, type and target. The one kept has a
+# stix_id when any of them does (the loader's own edge), then the oldest.
+DUPLICATE_GROUPS = """
+MATCH (s)-[r]->(t)
+WITH s, t, type(r) AS type, r
+ORDER BY r.stix_id IS NULL, id(r)
+WITH s, t, type, collect(r) AS rels
+WHERE size(rels) > 1
+"""
+
+DUPLICATES_REMOVE = DUPLICATE_GROUPS + """
+WITH type, rels[1..] AS extra
+LIMIT $batch
+UNWIND extra AS r
+DELETE r
+RETURN type, count(r) AS removed
+"""
+
+DUPLICATES_COUNT = DUPLICATE_GROUPS + """
+RETURN type, sum(size(rels) - 1) AS removed
+"""
+
+# Scenarios with no relationship at all. They use no technique, so the
+# scenario list never shows them.
+DANGLING_MATCH = """
+MATCH (ts:ThreatScenario)
+WHERE NOT (ts)--()
+"""
+
+DANGLING_REMOVE = DANGLING_MATCH + """
+WITH ts LIMIT $batch
+WITH ts, ts.id AS id, ts.name AS name
+DELETE ts
+RETURN id, name
+"""
+
+DANGLING_LIST = DANGLING_MATCH + """
+RETURN ts.id AS id, ts.name AS name
+ORDER BY ts.id
+"""
+
+
+def collapse_duplicates(graph, batch_size, dry_run=False):
+    """
+    Deletes all but one of every group of parallel edges, batch_size groups
+    per transaction, until none are left. Returns a Counter of removed
+    edges per relationship type.
+    """
+    # Every batch walks all relationships to find its groups, which can
+    # outlast the API's query timeout; maintenance queries run without one
+    removed = Counter()
+    if dry_run:
+        for record in graph.run(DUPLICATES_COUNT, timeout=0):
+            removed[record['type']] += record['removed']
+        return removed
+    while True:
+        batch = Counter({record['type']: record['removed'] for record in graph.run(DUPLICATES_REMOVE, batch=batch_size, timeout=0)})
+        if not batch:
+            return removed
+        removed.update(batch)
+        logger.info(f"Removed {sum(batch.values())} duplicate relationships")
+
+
+def remove_dangling_scenarios(graph, batch_size, dry_run=False):
+    """
+    Deletes ThreatScenario nodes without relationships, batch_size per
+    transaction. Returns the removed scenarios as {id, name}.
+    """
+    if dry_run:
+        return graph.run(DANGLING_LIST, timeout=0).data()
+    removed = []
+    while True:
+        batch = graph.run(DANGLING_REMOVE, batch=batch_size, timeout=0).data()
+        if not batch:
+            return removed
+        removed.extend(batch)
+        logger.info(f"Removed {len(batch)} dangling threat scenarios")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Collapse duplicate relationships and remove dangling threat scenarios.')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='duplicate groups or scenarios removed per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be removed without removing it')
+    parser.add_argument('--skip-duplicates', action='store_true', help='leave duplicate relationships alone')
+    parser.add_argument('--skip-scenarios', action='store_true', help='leave dangling threat scenarios alone')
+    parser.add_argument('--report', default='', help='write the JSON report to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs both compaction steps, then advances the graph version so API
+    caches and in-memory indexes drop what was removed.
+    """
+    args = parse_args(argv)
+    graph = GraphGateway()
+    start = time.perf_counter()
+
+    duplicates = Counter() if args.skip_duplicates else collapse_duplicates(graph, args.batch_size, args.dry_run)
+    scenarios = [] if args.skip_scenarios else remove_dangling_scenarios(graph, args.batch_size, args.dry_run)
+
+    if not args.dry_run and (duplicates or scenarios):
+        bump_version(graph)
+
+    verb = 'Would remove' if args.dry_run else 'Removed'
+    logger.info(f"{verb} {sum(duplicates.values())} duplicate relationships")
+    for relationship_type, count in duplicates.most_common():
+        logger.info(f"  {relationship_type}: {count}")
+    logger.info(f"{verb} {len(scenarios)} dangling threat scenarios")
+    for scenario in scenarios:
+        logger.info(f"  {scenario['id']}: {scenario['name']}")
+    logger.info(f"Compaction finished in {time.perf_counter() - start:.2f}s")
+
+    if args.report:
+        report = {
+            'dry_run': args.dry_run,
+            'duplicate_relationships': dict(duplicates),
+            'dangling_scenarios': scenarios,
+            'seconds': round(time.perf_counter() - start, 2),
+        }
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import logging
+import threading
+from collections import Counter
+
+from schema import label_for_id
+
+logger = logging.getLogger(__name__)
+
+# The matrix whose tactic order is used for the columns
+MATRIX_ID = 'enterprise-attack'
+
+# Column order when no x-mitre-matrix object has been loaded
+DEFAULT_TACTIC_ORDER = [
+    'reconnaissance', 'resource-development', 'initial-access', 'execution',
+    'persistence', 'privilege-escalation', 'defense-evasion', 'credential-access',
+    'discovery', 'lateral-movement', 'collection', 'command-and-control',
+    'exfiltration', 'impact',
+]
+
+MATRIX_QUERY = """
+MATCH (m:Matrix {external_id: $matrix})
+RETURN m.tactic_refs AS tactic_refs
+LIMIT 1
+"""
+
+TACTICS_QUERY = """
+MATCH (t:Tactic)
+WHERE NOT coalesce(t.removed, false)
+RETURN t.id AS id, t.name AS name, t.external_id AS external_id, t.short_name AS short_name,
+       coalesce(t.revoked, false) OR coalesce(t.deprecated, false) AS retired
+"""
+
+SUPPORTS_QUERY = """
+MATCH (x:Technique)-[:SUPPORTS]->(t:Tactic)
+RETURN x.id AS technique, collect(DISTINCT t.id) AS tactics
+"""
+
+SCENARIOS_QUERY = """
+MATCH (ts:ThreatScenario)
+RETURN ts.id AS id, ts.name AS name, [(ts)-[:USES_TECHNIQUE]->(x:Technique) | x.id] AS techniques
+"""
+
+
+def order_tactics(tactics, tactic_refs=None):
+    """
+    Sorts tactic records into ATT&CK matrix order: the matrix's own
+    tactic_refs when known, otherwise DEFAULT_TACTIC_ORDER by short name.
+    Retired tactics are dropped unless the matrix lists them; tactics the
+    order does not mention go last, by external id.
+    """
+    if tactic_refs:
+        position = {tactic_id: i for i, tactic_id in enumerate(tactic_refs)}
+        key = lambda t: position.get(t['id'])
+    else:
+        position = {name: i for i, name in enumerate(DEFAULT_TACTIC_ORDER)}
+        key = lambda t: position.get(t['short_name'])
+    tactics = [t for t in tactics if key(t) is not None or not t['retired']]
+    return sorted(tactics, key=lambda t: (key(t) is None, key(t) or 0, t['external_id'] or ''))
+
+
+class CoverageMatrix:
+    """
+    Materialized scenario x tactic coverage: for every ThreatScenario, how
+    many of its USES_TECHNIQUE techniques support each tactic through the
+    loader's SUPPORTS edges. Like the typeahead index, each API process
+    holds its own copy. It is loaded from the graph on first use, updated
+    in place by the writes that process makes, and reloaded when the graph
+    version moves past what it has applied (a load, or another process).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.tactics = []                # ordered tactic dicts
+        self.technique_tactics = {}      # technique id -> set of tactic ids
+        self.technique_scenarios = {}    # technique id -> set of scenario ids
+        self.scenarios = {}              # scenario id -> name
+        self.scenario_techniques = {}    # scenario id -> set of technique ids
+        self.counts = {}                 # scenario id -> Counter of tactic ids
+
+    def load(self, graph, version=None):
+        """
+        Rebuilds the whole matrix from the graph.
+        """
+        tactic_refs = graph.run(MATRIX_QUERY, matrix=MATRIX_ID).evaluate()
+        tactics = order_tactics([dict(record) for record in graph.run(TACTICS_QUERY)], tactic_refs)
+        technique_tactics = {record['technique']: set(record['tactics']) for record in graph.run(SUPPORTS_QUERY)}
+        scenarios = {}
+        scenario_techniques = {}
+        for record in graph.run(SCENARIOS_QUERY):
+            scenarios[record['id']] = record['name']
+            scenario_techniques[record['id']] = set(record['techniques'])
+
+        with self.lock:
+            self.tactics = tactics
+            self.technique_tactics = technique_tactics
+            self.scenarios = scenarios
+            self.scenario_techniques = {}
+            self.technique_scenarios = {}
+            self.counts = {}
+            for scenario_id, technique_ids in scenario_techniques.items():
+                self.scenario_techniques[scenario_id] = set()
+                self.counts[scenario_id] = Counter()
+                for technique_id in technique_ids:
+                    self._add_technique(scenario_id, technique_id)
+            self.version = version
+        logger.info(f"Coverage matrix loaded: {len(scenarios)} scenarios x {len(tactics)} tactics")
+
+    def refresh(self, graph, version):
+        """
+        Reloads the matrix unless it already reflects graph version.
+        """
+        if self.version is None or self.version != version:
+            self.load(graph, version)
+
+    def _advance(self, version):
+        # A write of this process moved the version by one: the in-place
+        # update is complete. Any other step means someone else wrote too.
+        if version is None:
+            return
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+        else:
+            self.version = None
+
+    def _add_technique(self, scenario_id, technique_id):
+        if technique_id in self.scenario_techniques[scenario_id]:
+            return
+        self.scenario_techniques[scenario_id].add(technique_id)
+        self.technique_scenarios.setdefault(technique_id, set()).add(scenario_id)
+        self.counts[scenario_id].update(self.technique_tactics.get(technique_id, ()))
+
+    def _add_support(self, technique_id, tactic_id):
+        tactics = self.technique_tactics.setdefault(technique_id, set())
+        if tactic_id in tactics:
+            return
+        tactics.add(tactic_id)
+        for scenario_id in self.technique_scenarios.get(technique_id, ()):
+            self.counts[scenario_id][tactic_id] += 1
+
+    def add_scenario(self, scenario_id, name, technique_ids=(), version=None):
+        """
+        Records a new scenario and the techniques it uses.
+        """
+        with self.lock:
+            self.scenarios[scenario_id] = name
+            self.scenario_techniques.setdefault(scenario_id, set())
+            self.counts.setdefault(scenario_id, Counter())
+            for technique_id in technique_ids:
+                if label_for_id(technique_id) == 'Technique':
+                    self._add_technique(scenario_id, technique_id)
+            self._advance(version)
+
+    def add_relationship(self, source_id, relationship_type, target_id, version=None):
+        """
+        Applies a created relationship. Only USES_TECHNIQUE edges from a
+        scenario and SUPPORTS edges from a technique affect coverage.
+        """
+        with self.lock:
+            target_label = label_for_id(target_id)
+            if relationship_type == 'USES_TECHNIQUE' and source_id in self.scenarios and target_label == 'Technique':
+                self._add_technique(source_id, target_id)
+            elif relationship_type == 'SUPPORTS' and target_label == 'Tactic':
+                self._add_support(source_id, target_id)
+            self._advance(version)
+
+    def matrix(self):
+        """
+        Returns the tactics in ATT&CK matrix order and, per scenario, its
+        technique count and one coverage count per tactic in that order.
+        """
+        with self.lock:
+            tactic_ids = [t['id'] for t in self.tactics]
+            technique_counts = Counter(
+                tactic_id for tactics in self.technique_tactics.values() for tactic_id in tactics
+            )
+            tactics = [
+                {
+                    'id': t['id'],
+                    'name': t['name'],
+                    'external_id': t['external_id'] or '',
+                    'short_name': t['short_name'] or '',
+                    'techniques': technique_counts[t['id']],
+                }
+                for t in self.tactics
+            ]
+            scenarios = [
+                {
+                    'id': scenario_id,
+                    'name': name,
+                    'techniques': len(self.scenario_techniques[scenario_id]),
+                    'coverage': [self.counts[scenario_id][tactic_id] for tactic_id in tactic_ids],
+                }
+                for scenario_id, name in self.scenarios.items()
+            ]
+        scenarios.sort(key=lambda s: ((s['name'] or '').lower(), s['id']))
+        return {'tactics': tactics, 'scenarios': scenarios}
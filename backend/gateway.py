@@ -0,0 +1,270 @@
+"""
+Shared access to Neo4j for the API, the loader and the maintenance scripts.
+
+GraphGateway wraps a py2neo Graph with a sized connection pool, per-query
+timeouts, retries with exponential backoff and a health check, all
+configured from the environment:
+
+    NEO4J_URI            bolt://neo4j:7687
+    NEO4J_USER           neo4j
+    NEO4J_PASSWORD       password
+    NEO4J_POOL_SIZE      10     maximum open connections
+    NEO4J_POOL_WARM      2      connections opened up front by warm()
+    NEO4J_QUERY_TIMEOUT  30     seconds per query, 0 to disable
+    NEO4J_MAX_RETRIES    3      retries for transient and connection errors
+    NEO4J_RETRY_BACKOFF  0.1    initial retry delay in seconds, doubling
+
+py2neo does not pass transaction timeouts to the server, so timeouts are
+enforced by a watchdog thread: every query carries a unique token
+parameter, and a query still running at its deadline is found with SHOW
+TRANSACTIONS and terminated. The caller then gets a QueryTimeout instead
+of holding its worker until the query finishes.
+
+py2neo's run() also pulls the whole result into the client before it
+returns. Streamed responses (NDJSON listings and the export) therefore
+read through stream(), which uses the official neo4j driver and fetches
+records in batches while they are consumed.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+from neo4j import GraphDatabase, Query
+from py2neo import Graph
+from py2neo.errors import ConnectionBroken, ConnectionLimit, ConnectionUnavailable, ServiceUnavailable, TransientError
+
+logger = logging.getLogger(__name__)
+
+NEO4J_URI = os.environ.get('NEO4J_URI', 'bolt://neo4j:7687')
+NEO4J_AUTH = (os.environ.get('NEO4J_USER', 'neo4j'), os.environ.get('NEO4J_PASSWORD', 'password'))
+POOL_SIZE = int(os.environ.get('NEO4J_POOL_SIZE', '10'))
+POOL_WARM = int(os.environ.get('NEO4J_POOL_WARM', '2'))
+QUERY_TIMEOUT = float(os.environ.get('NEO4J_QUERY_TIMEOUT', '30'))
+MAX_RETRIES = int(os.environ.get('NEO4J_MAX_RETRIES', '3'))
+RETRY_BACKOFF = float(os.environ.get('NEO4J_RETRY_BACKOFF', '0.1'))
+
+# Errors after which the same query may simply be sent again
+RETRYABLE_ERRORS = (TransientError, ConnectionUnavailable, ConnectionBroken, ConnectionLimit, ServiceUnavailable)
+
+# Parameter that tags each query for the watchdog
+TOKEN_PARAMETER = 'gatewayQuery'
+
+# Administration commands available from Neo4j 4.4 on; the dbms.listQueries
+# and dbms.killQuery procedures are gone in Neo4j 5
+FIND_TRANSACTIONS = """
+SHOW TRANSACTIONS YIELD transactionId, parameters
+WHERE parameters.gatewayQuery = $token
+RETURN transactionId
+"""
+
+TERMINATE_TRANSACTIONS = "TERMINATE TRANSACTIONS $ids"
+
+
+class QueryTimeout(Exception):
+    """
+    Raised when a query was killed for running past its timeout.
+    """
+
+
+class QueryWatchdog:
+    """
+    Single background thread that kills queries still running at their
+    deadline. Queries are registered with watch() and unregistered with
+    release() as soon as they return, so only overdue ones cost a
+    round trip.
+    """
+
+    def __init__(self, kill):
+        self.kill = kill
+        self.condition = threading.Condition()
+        self.deadlines = []   # heap of (deadline, token)
+        self.active = set()
+        self.killed = set()
+        self.thread = None
+
+    def watch(self, token, timeout):
+        with self.condition:
+            self.active.add(token)
+            heapq.heappush(self.deadlines, (time.monotonic() + timeout, token))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='neo4j-query-watchdog', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def release(self, token):
+        """
+        Unregisters a finished query. Returns True if it had been killed.
+        """
+        with self.condition:
+            self.active.discard(token)
+            if token in self.killed:
+                self.killed.discard(token)
+                return True
+            return False
+
+    def _run(self):
+        while True:
+            with self.condition:
+                # Drop finished queries from the front of the heap
+                while self.deadlines and self.deadlines[0][1] not in self.active:
+                    heapq.heappop(self.deadlines)
+                if not self.deadlines:
+                    self.condition.wait()
+                    continue
+                deadline, token = self.deadlines[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                heapq.heappop(self.deadlines)
+                self.killed.add(token)
+            try:
+                self.kill(token)
+            except Exception as e:
+                logger.warning(f"Could not kill overdue query, its timeout is not enforced: {e}")
+
+
+class GraphGateway:
+    """
+    Pooled, retrying access to one Neo4j database. run() adds timeouts and
+    retries; every other py2neo Graph attribute (begin, commit, create,
+    merge, nodes, ...) is passed through to the underlying Graph, so the
+    gateway can stand in wherever a Graph was used.
+    """
+
+    def __init__(self, uri=None, auth=None, pool_size=None, query_timeout=None,
+                 max_retries=None, retry_backoff=None):
+        self.uri = uri or NEO4J_URI
+        self.auth = auth or NEO4J_AUTH
+        self.pool_size = pool_size or POOL_SIZE
+        self.query_timeout = QUERY_TIMEOUT if query_timeout is None else query_timeout
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self.lock = threading.Lock()
+        self.tokens = itertools.count()
+        self.watchdog = QueryWatchdog(self._kill)
+        self._graph = None
+        self._control = None
+        self._driver = None
+
+    def __repr__(self):
+        return f"GraphGateway({self.uri!r}, pool_size={self.pool_size})"
+
+    def _open(self, pool_size, init_size):
+        return Graph(self.uri, auth=self.auth, max_size=pool_size, init_size=init_size)
+
+    @property
+    def graph(self):
+        """
+        The pooled py2neo Graph, opened on first use.
+        """
+        if self._graph is None:
+            with self.lock:
+                if self._graph is None:
+                    self._graph = self._open(self.pool_size, 1)
+        return self._graph
+
+    @property
+    def driver(self):
+        """
+        The official neo4j driver behind stream(), opened on first use.
+        """
+        if self._driver is None:
+            with self.lock:
+                if self._driver is None:
+                    self._driver = GraphDatabase.driver(self.uri, auth=self.auth, max_connection_pool_size=self.pool_size)
+        return self._driver
+
+    def warm(self, connections=None):
+        """
+        Opens the pool with connections already established, so the first
+        requests do not pay for connection setup. Call at startup.
+        """
+        connections = min(connections or POOL_WARM, self.pool_size)
+        with self.lock:
+            if self._graph is None:
+                self._graph = self._open(self.pool_size, connections)
+        logger.info(f"Connected to Neo4j at {self.uri} (pool size {self.pool_size}, {connections} warm)")
+
+    def __getattr__(self, name):
+        # Only reached for attributes the gateway does not define itself
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.graph, name)
+
+    def _kill(self, token):
+        # The watchdog gets its own single connection so it can still kill
+        # queries when the main pool is exhausted
+        if self._control is None:
+            self._control = self._open(1, 1)
+        ids = [record['transactionId'] for record in self._control.run(FIND_TRANSACTIONS, token=token)]
+        if not ids:
+            # Finished between its deadline and the lookup
+            return
+        self._control.run(TERMINATE_TRANSACTIONS, ids=ids)
+        logger.warning(f"Killed query {token} after exceeding its timeout")
+
+    def run(self, cypher, parameters=None, timeout=None, **kwparameters):
+        """
+        Runs a query in an auto-commit transaction and returns its cursor.
+        Transient and connection errors are retried with exponential
+        backoff. timeout (seconds) overrides the default; 0 disables it.
+        Raises QueryTimeout when the query was killed for running too long.
+        """
+        parameters = dict(parameters or {}, **kwparameters)
+        timeout = self.query_timeout if timeout is None else timeout
+        attempt = 0
+        while True:
+            token = None
+            if timeout:
+                token = f"{os.getpid()}-{next(self.tokens)}"
+                parameters[TOKEN_PARAMETER] = token
+                self.watchdog.watch(token, timeout)
+            try:
+                return self.graph.run(cypher, parameters)
+            except Exception as e:
+                if token and self.watchdog.release(token):
+                    raise QueryTimeout(f"Query exceeded its {timeout}s timeout") from e
+                token = None
+                if not isinstance(e, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning(f"Retrying query after {type(e).__name__} (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(delay)
+            finally:
+                if token:
+                    self.watchdog.release(token)
+
+    def stream(self, cypher, parameters=None, timeout=None, **kwparameters):
+        """
+        Yields records as the server sends them, holding only the driver's
+        current fetch batch in memory. The timeout is sent to Neo4j as the
+        transaction timeout; 0 disables it, which whole-result streams
+        such as the export need. Not retried, since records may already
+        have been consumed.
+        """
+        parameters = dict(parameters or {}, **kwparameters)
+        timeout = self.query_timeout if timeout is None else timeout
+        with self.driver.session() as session:
+            yield from session.run(Query(cypher, timeout=timeout or None), parameters)
+
+    def health(self, timeout=5):
+        """
+        Runs a trivial query and reports whether the database answers.
+        Returns a dict with 'status' ('ok' or 'unavailable') and details.
+        """
+        start = time.perf_counter()
+        try:
+            self.run("RETURN 1", timeout=timeout)
+        except Exception as e:
+            return {'status': 'unavailable', 'uri': self.uri, 'error': str(e)}
+        return {
+            'status': 'ok',
+            'uri': self.uri,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+            'pool_size': self.pool_size,
+        }
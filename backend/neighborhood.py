@@ -0,0 +1,137 @@
+from schema import NODE_LABELS, cypher_name, id_match
+from search import parse_limit
+
+DEFAULT_DEPTH = 2
+MAX_DEPTH = 4
+DEFAULT_HOP_LIMIT = 50
+MAX_HOP_LIMIT = 500
+DEFAULT_NODE_LIMIT = 200
+MAX_NODE_LIMIT = 2000
+
+# One hop of the traversal, repeated `depth` times in a single query. Each
+# hop expands the current frontier in both directions, keeps at most
+# $hopLimit nodes not seen before, and stops adding nodes once $limit is
+# reached. Relationships to nodes that were already seen are kept too, so
+# links between members of the subgraph are not lost. Aggregating without
+# a grouping key makes an empty frontier yield one row of empty lists, so
+# the query still returns what it found so far.
+NEIGHBORHOOD_HOP = """
+CALL {{
+  WITH nodes, frontier
+  UNWIND frontier AS f
+  MATCH (f)-[r{relationships}]-(m)
+  WHERE size($labels) = 0 OR ANY(label IN labels(m) WHERE label IN $labels)
+  WITH collect(r) AS hopRels, collect(DISTINCT CASE WHEN NOT m IN nodes THEN m END) AS found
+  RETURN hopRels, found[..$hopLimit] AS found
+}}
+WITH nodes, rels, levels, hopRels, found[..($limit - size(nodes))] AS next
+WITH nodes + next AS nodes, next AS frontier, rels + hopRels AS rels, levels + [[n IN next | n.id]] AS levels
+"""
+
+NEIGHBORHOOD_RETURN = """
+RETURN [n IN nodes | {id: n.id, name: n.name, labels: labels(n)}] AS nodes, levels,
+       [r IN rels WHERE startNode(r) IN nodes AND endNode(r) IN nodes |
+        {source: startNode(r).id, target: endNode(r).id, relationship: type(r)}] AS links
+"""
+
+
+def neighborhood_options(args):
+    """
+    Reads the neighborhood query parameters from a Flask or Django query
+    dict: nodeId, depth, hopLimit, limit, and repeatable label and
+    relationship filters. Raises ValueError for invalid values.
+    """
+    node_id = args.get('nodeId', '')
+    if not node_id:
+        raise ValueError("nodeId parameter is required")
+    labels = [label for label in args.getlist('label') if label]
+    invalid_labels = [label for label in labels if label not in NODE_LABELS]
+    if invalid_labels:
+        raise ValueError(f"Invalid labels: {', '.join(invalid_labels)}")
+    return {
+        'node_id': node_id,
+        'depth': parse_limit(args.get('depth'), DEFAULT_DEPTH, MAX_DEPTH, name='depth'),
+        'hop_limit': parse_limit(args.get('hopLimit'), DEFAULT_HOP_LIMIT, MAX_HOP_LIMIT, name='hopLimit'),
+        'limit': parse_limit(args.get('limit'), DEFAULT_NODE_LIMIT, MAX_NODE_LIMIT),
+        'labels': labels,
+        'relationships': [t for t in args.getlist('relationship') if t],
+    }
+
+
+def neighborhood_query(node_id, depth, relationships=None):
+    """
+    Builds the bounded traversal from node_id as one query. Relationship
+    types cannot be parameters, so the allowed types go into the pattern.
+    """
+    types = ':' + '|'.join(cypher_name(t) for t in relationships) if relationships else ''
+    hop = NEIGHBORHOOD_HOP.format(relationships=types)
+    return (
+        f"MATCH {id_match('seed', node_id, 'nodeId')}\n"
+        "WITH [seed] AS nodes, [seed] AS frontier, [] AS rels, [] AS levels\n"
+        + hop * depth
+        + NEIGHBORHOOD_RETURN
+    )
+
+
+def neighborhood_parameters(options):
+    return {
+        'nodeId': options['node_id'],
+        'labels': options['labels'],
+        'hopLimit': options['hop_limit'],
+        'limit': options['limit'],
+    }
+
+
+def neighborhood_result(record, options):
+    """
+    Turns the query row into {nodes, links}. Nodes carry their distance
+    from the seed as 'depth'; links keep their stored direction and are
+    deduplicated. Returns None when the seed does not exist.
+    """
+    if record is None:
+        return None
+    depths = {options['node_id']: 0}
+    for depth, ids in enumerate(record['levels'], start=1):
+        for node_id in ids:
+            depths.setdefault(node_id, depth)
+
+    nodes = []
+    for node in record['nodes']:
+        labels = list(node['labels'])
+        nodes.append({
+            'id': node['id'],
+            'name': node['name'],
+            'group': labels[0] if labels else 'default',
+            'labels': labels,
+            'depth': depths.get(node['id'], 0),
+        })
+
+    links = []
+    seen = set()
+    for link in record['links']:
+        key = (link['source'], link['target'], link['relationship'])
+        if key not in seen:
+            seen.add(key)
+            links.append(dict(link))
+
+    return {'nodes': nodes, 'links': links, 'truncated': len(nodes) >= options['limit']}
+
+
+def fetch_neighborhood(graph, options):
+    """
+    Runs one bounded traversal around options['node_id'] and returns the
+    deduplicated {nodes, links, truncated} subgraph, or None when the node
+    does not exist.
+    """
+    query = neighborhood_query(options['node_id'], options['depth'], options['relationships'])
+    records = graph.run(query, neighborhood_parameters(options)).data()
+    return neighborhood_result(records[0] if records else None, options)
+
+
+async def fetch_neighborhood_async(async_graph, options):
+    """
+    fetch_neighborhood() through an AsyncGraphGateway.
+    """
+    query = neighborhood_query(options['node_id'], options['depth'], options['relationships'])
+    records = await async_graph.run(query, neighborhood_parameters(options))
+    return neighborhood_result(records[0] if records else None, options)
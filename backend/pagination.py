@@ -0,0 +1,78 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# List endpoints keep returning a bare JSON array; paging metadata travels
+# in these response headers.
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+TOTAL_COUNT_HEADER = 'X-Total-Count'
+EXPOSED_HEADERS = ['ETag', NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER]
+
+
+def encode_cursor(position):
+    """
+    Turns a position dict into an opaque URL-safe cursor string.
+    """
+    raw = json.dumps(position, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns the position dict of a cursor, or {} for no cursor. Raises
+    ValueError for anything that is not a cursor issued by encode_cursor.
+    """
+    if not cursor:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(position, dict):
+        raise ValueError("invalid cursor")
+    return position
+
+
+def cursor_offset(cursor):
+    """
+    Returns the ranking position of a search cursor, 0 for no cursor.
+    Raises ValueError unless it is a non-negative integer.
+    """
+    offset = decode_cursor(cursor).get('offset', 0)
+    if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+        raise ValueError("invalid cursor")
+    return offset
+
+
+def cursor_after(cursor):
+    """
+    Returns the id a keyset cursor continues after, '' for no cursor.
+    Raises ValueError unless it is a string.
+    """
+    after = decode_cursor(cursor).get('after', '')
+    if not isinstance(after, str):
+        raise ValueError("invalid cursor")
+    return after
+
+
+def wants_total(value):
+    """
+    True when the optional 'total' query parameter asks for a total count.
+    """
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def page_headers(next_position=None, total=None):
+    """
+    Builds the paging headers for a page: the cursor of the next page when
+    there is one, and the total count when it was asked for.
+    """
+    headers = {}
+    if next_position is not None:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(next_position)
+    if total is not None:
+        headers[TOTAL_COUNT_HEADER] = str(total)
+    return headers
@@ -0,0 +1,265 @@
+import time
+
+from gateway import QueryTimeout
+from schema import NODE_LABELS, cypher_name, id_match
+from search import parse_limit
+
+DEFAULT_DEPTH = 4
+MAX_DEPTH = 6
+DEFAULT_PATHS = 3
+MAX_PATHS = 10
+DEFAULT_BUDGET = 2.0
+MAX_BUDGET = 10.0
+
+# Path elements in the {nodes, links} shape Graph.js renders
+PATH_RETURN = """
+RETURN [n IN nodes(p) | {id: n.id, name: n.name, labels: labels(n)}] AS nodes,
+       [r IN relationships(p) | {source: startNode(r).id, target: endNode(r).id, relationship: type(r)}] AS links
+"""
+
+# Inner nodes must carry an allowed label, and no node may repeat
+PATH_FILTER = """
+WHERE (size($labels) = 0 OR all(n IN nodes(p)[1..-1] WHERE ANY(label IN labels(n) WHERE label IN $labels)))
+  AND all(n IN nodes(p) WHERE single(m IN nodes(p) WHERE m = n))
+"""
+
+
+def path_options(args):
+    """
+    Reads the path query parameters from a Flask or Django query dict:
+    sourceId, targetId, maxDepth, k, timeout (seconds), and repeatable
+    label and relationship filters. Raises ValueError for invalid values.
+    """
+    source_id, target_id = args.get('sourceId', ''), args.get('targetId', '')
+    if not source_id or not target_id:
+        raise ValueError("sourceId and targetId parameters are required")
+    labels = [label for label in args.getlist('label') if label]
+    invalid_labels = [label for label in labels if label not in NODE_LABELS]
+    if invalid_labels:
+        raise ValueError(f"Invalid labels: {', '.join(invalid_labels)}")
+    try:
+        budget = float(args.get('timeout') or DEFAULT_BUDGET)
+    except ValueError:
+        budget = 0
+    if budget <= 0:
+        raise ValueError("timeout must be a positive number of seconds")
+    return {
+        'source_id': source_id,
+        'target_id': target_id,
+        'max_depth': parse_limit(args.get('maxDepth'), DEFAULT_DEPTH, MAX_DEPTH, name='maxDepth'),
+        'k': parse_limit(args.get('k'), DEFAULT_PATHS, MAX_PATHS, name='k'),
+        'budget': min(budget, MAX_BUDGET),
+        'labels': labels,
+        'relationships': [t for t in args.getlist('relationship') if t],
+    }
+
+
+def paths_result(paths, complete):
+    """
+    Merges paths, each a (nodes, links) pair of dicts, into one
+    deduplicated {nodes, links} graph. 'paths' keeps every path as its
+    node ids and relationship types, shortest first. complete is False
+    when the time budget ran out before k paths were checked for.
+    """
+    nodes = {}
+    links = {}
+    summaries = []
+    for path_nodes, path_links in paths:
+        for node in path_nodes:
+            if node['id'] not in nodes:
+                labels = list(node['labels'])
+                nodes[node['id']] = {
+                    'id': node['id'],
+                    'name': node['name'],
+                    'group': labels[0] if labels else 'default',
+                    'labels': labels,
+                }
+        for link in path_links:
+            links.setdefault((link['source'], link['target'], link['relationship']), dict(link))
+        summaries.append({
+            'length': len(path_links),
+            'nodes': [node['id'] for node in path_nodes],
+            'relationships': [link['relationship'] for link in path_links],
+        })
+    return {'nodes': list(nodes.values()), 'links': list(links.values()), 'paths': summaries, 'complete': complete}
+
+
+def find_paths(graph, options):
+    """
+    Finds up to k shortest simple paths in Neo4j. allShortestPaths runs
+    Neo4j's bidirectional breadth-first search for the shortest length;
+    if that yields fewer than k paths, longer ones up to maxDepth are
+    enumerated with whatever is left of the time budget. Each query is
+    killed at the budget by the gateway. Returns None when either end
+    does not exist.
+    """
+    deadline = time.monotonic() + options['budget']
+    types = ':' + '|'.join(cypher_name(t) for t in options['relationships']) if options['relationships'] else ''
+    ends = f"MATCH {id_match('s', options['source_id'], 'sourceId')}, {id_match('t', options['target_id'], 'targetId')}\n"
+    parameters = {
+        'sourceId': options['source_id'],
+        'targetId': options['target_id'],
+        'labels': options['labels'],
+        'k': options['k'],
+    }
+    if not graph.run(ends + "RETURN count(*) AS found", parameters).evaluate():
+        return None
+    if options['source_id'] == options['target_id']:
+        return paths_result([], complete=True)
+
+    shortest = (
+        ends
+        + f"MATCH p = allShortestPaths((s)-[{types}*..{options['max_depth']}]-(t))"
+        + PATH_FILTER + "WITH p LIMIT $k" + PATH_RETURN
+    )
+    paths = []
+    try:
+        records = graph.run(shortest, parameters, timeout=options['budget']).data()
+        paths = [(record['nodes'], record['links']) for record in records]
+        remaining = deadline - time.monotonic()
+        if paths and len(paths) < options['k'] and len(paths[0][1]) < options['max_depth'] and remaining > 0:
+            longer = (
+                ends
+                + f"MATCH p = (s)-[{types}*{len(paths[0][1]) + 1}..{options['max_depth']}]-(t)"
+                + PATH_FILTER + "WITH p ORDER BY length(p) LIMIT $more" + PATH_RETURN
+            )
+            records = graph.run(longer, parameters, timeout=remaining, more=options['k'] - len(paths)).data()
+            paths.extend((record['nodes'], record['links']) for record in records)
+    except QueryTimeout:
+        return paths_result(paths, complete=False)
+    return paths_result(paths, complete=True)
+
+
+class PathSearch:
+    """
+    k shortest simple paths over a GraphSnapshot. A bidirectional
+    breadth-first search from both ends finds the distance of every node
+    to the target, then a depth-first enumeration from the source only
+    steps to nodes from which the target is still reachable in the steps
+    left, for each length from the shortest up to maxDepth. Stops at the
+    time budget.
+    """
+
+    def __init__(self, snapshot, options):
+        self.snapshot = snapshot
+        self.options = options
+        self.labels = set(options['labels'])
+        relationships = options['relationships']
+        self.codes = {snapshot.type_codes.get(t) for t in relationships} if relationships else None
+        self.deadline = time.monotonic() + options['budget']
+        self.expired = False
+
+    def _steps(self, i):
+        """
+        Yields (neighbour, source, target, type code) for the allowed
+        relationships of node i.
+        """
+        for j, source, target, code in self.snapshot.edges(i):
+            if self.codes is None or code in self.codes:
+                yield j, source, target, code
+
+    def _allowed(self, j, end):
+        return j == end or not self.labels or not self.labels.isdisjoint(self.snapshot.labels[j])
+
+    def _out_of_time(self):
+        if time.monotonic() > self.deadline:
+            self.expired = True
+        return self.expired
+
+    def _expand(self, frontier, seen, other_end):
+        nxt = []
+        for i in frontier:
+            if self._out_of_time():
+                break
+            for j, _, _, _ in self._steps(i):
+                if j not in seen and self._allowed(j, other_end):
+                    seen[j] = seen[i] + 1
+                    nxt.append(j)
+        return nxt
+
+    def distances(self, start, end):
+        """
+        Bidirectional BFS: grows the smaller of the two frontiers until
+        they meet, which gives the shortest length, then grows the target
+        side to max_depth - 1 so the enumeration can prune with exact
+        distances. Returns (shortest length, distances to end), or
+        (None, None) when the ends are not connected within max_depth.
+        """
+        max_depth = self.options['max_depth']
+        forward, backward = {start: 0}, {end: 0}
+        forward_frontier, backward_frontier = [start], [end]
+        forward_depth = backward_depth = 0
+        shortest = None
+        while forward_frontier and backward_frontier and forward_depth + backward_depth < max_depth:
+            if self._out_of_time():
+                return None, None
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier = self._expand(forward_frontier, forward, end)
+                forward_depth += 1
+                meeting = [j for j in forward_frontier if j in backward]
+            else:
+                backward_frontier = self._expand(backward_frontier, backward, start)
+                backward_depth += 1
+                meeting = [j for j in backward_frontier if j in forward]
+            if meeting:
+                shortest = min(forward[j] + backward[j] for j in meeting)
+                break
+        if shortest is None:
+            return None, None
+
+        while backward_frontier and backward_depth < max_depth - 1:
+            if self._out_of_time():
+                return None, None
+            backward_frontier = self._expand(backward_frontier, backward, start)
+            backward_depth += 1
+        return shortest, backward
+
+    def run(self):
+        """
+        Returns paths_result() for the search, or None when either end is
+        not in the snapshot.
+        """
+        start = self.snapshot.index.get(self.options['source_id'])
+        end = self.snapshot.index.get(self.options['target_id'])
+        if start is None or end is None:
+            return None
+        k = self.options['k']
+        found = []
+        shortest, to_end = (None, None) if start == end else self.distances(start, end)
+        if shortest is not None:
+            for length in range(shortest, self.options['max_depth'] + 1):
+                self._enumerate(start, end, length, to_end, [start], [], found, k)
+                if len(found) >= k or self.expired:
+                    break
+        return paths_result([self._path(nodes, edges) for nodes, edges in found[:k]], complete=not self.expired)
+
+    def _enumerate(self, i, end, left, to_end, nodes, edges, found, k):
+        if len(found) >= k or self._out_of_time():
+            return
+        if left == 0:
+            if i == end:
+                found.append((list(nodes), list(edges)))
+            return
+        # Parallel edges of different types are different paths
+        visited_here = set()
+        for j, source, target, code in self._steps(i):
+            if (j, code) in visited_here or j in nodes or to_end.get(j, left + 1) > left - 1:
+                continue
+            if j == end and left != 1:
+                continue
+            visited_here.add((j, code))
+            nodes.append(j)
+            edges.append((source, target, code))
+            self._enumerate(j, end, left - 1, to_end, nodes, edges, found, k)
+            nodes.pop()
+            edges.pop()
+
+    def _path(self, nodes, edges):
+        snapshot = self.snapshot
+        return (
+            [snapshot.node_dict(i) for i in nodes],
+            [
+                {'source': snapshot.ids[s], 'target': snapshot.ids[t], 'relationship': snapshot.type_names[code]}
+                for s, t, code in edges
+            ],
+        )
@@ -0,0 +1,84 @@
+from schema import id_branches
+
+# Node properties a client can choose with fields=; id is always returned.
+# Descriptions are left out by default: ATT&CK's run to several KB each and
+# the graph view only shows them for the selected node, which it fetches
+# from /api/nodes.
+NODE_FIELDS = ('name', 'labels', 'external_id', 'description')
+DEFAULT_FIELDS = ('name', 'labels', 'external_id')
+
+NODE_DETAILS_RETURN = (
+    "n.id AS id, n.name AS name, labels(n) AS labels, "
+    "n.external_id AS external_id, n.description AS description"
+)
+
+
+def parse_fields(values):
+    """
+    Reads the fields= projection from the repeatable, comma-separated
+    fields parameter. Returns the set of node properties to keep: the
+    defaults when none are given, every one for 'all'. Raises ValueError
+    for unknown fields.
+    """
+    fields = [part.strip() for value in values for part in value.split(',') if part.strip()]
+    if not fields:
+        return set(DEFAULT_FIELDS)
+    if 'all' in fields:
+        return set(NODE_FIELDS)
+    invalid = [field for field in fields if field not in NODE_FIELDS and field != 'id']
+    if invalid:
+        raise ValueError(f"Invalid fields: {', '.join(invalid)}")
+    return set(fields)
+
+
+def project(record, fields):
+    """
+    Drops the node properties of record that are not in fields. id and
+    keys that are not node properties (score, techniques) are kept.
+    """
+    return {key: value for key, value in record.items() if key not in NODE_FIELDS or key in fields}
+
+
+def project_scenario(scenario, fields):
+    projected = project(scenario, fields)
+    projected['techniques'] = [project(technique, fields) for technique in scenario['techniques']]
+    return projected
+
+
+def node_details_query(node_ids):
+    branches, parameters = id_branches(node_ids, NODE_DETAILS_RETURN)
+    return "\nUNION\n".join(branches), parameters
+
+
+def details_result(records, node_ids):
+    """
+    Returns the details of the nodes in records in the order of node_ids.
+    Ids that were not found are left out.
+    """
+    found = {}
+    for record in records:
+        found[record['id']] = {
+            'id': record['id'],
+            'name': record['name'],
+            'labels': list(record['labels']),
+            'external_id': record['external_id'] or '',
+            'description': record['description'] or '',
+        }
+    return [found[node_id] for node_id in node_ids if node_id in found]
+
+
+def fetch_node_details(graph, node_ids):
+    """
+    Returns every property a client may ask for, descriptions included,
+    for a batch of node ids in one query.
+    """
+    query, parameters = node_details_query(node_ids)
+    return details_result(graph.run(query, parameters), node_ids)
+
+
+async def fetch_node_details_async(async_graph, node_ids):
+    """
+    fetch_node_details() through an AsyncGraphGateway.
+    """
+    query, parameters = node_details_query(node_ids)
+    return details_result(await async_graph.run(query, parameters), node_ids)
@@ -0,0 +1,82 @@
+from schema import id_branches
+
+# Upper bound on the seeds of one /api/related_nodes request
+MAX_SEEDS = 200
+
+# All seeds are found through their labels' id constraints inside one CALL
+# subquery, then expanded one hop in both directions in the same query.
+RELATED_EXPAND = """
+MATCH (n)-[r]-(m)
+RETURN n.id AS seed, m.id AS id, m.name AS name, labels(m) AS labels,
+       startNode(r).id AS source, endNode(r).id AS target, type(r) AS relationship
+"""
+
+
+def seed_ids(values):
+    """
+    Reads the seeds of a related-nodes request from the repeatable nodeId
+    parameter, each value possibly a comma-separated list. Returns unique
+    ids in order. Raises ValueError when there are none or too many.
+    """
+    ids = []
+    for value in values:
+        ids.extend(part.strip() for part in value.split(',') if part.strip())
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError("nodeId parameter is required")
+    if len(ids) > MAX_SEEDS:
+        raise ValueError(f"at most {MAX_SEEDS} nodeId values are allowed")
+    return ids
+
+
+def related_query(node_ids):
+    branches, parameters = id_branches(node_ids)
+    return "CALL {\n" + "\nUNION\n".join(branches) + "\n}" + RELATED_EXPAND, parameters
+
+
+def related_result(records):
+    """
+    Merges the expansion rows of every seed into one {nodes, links} graph.
+    Nodes and links are deduplicated; links keep their stored direction and
+    list the seeds whose expansion produced them under 'seeds'.
+    """
+    nodes = {}
+    links = {}
+    for record in records:
+        if record['id'] not in nodes:
+            labels = list(record['labels'])
+            nodes[record['id']] = {
+                'id': record['id'],
+                'name': record['name'],
+                'group': labels[0] if labels else 'default',
+                'labels': labels,
+            }
+        key = (record['source'], record['target'], record['relationship'])
+        link = links.get(key)
+        if link is None:
+            link = links[key] = {
+                'source': record['source'],
+                'target': record['target'],
+                'relationship': record['relationship'],
+                'seeds': [],
+            }
+        if record['seed'] not in link['seeds']:
+            link['seeds'].append(record['seed'])
+    return {'nodes': list(nodes.values()), 'links': list(links.values())}
+
+
+def fetch_related(graph, node_ids):
+    """
+    Returns the merged one-hop neighbourhood of every node in node_ids,
+    from a single query.
+    """
+    query, parameters = related_query(node_ids)
+    return related_result(graph.run(query, parameters))
+
+
+async def fetch_related_async(async_graph, node_ids):
+    """
+    fetch_related() through an AsyncGraphGateway.
+    """
+    query, parameters = related_query(node_ids)
+    return related_result(await async_graph.run(query, parameters))
@@ -0,0 +1,191 @@
+import uuid
+
+from pagination import DEFAULT_PAGE_SIZE
+from schema import cypher_name, resolve_nodes
+
+# Relationship used for targets that do not name one
+DEFAULT_RELATIONSHIP = 'USES_TECHNIQUE'
+
+# Upper bound on the targets of one bulk scenario request
+MAX_TARGETS = 500
+
+# Scenarios and techniques come back as maps of the properties the API
+# returns. Descriptions are only read when a client asks for them
+# (fields=description), so the several-KB ATT&CK texts are not shipped
+# from Neo4j for nothing.
+SCENARIO_MAP = "ts {.id, .name, description: CASE WHEN $descriptions THEN ts.description END}"
+TECHNIQUE_MAP = "t {.id, .name, .external_id, description: CASE WHEN $descriptions THEN t.description END}"
+
+# Scenarios are paged by id, which the unique id constraint keeps ordered,
+# so each page is an index range scan rather than a sort of every scenario.
+# Only scenarios with at least one technique are listed.
+SCENARIO_PAGE_QUERY = """
+MATCH (ts:ThreatScenario)
+WHERE ts.id > $after AND (ts)-[:USES_TECHNIQUE]->(:Technique)
+WITH ts ORDER BY ts.id LIMIT $limit
+MATCH (ts)-[:USES_TECHNIQUE]->(t:Technique)
+RETURN """ + SCENARIO_MAP + """ AS ts, collect(""" + TECHNIQUE_MAP + """) AS techniques
+ORDER BY ts.id
+"""
+
+# Streaming variant: the pattern comprehension collects techniques per row,
+# so unlike collect() nothing forces the whole result to be built first.
+SCENARIO_STREAM_QUERY = """
+MATCH (ts:ThreatScenario)
+WHERE ts.id > ''
+WITH ts, [(ts)-[:USES_TECHNIQUE]->(t:Technique) | """ + TECHNIQUE_MAP + """] AS techniques
+WHERE size(techniques) > 0
+RETURN """ + SCENARIO_MAP + """ AS ts, techniques
+"""
+
+CREATE_SCENARIO_QUERY = """
+CREATE (ts:ThreatScenario {id: $id, name: $name, description: $description})
+"""
+
+# Relationship types cannot be parameters, so one statement per type links
+# the scenario to all of its targets of that type. Targets are addressed
+# by internal node id, already resolved in the same transaction.
+LINK_SCENARIO_QUERY = """
+MATCH (ts:ThreatScenario {{id: $id}})
+MATCH (t) WHERE id(t) IN $targets
+CREATE (ts)-[:{relationship}]->(t)
+"""
+
+SCENARIO_COUNT_QUERY = """
+MATCH (ts:ThreatScenario)
+WHERE (ts)-[:USES_TECHNIQUE]->(:Technique)
+RETURN count(ts) AS total
+"""
+
+
+def scenario_to_dict(ts_node, technique_nodes):
+    ts = {
+        'id': ts_node['id'],
+        'name': ts_node['name'],
+        'labels': ['ThreatScenario'],
+        'description': ts_node.get('description') or '',
+        'techniques': []
+    }
+    for technique_node in technique_nodes:
+        technique = {
+            'id': technique_node['id'],
+            'name': technique_node['name'],
+            'labels': ['Technique'],
+            'description': technique_node.get('description') or '',
+            'external_id': technique_node.get('external_id') or ''
+        }
+        ts['techniques'].append(technique)
+    return ts
+
+
+def parse_targets(data):
+    """
+    Reads the targets of a bulk scenario request: a list whose items are
+    either a node id / ATT&CK external id string, or an object with
+    'target' and an optional 'relationship'. The request-level
+    'relationship' is the default. Returns unique (target, relationship)
+    pairs in order. Raises ValueError for malformed input.
+    """
+    targets = data.get('targets') or []
+    default = data.get('relationship') or DEFAULT_RELATIONSHIP
+    if not isinstance(targets, list):
+        raise ValueError("targets must be a list")
+    if len(targets) > MAX_TARGETS:
+        raise ValueError(f"at most {MAX_TARGETS} targets are allowed")
+    pairs = []
+    for item in targets:
+        if isinstance(item, str):
+            target, relationship = item, default
+        elif isinstance(item, dict):
+            target, relationship = item.get('target'), item.get('relationship') or default
+        else:
+            target, relationship = None, None
+        if not isinstance(target, str) or not target.strip() or not isinstance(relationship, str):
+            raise ValueError("each target must be an id, an external id or {target, relationship}")
+        pairs.append((target.strip(), relationship))
+    return list(dict.fromkeys(pairs))
+
+
+def create_scenario(graph, name, description, targets):
+    """
+    Creates a ThreatScenario and its relationships in one transaction.
+    targets are (node id or ATT&CK external id, relationship type) pairs,
+    all resolved in a single query. Targets that do not exist are skipped
+    and reported. Returns the response body: the scenario plus 'created'
+    and 'missing' lists of {target, relationship} (created ones with the
+    resolved node 'id').
+    """
+    scenario_id = str(uuid.uuid4())
+    created, missing = [], []
+    tx = graph.begin()
+    try:
+        nodes = resolve_nodes(tx, [target for target, _ in targets])
+        tx.run(CREATE_SCENARIO_QUERY, id=scenario_id, name=name, description=description)
+
+        by_relationship = {}
+        for target, relationship in targets:
+            node = nodes.get(target)
+            if node is None:
+                missing.append({'target': target, 'relationship': relationship})
+                continue
+            created.append({'target': target, 'id': node['id'], 'relationship': relationship})
+            by_relationship.setdefault(relationship, []).append(node.identity)
+        for relationship, identities in by_relationship.items():
+            query = LINK_SCENARIO_QUERY.format(relationship=cypher_name(relationship))
+            tx.run(query, id=scenario_id, targets=list(dict.fromkeys(identities)))
+        graph.commit(tx)
+    except Exception:
+        graph.rollback(tx)
+        raise
+
+    return {
+        'id': scenario_id,
+        'name': name,
+        'description': description,
+        'created': created,
+        'missing': missing,
+    }
+
+
+def scenario_page(graph, after='', limit=DEFAULT_PAGE_SIZE, descriptions=True):
+    """
+    Returns (scenarios, last id) for the page of scenarios whose ids sort
+    after `after`. The last id is None when there are no further pages.
+    Descriptions are empty unless `descriptions` is set.
+    """
+    # One extra row tells whether another page follows
+    results = graph.run(SCENARIO_PAGE_QUERY, after=after or '', limit=limit + 1, descriptions=descriptions).data()
+    scenarios = [scenario_to_dict(record['ts'], record['techniques']) for record in results[:limit]]
+    last_id = scenarios[-1]['id'] if len(results) > limit else None
+    return scenarios, last_id
+
+
+def count_scenarios(graph):
+    return graph.run(SCENARIO_COUNT_QUERY).evaluate()
+
+
+def iter_scenarios(graph, descriptions=True):
+    """
+    Yields every scenario as the Cypher cursor delivers it.
+    """
+    for record in graph.stream(SCENARIO_STREAM_QUERY, timeout=0, descriptions=descriptions):
+        yield scenario_to_dict(record['ts'], record['techniques'])
+
+
+async def scenario_page_async(async_graph, after='', limit=DEFAULT_PAGE_SIZE, descriptions=True):
+    """
+    scenario_page() through an AsyncGraphGateway.
+    """
+    results = await async_graph.run(SCENARIO_PAGE_QUERY, after=after or '', limit=limit + 1, descriptions=descriptions)
+    scenarios = [scenario_to_dict(record['ts'], record['techniques']) for record in results[:limit]]
+    last_id = scenarios[-1]['id'] if len(results) > limit else None
+    return scenarios, last_id
+
+
+async def count_scenarios_async(async_graph):
+    return await async_graph.evaluate(SCENARIO_COUNT_QUERY)
+
+
+async def iter_scenarios_async(async_graph, descriptions=True):
+    async for record in async_graph.stream(SCENARIO_STREAM_QUERY, timeout=0, descriptions=descriptions):
+        yield scenario_to_dict(record['ts'], record['techniques'])
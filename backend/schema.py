@@ -0,0 +1,310 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# STIX object type -> Neo4j node label, as written by stix_data_loader.py
+STIX_TYPE_LABELS = {
+    'attack-pattern': 'Technique',
+    'x-mitre-tactic': 'Tactic',
+    'x-mitre-matrix': 'Matrix',
+    'malware': 'Malware',
+    'tool': 'Tool',
+    'intrusion-set': 'IntrusionSet',
+    'campaign': 'Campaign',
+    'course-of-action': 'Mitigation',
+    'mitigation': 'Mitigation',
+    'x-mitre-data-component': 'DataComponent',
+    'x-mitre-data-source': 'DataSource',
+    'identity': 'Identity',
+    'infrastructure': 'Infrastructure',
+    'malware-analysis': 'MalwareAnalysis',
+    'note': 'Note',
+    'observed-data': 'ObservedData',
+    'opinion': 'Opinion',
+    'report': 'Report',
+    'threat-actor': 'ThreatActor',
+    'vulnerability': 'Vulnerability',
+    'indicator': 'Indicator',
+    'location': 'Location',
+    'relationship': 'Relationship',
+    # Add any new types discovered
+}
+
+# Every label that carries an 'id' property
+NODE_LABELS = sorted(set(STIX_TYPE_LABELS.values()) | {'ThreatScenario'})
+
+# ATT&CK external ids: T1059, T1059.001, TA0002, S0154, G0016, M1036, DS0017, ...
+ATTACK_ID = re.compile(r'^(T|TA|S|G|M|C|DS)\d{4}(\.\d{3})?$', re.IGNORECASE)
+
+# ATT&CK external id prefix -> labels of the nodes that can carry it
+EXTERNAL_ID_LABELS = {
+    'T': ['Technique'],
+    'TA': ['Tactic'],
+    'S': ['Tool', 'Malware'],
+    'G': ['IntrusionSet'],
+    'M': ['Mitigation'],
+    'C': ['Campaign'],
+    'DS': ['DataSource'],
+}
+
+# Full-text index over node names, ATT&CK ids and descriptions, behind /api/search
+FULLTEXT_INDEX = 'node_text'
+FULLTEXT_PROPERTIES = ['name', 'external_id', 'description']
+
+# Queries whose plans are checked by report_index_usage(), with sample
+# parameters. They mirror the lookups made by the API and the loader.
+HOT_QUERIES = {
+    'node by id': (
+        "MATCH (n:Technique {id: $id}) RETURN n",
+        {'id': 'attack-pattern--00000000-0000-0000-0000-000000000000'},
+    ),
+    'node by external_id': (
+        "MATCH (n:Technique {external_id: $external_id}) RETURN n",
+        {'external_id': 'T1059'},
+    ),
+    'related nodes': (
+        "MATCH (n:Technique {id: $id})-[r]-(m) RETURN m, type(r) AS relationship",
+        {'id': 'attack-pattern--00000000-0000-0000-0000-000000000000'},
+    ),
+    'loader detach': (
+        "MATCH ()-[r:USES {stix_id: $stix_id}]->() RETURN r",
+        {'stix_id': 'relationship--00000000-0000-0000-0000-000000000000'},
+    ),
+    'loader merge': (
+        "UNWIND $rows AS row MERGE (n:Technique {id: row.id}) RETURN n",
+        {'rows': []},
+    ),
+}
+
+
+def cypher_name(name):
+    """
+    Backtick-quotes a label, relationship type or index name for Cypher.
+    """
+    return '`' + name.replace('`', '``') + '`'
+
+
+def label_for_id(node_id):
+    """
+    Returns the label of the node with this id. STIX ids carry their type as
+    a prefix ('attack-pattern--...'), and ThreatScenario ids are plain UUIDs.
+    Returns None when the id does not identify a label.
+    """
+    if not node_id:
+        return None
+    if '--' not in node_id:
+        return 'ThreatScenario'
+    return STIX_TYPE_LABELS.get(node_id.split('--', 1)[0])
+
+
+def id_match(variable, node_id, parameter):
+    """
+    Builds a label-scoped `(variable:Label {id: $parameter})` pattern for
+    node_id so the lookup can use the unique id constraint. Falls back to
+    an unlabelled pattern when the label cannot be derived from the id.
+    """
+    label = label_for_id(node_id)
+    if label:
+        return f"({variable}:{cypher_name(label)} {{id: ${parameter}}})"
+    return f"({variable} {{id: ${parameter}}})"
+
+
+def match_node(graph, node_id):
+    """
+    Fetches a node by id through the unique id constraint of its label.
+    """
+    label = label_for_id(node_id)
+    labels = [label] if label else []
+    return graph.nodes.match(*labels, id=node_id).first()
+
+
+def merge_relationship_query(source_id, relationship_type, target_id):
+    """
+    Builds the idempotent relationship write: MERGE on (source, type,
+    target), so a retried or double-submitted request finds the existing
+    edge instead of adding a parallel one. The query returns one row whose
+    `created` tells whether the edge is new, and no row when either node
+    does not exist. Returns (query, parameters).
+    """
+    relationship = cypher_name(relationship_type)
+    query = (
+        f"MATCH {id_match('s', source_id, 'sourceId')}, {id_match('t', target_id, 'targetId')}\n"
+        f"OPTIONAL MATCH (s)-[existing:{relationship}]->(t)\n"
+        f"WITH s, t, count(existing) = 0 AS created\n"
+        f"MERGE (s)-[:{relationship}]->(t)\n"
+        f"RETURN created"
+    )
+    return query, {'sourceId': source_id, 'targetId': target_id}
+
+
+def id_branches(node_ids, returns='n'):
+    """
+    Builds `MATCH ... WHERE n.id IN $idsN RETURN <returns>` statements for
+    node_ids, one per label derived from the ids, so that each one is an
+    index seek on that label's id constraint. Ids without a known label
+    get an unlabelled branch. Returns (branches, parameters).
+    """
+    ids_by_label = {}
+    for node_id in node_ids:
+        ids_by_label.setdefault(label_for_id(node_id), set()).add(node_id)
+    branches = []
+    parameters = {}
+    for i, (label, ids) in enumerate(ids_by_label.items()):
+        pattern = f"(n:{cypher_name(label)})" if label else "(n)"
+        branches.append(f"MATCH {pattern} WHERE n.id IN $ids{i} RETURN {returns}")
+        parameters[f'ids{i}'] = sorted(ids)
+    return branches, parameters
+
+
+def resolve_nodes_query(refs):
+    """
+    Builds one query resolving many node references, each either a node id
+    or an ATT&CK external id. Every label gets its own UNION branch with an
+    `IN` list, so each lookup is an index seek on the id constraint or the
+    external_id index. Returns (query, parameters); the query yields
+    `ref, node`, or None when there is nothing to resolve.
+    """
+    node_ids = []
+    external_by_label = {}
+    for ref in refs:
+        match = ATTACK_ID.match(ref)
+        if match:
+            for label in EXTERNAL_ID_LABELS[match.group(1).upper()]:
+                external_by_label.setdefault(label, set()).add(ref.upper())
+        else:
+            node_ids.append(ref)
+
+    branches, parameters = id_branches(node_ids, 'n.id AS ref, n AS node')
+    for i, (label, external_ids) in enumerate(external_by_label.items()):
+        branches.append(
+            f"MATCH (n:{cypher_name(label)}) WHERE n.external_id IN $externalIds{i} "
+            f"RETURN n.external_id AS ref, n AS node"
+        )
+        parameters[f'externalIds{i}'] = sorted(external_ids)
+    if not branches:
+        return None, parameters
+    return "\nUNION\n".join(branches), parameters
+
+
+def resolve_nodes(runner, refs):
+    """
+    Resolves node ids and ATT&CK external ids in a single query. runner is
+    a graph or an open transaction. Returns {ref: node} for the references
+    that exist; external ids match case-insensitively.
+    """
+    query, parameters = resolve_nodes_query(refs)
+    if not query:
+        return {}
+    found = {}
+    for record in runner.run(query, parameters):
+        found.setdefault(record['ref'], record['node'])
+    resolved = {}
+    for ref in refs:
+        key = ref.upper() if ATTACK_ID.match(ref) else ref
+        if key in found:
+            resolved[ref] = found[key]
+    return resolved
+
+
+def schema_statements(relationship_types=()):
+    """
+    Returns the idempotent constraint and index statements for the graph,
+    with a stix_id index for each of relationship_types so the loader can
+    find the edge of a STIX relationship without scanning every edge.
+    """
+    statements = []
+    for label in NODE_LABELS:
+        statements.append(
+            f"CREATE CONSTRAINT {cypher_name(label + '_id_unique')} IF NOT EXISTS "
+            f"FOR (n:{cypher_name(label)}) REQUIRE n.id IS UNIQUE"
+        )
+        statements.append(
+            f"CREATE INDEX {cypher_name(label + '_external_id')} IF NOT EXISTS "
+            f"FOR (n:{cypher_name(label)}) ON (n.external_id)"
+        )
+    labels = '|'.join(cypher_name(label) for label in NODE_LABELS)
+    properties = ', '.join(f"n.{name}" for name in FULLTEXT_PROPERTIES)
+    statements.append(
+        f"CREATE FULLTEXT INDEX {cypher_name(FULLTEXT_INDEX)} IF NOT EXISTS "
+        f"FOR (n:{labels}) ON EACH [{properties}]"
+    )
+    for relationship_type in relationship_types:
+        statements.append(
+            f"CREATE INDEX {cypher_name(relationship_type + '_stix_id')} IF NOT EXISTS "
+            f"FOR ()-[r:{cypher_name(relationship_type)}]-() ON (r.stix_id)"
+        )
+    return statements
+
+
+def relationship_types_in(graph):
+    """
+    Returns the relationship types present in the graph.
+    """
+    return [record['relationshipType'] for record in graph.run("CALL db.relationshipTypes() YIELD relationshipType")]
+
+
+def ensure_schema(graph, wait_seconds=300):
+    """
+    Creates the unique id constraints, external_id indexes, the full-text
+    index and the relationship stix_id indexes if they are missing, then
+    waits for them to come online. Safe to run any number of times.
+    """
+    relationship_types = relationship_types_in(graph)
+    for statement in schema_statements(relationship_types):
+        graph.run(statement)
+    # Index population may take a while; allow for it beyond the query timeout
+    graph.run("CALL db.awaitIndexes($seconds)", seconds=wait_seconds, timeout=wait_seconds + 30)
+    logger.info(f"Schema ensured: {len(NODE_LABELS)} id constraints, {len(NODE_LABELS)} external_id indexes, "
+                f"full-text index '{FULLTEXT_INDEX}', {len(relationship_types)} stix_id indexes")
+
+
+def _plan_operators(plan):
+    """
+    Yields the operator names of a query plan tree. Accepts both the plan
+    objects returned by py2neo and plain dicts.
+    """
+    if plan is None:
+        return
+    if isinstance(plan, dict):
+        operator = plan.get('operatorType') or plan.get('operator_type')
+        children = plan.get('children', [])
+    else:
+        operator = getattr(plan, 'operator_type', None)
+        children = getattr(plan, 'children', [])
+    if operator:
+        yield operator
+    for child in children or []:
+        yield from _plan_operators(child)
+
+
+def report_index_usage(graph):
+    """
+    EXPLAINs each hot query and reports whether its plan uses an index.
+    Returns {query name: [index operators]}; an empty list means the query
+    still scans.
+    """
+    report = {}
+    for name, (query, parameters) in HOT_QUERIES.items():
+        try:
+            cursor = graph.run("EXPLAIN " + query, parameters)
+            operators = list(_plan_operators(cursor.plan()))
+        except Exception as e:
+            logger.warning(f"Could not explain '{name}': {e}")
+            continue
+        index_operators = [op for op in operators if 'Index' in op]
+        report[name] = index_operators
+        if index_operators:
+            logger.info(f"Query '{name}' uses: {', '.join(sorted(set(index_operators)))}")
+        else:
+            logger.warning(f"Query '{name}' does not use an index: {', '.join(operators)}")
+    return report
+
+
+if __name__ == '__main__':
+    from gateway import GraphGateway
+
+    logging.basicConfig(level=logging.INFO)
+    graph = GraphGateway()
+    ensure_schema(graph)
+    report_index_usage(graph)
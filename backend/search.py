@@ -0,0 +1,192 @@
+import re
+
+from schema import ATTACK_ID, FULLTEXT_INDEX
+
+# Labels accepted by the 'type' filter of /api/search
+VALID_TYPES = [
+    'ThreatScenario', 'Technique', 'SubTechnique', 'Campaign',
+    'Tool', 'Tactic', 'DataSource', 'DataComponent', 'Mitigation'
+]
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+
+# Characters with a meaning in the Lucene query syntax
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+# Lucene returns hits best-first, so the LIMIT stops the index scan early
+# and latency does not grow with the graph. Relevance has no stable key,
+# so pages are positions in the ranking. STIX relationship objects (no
+# name, only a description) and nodes a delta load flagged as removed
+# upstream are left out.
+SEARCH_MATCH = """
+CALL db.index.fulltext.queryNodes($index, $lucene) YIELD node, score
+WITH node, score
+WHERE NOT node:Relationship AND NOT coalesce(node.removed, false)
+  AND (size($types) = 0 OR ANY(label IN labels(node) WHERE label IN $types))
+"""
+
+SEARCH_RETURN = """
+RETURN node.id AS id, node.name AS name, labels(node) AS labels,
+       node.external_id AS external_id, score,
+       CASE WHEN $descriptions THEN node.description END AS description,
+       toUpper(coalesce(node.external_id, '')) = $externalId AS exact
+"""
+
+SEARCH_QUERY = SEARCH_MATCH + "WITH node, score SKIP $skip LIMIT $limit" + SEARCH_RETURN
+
+# An ATT&CK id as the term: exact matches go first on every page, so the
+# hits are sorted before paging. Only nodes mentioning the id match, so
+# the sort stays small.
+SEARCH_EXACT_QUERY = SEARCH_MATCH + SEARCH_RETURN + "ORDER BY exact DESC, score DESC SKIP $skip LIMIT $limit"
+
+# Every hit in Lucene order, for streaming; the exact id boost keeps exact
+# matches at the front without a sort.
+SEARCH_STREAM_QUERY = SEARCH_MATCH + SEARCH_RETURN
+
+SEARCH_COUNT_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $lucene) YIELD node
+WHERE NOT node:Relationship AND NOT coalesce(node.removed, false)
+  AND (size($types) = 0 OR ANY(label IN labels(node) WHERE label IN $types))
+RETURN count(node) AS total
+"""
+
+
+def escape_lucene(text):
+    return LUCENE_SPECIAL.sub(r'\\\1', text)
+
+
+def lucene_query(term):
+    """
+    Builds the Lucene query for a search term. An exact external id weighs
+    most, then the whole term in the name, then every word in the name
+    (the last one as a prefix, for typeahead), then the description.
+    """
+    words = [escape_lucene(word.lower()) for word in term.split()]
+    phrase = escape_lucene(term)
+    prefix = ' AND '.join(words[:-1] + [words[-1] + '*'])
+    return ' OR '.join([
+        f'external_id:"{phrase}"^20',
+        f'name:"{phrase}"^5',
+        f'name:({prefix})^2',
+        f"description:({' AND '.join(words)})",
+    ])
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT, name='limit'):
+    """
+    Parses a 'limit' (or other count) query parameter, capped at maximum.
+    Raises ValueError when it is not a positive integer.
+    """
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    return min(limit, maximum)
+
+
+def search_parameters(term, types, descriptions=False):
+    return {
+        'index': FULLTEXT_INDEX,
+        'lucene': lucene_query(term),
+        'types': list(types or []),
+        'externalId': term.upper() if ATTACK_ID.match(term) else None,
+        'descriptions': descriptions,
+    }
+
+
+def search_query(parameters):
+    return SEARCH_EXACT_QUERY if parameters['externalId'] else SEARCH_QUERY
+
+
+def search_result(record):
+    return {
+        'id': record['id'],
+        'name': record['name'],
+        'labels': list(record['labels']),
+        'external_id': record['external_id'] or '',
+        'description': record['description'] or '',
+        'score': round(record['score'], 4),
+    }
+
+
+def search_nodes(graph, term, types=None, limit=DEFAULT_LIMIT, offset=0, descriptions=False):
+    """
+    Ranked full-text search over node names, ATT&CK ids and descriptions.
+    Returns at most limit nodes from position offset of the ranking, exact
+    ATT&CK id matches first, then by relevance.
+    """
+    term = term.strip()
+    if not term:
+        return []
+    parameters = search_parameters(term, types, descriptions)
+    results = graph.run(search_query(parameters), parameters, skip=offset, limit=limit).data()
+    return [search_result(record) for record in results]
+
+
+def iter_search(graph, term, types=None, descriptions=False):
+    """
+    Yields every match for term as the Cypher cursor delivers it.
+    """
+    term = term.strip()
+    if not term:
+        return
+    for record in graph.stream(SEARCH_STREAM_QUERY, search_parameters(term, types, descriptions), timeout=0):
+        yield search_result(record)
+
+
+def search_page(graph, term, types=None, limit=DEFAULT_LIMIT, offset=0, descriptions=False):
+    """
+    Returns (nodes, next offset) for one page of search_nodes(). The next
+    offset is None on the last page.
+    """
+    # One extra row tells whether another page follows
+    nodes = search_nodes(graph, term, types, limit + 1, offset, descriptions)
+    if len(nodes) > limit:
+        return nodes[:limit], offset + limit
+    return nodes, None
+
+
+def count_matches(graph, term, types=None):
+    """
+    Counts every node matching term. Walks all hits, so it is only run
+    when a client asks for a total.
+    """
+    term = term.strip()
+    if not term:
+        return 0
+    return graph.run(SEARCH_COUNT_QUERY, search_parameters(term, types)).evaluate()
+
+
+async def search_page_async(async_graph, term, types=None, limit=DEFAULT_LIMIT, offset=0, descriptions=False):
+    """
+    search_page() through an AsyncGraphGateway.
+    """
+    term = term.strip()
+    if not term:
+        return [], None
+    parameters = search_parameters(term, types, descriptions)
+    results = await async_graph.run(search_query(parameters), parameters, skip=offset, limit=limit + 1)
+    nodes = [search_result(record) for record in results]
+    if len(nodes) > limit:
+        return nodes[:limit], offset + limit
+    return nodes, None
+
+
+async def count_matches_async(async_graph, term, types=None):
+    term = term.strip()
+    if not term:
+        return 0
+    return await async_graph.evaluate(SEARCH_COUNT_QUERY, search_parameters(term, types))
+
+
+async def iter_search_async(async_graph, term, types=None, descriptions=False):
+    term = term.strip()
+    if not term:
+        return
+    async for record in async_graph.stream(SEARCH_STREAM_QUERY, search_parameters(term, types, descriptions), timeout=0):
+        yield search_result(record)
@@ -0,0 +1,265 @@
+"""
+Similar-scenario search over technique-set bitsets.
+
+Every ThreatScenario is encoded as packed bitsets of the techniques it
+USES_TECHNIQUE, at three levels: the techniques themselves, rolled up to
+parent techniques (T1059.001 counts as T1059), and rolled up to the
+tactics those techniques support. A bitset is a Python int with one bit
+per feature, so the overlap of two scenarios is a single AND and a
+popcount, and a top-k query is one pass over the scenarios.
+
+Like the coverage matrix, each API process holds its own index. It is
+loaded on first use, updated in place by the writes that process makes,
+and reloaded when the graph version moves past what it has applied.
+"""
+import heapq
+import logging
+import math
+import threading
+
+from schema import label_for_id
+from search import parse_limit
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('technique', 'parent', 'tactic')
+METRICS = ('jaccard', 'cosine')
+DEFAULT_RESULTS = 10
+MAX_RESULTS = 100
+
+TECHNIQUES_QUERY = """
+MATCH (x:Technique)
+RETURN x.id AS id, x.name AS name, x.external_id AS external_id,
+       [(x)-[:SUPPORTS]->(t:Tactic) | t.id] AS tactics
+"""
+
+TACTICS_QUERY = """
+MATCH (t:Tactic)
+RETURN t.id AS id, t.name AS name, t.external_id AS external_id
+"""
+
+SCENARIOS_QUERY = """
+MATCH (ts:ThreatScenario)
+RETURN ts.id AS id, ts.name AS name, [(ts)-[:USES_TECHNIQUE]->(x:Technique) | x.id] AS techniques
+"""
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def set_bits(bits):
+    """
+    Yields the positions of the set bits of bits, lowest first.
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def similarity_options(args):
+    """
+    Reads the similar-scenarios query parameters from a Flask or Django
+    query dict: scenarioId, k, metric and level. Raises ValueError for
+    invalid values.
+    """
+    scenario_id = args.get('scenarioId', '')
+    if not scenario_id:
+        raise ValueError("scenarioId parameter is required")
+    metric = args.get('metric') or 'jaccard'
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    level = args.get('level') or 'technique'
+    if level not in LEVELS:
+        raise ValueError(f"level must be one of: {', '.join(LEVELS)}")
+    return {
+        'scenario_id': scenario_id,
+        'k': parse_limit(args.get('k'), DEFAULT_RESULTS, MAX_RESULTS, name='k'),
+        'metric': metric,
+        'level': level,
+    }
+
+
+class SimilarityIndex:
+    """
+    Per-scenario feature bitsets at each level, with a document frequency
+    per feature so that cosine scores can weight rare techniques above
+    ones nearly every scenario uses.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.features = []                                 # bit -> {id, name, external_id}
+        self.bit = {}                                      # feature id -> bit
+        self.roll_up = {}                                  # technique id -> {level: bitset}
+        self.scenarios = {}                                # scenario id -> name
+        self.scenario_techniques = {}                      # scenario id -> set of technique ids
+        self.bitsets = {level: {} for level in LEVELS}     # level -> scenario id -> bitset
+        self.frequency = {level: {} for level in LEVELS}   # level -> bit -> scenarios with it
+
+    def _feature(self, record):
+        bit = self.bit.get(record['id'])
+        if bit is None:
+            bit = self.bit[record['id']] = len(self.features)
+            self.features.append({'id': record['id'], 'name': record['name'], 'external_id': record['external_id'] or ''})
+        return bit
+
+    def load(self, graph, version=None):
+        """
+        Rebuilds the whole index from the graph.
+        """
+        techniques = [dict(record) for record in graph.run(TECHNIQUES_QUERY)]
+        tactics = [dict(record) for record in graph.run(TACTICS_QUERY)]
+        scenarios = [dict(record) for record in graph.run(SCENARIOS_QUERY)]
+
+        with self.lock:
+            self.features = []
+            self.bit = {}
+            for record in techniques + tactics:
+                self._feature(record)
+            by_external_id = {t['external_id']: t['id'] for t in techniques if t['external_id']}
+            self.roll_up = {}
+            for t in techniques:
+                parent = by_external_id.get((t['external_id'] or '').split('.')[0], t['id'])
+                tactic_bits = 0
+                for tactic_id in t['tactics']:
+                    if tactic_id in self.bit:
+                        tactic_bits |= 1 << self.bit[tactic_id]
+                self.roll_up[t['id']] = {
+                    'technique': 1 << self.bit[t['id']],
+                    'parent': 1 << self.bit[parent],
+                    'tactic': tactic_bits,
+                }
+            self.scenarios = {}
+            self.scenario_techniques = {}
+            self.bitsets = {level: {} for level in LEVELS}
+            self.frequency = {level: {} for level in LEVELS}
+            for record in scenarios:
+                self.scenarios[record['id']] = record['name']
+                self.scenario_techniques[record['id']] = set()
+                self._add_techniques(record['id'], record['techniques'])
+            self.version = version
+        logger.info(f"Similarity index loaded: {len(self.scenarios)} scenarios, {len(self.features)} features")
+
+    def refresh(self, graph, version):
+        """
+        Reloads the index unless it already reflects graph version.
+        """
+        if self.version is None or self.version != version:
+            self.load(graph, version)
+
+    def _advance(self, version):
+        # Same rule as CoverageMatrix: only a one-step move is this
+        # process's own write; anything else forces a reload.
+        if version is None:
+            return
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+        else:
+            self.version = None
+
+    def _add_techniques(self, scenario_id, technique_ids):
+        """
+        Adds techniques to a scenario and updates its bitsets and the
+        feature frequencies. Returns False when a technique is not in the
+        index (created after the load), so the caller can force a reload.
+        """
+        known = self.scenario_techniques[scenario_id]
+        complete = True
+        for technique_id in technique_ids:
+            if technique_id not in self.roll_up:
+                complete = False
+            else:
+                known.add(technique_id)
+        for level in LEVELS:
+            old = self.bitsets[level].get(scenario_id, 0)
+            new = 0
+            for technique_id in known:
+                new |= self.roll_up[technique_id][level]
+            self.bitsets[level][scenario_id] = new
+            frequency = self.frequency[level]
+            for bit in set_bits(new & ~old):
+                frequency[bit] = frequency.get(bit, 0) + 1
+        return complete
+
+    def add_scenario(self, scenario_id, name, technique_ids=(), version=None):
+        """
+        Records a new scenario and the techniques it uses.
+        """
+        with self.lock:
+            self.scenarios[scenario_id] = name
+            self.scenario_techniques.setdefault(scenario_id, set())
+            techniques = [t for t in technique_ids if label_for_id(t) == 'Technique']
+            if self._add_techniques(scenario_id, techniques):
+                self._advance(version)
+            else:
+                self.version = None
+
+    def add_relationship(self, source_id, relationship_type, target_id, version=None):
+        """
+        Applies a created relationship. A USES_TECHNIQUE edge from a scenario
+        updates its bitsets in place; a new SUPPORTS edge changes the
+        tactic roll-up, so it forces a reload instead.
+        """
+        with self.lock:
+            target_label = label_for_id(target_id)
+            if relationship_type == 'USES_TECHNIQUE' and source_id in self.scenarios and target_label == 'Technique':
+                if not self._add_techniques(source_id, [target_id]):
+                    self.version = None
+                    return
+            elif relationship_type == 'SUPPORTS' and target_label == 'Tactic':
+                self.version = None
+                return
+            self._advance(version)
+
+    def similar(self, options):
+        """
+        Returns the k scenarios most similar to options['scenario_id'] at
+        options['level'], by Jaccard index or by cosine with inverse
+        document frequency weights, each with the features it shares with
+        the query scenario. Returns None when the scenario is unknown.
+        """
+        scenario_id, level, k = options['scenario_id'], options['level'], options['k']
+        with self.lock:
+            if scenario_id not in self.scenarios:
+                return None
+            bitsets = self.bitsets[level]
+            query = bitsets[scenario_id]
+            if options['metric'] == 'cosine':
+                count = len(self.scenarios)
+                frequency = self.frequency[level]
+                weight = {bit: math.log(1 + count / frequency[bit]) ** 2 for bit in frequency}
+                norms = {}
+
+                def norm(bits):
+                    return math.sqrt(sum(weight[bit] for bit in set_bits(bits)))
+
+                query_norm = norm(query)
+
+                def score(other, shared):
+                    if other not in norms:
+                        norms[other] = norm(bitsets[other])
+                    return sum(weight[bit] for bit in set_bits(shared)) / (query_norm * norms[other])
+            else:
+                def score(other, shared):
+                    return popcount(shared) / popcount(query | bitsets[other])
+
+            candidates = []
+            for other, bits in bitsets.items():
+                shared = query & bits
+                if other != scenario_id and shared:
+                    candidates.append((score(other, shared), other, shared))
+            top = heapq.nsmallest(k, candidates, key=lambda c: (-c[0], c[1]))
+            results = [
+                {
+                    'id': other,
+                    'name': self.scenarios[other],
+                    'score': round(value, 4),
+                    'shared': [self.features[bit] for bit in set_bits(shared)],
+                }
+                for value, other, shared in top
+            ]
+            scenario = {'id': scenario_id, 'name': self.scenarios[scenario_id], 'features': popcount(query)}
+        return {'scenario': scenario, 'metric': options['metric'], 'level': level, 'results': results}
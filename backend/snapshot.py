@@ -0,0 +1,372 @@
+"""
+Optional in-process read engine over a compact snapshot of the graph.
+
+With GRAPH_SNAPSHOT=true the API loads every node and relationship once
+and answers related_nodes, neighborhood, paths, nodes and threat_scenarios
+from memory. Nodes are numbered 0..n-1 and relationships are stored as
+CSR adjacency arrays for each direction: the neighbours of node i are
+targets[offsets[i]:offsets[i + 1]], with a parallel array of relationship
+type codes. Neo4j then only serves writes and the version check.
+
+The snapshot follows the graph version. Writes made by the same process
+are patched in, and a version change from anywhere else (a load, another
+process) triggers a rebuild on the next read. Patched relationships are
+kept in small overflow lists beside the CSR arrays, and after
+SNAPSHOT_MAX_PATCHES of them the snapshot is rebuilt.
+"""
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right, insort
+
+from neighborhood import neighborhood_result
+from projection import details_result
+from related import related_result
+from scenarios import scenario_to_dict
+from streaming import EXPORT_LINKS_QUERY
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.environ.get('GRAPH_SNAPSHOT', 'false').lower() in ('1', 'true', 'yes')
+MAX_PATCHES = int(os.environ.get('SNAPSHOT_MAX_PATCHES', '1000'))
+
+SNAPSHOT_NODES_QUERY = """
+MATCH (n)
+WHERE n.id IS NOT NULL AND NOT n:GraphVersion
+RETURN n.id AS id, labels(n) AS labels, n.name AS name,
+       n.external_id AS external_id, n.description AS description
+"""
+
+
+def build_csr(count, pairs):
+    """
+    Builds (offsets, neighbours, types) for count nodes from (node,
+    neighbour, type code) triples.
+    """
+    offsets = array('i', [0]) * (count + 1)
+    for node, _, _ in pairs:
+        offsets[node + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    neighbours = array('i', [0]) * len(pairs)
+    types = array('H', [0]) * len(pairs)
+    position = array('i', offsets[:-1]) if count else array('i')
+    for node, neighbour, type_code in pairs:
+        slot = position[node]
+        neighbours[slot] = neighbour
+        types[slot] = type_code
+        position[node] = slot + 1
+    return offsets, neighbours, types
+
+
+class GraphSnapshot:
+    """
+    Immutable-size CSR image of the graph plus overflow lists for patched
+    nodes and relationships. Node attributes are parallel lists indexed by
+    node number; label sets and relationship types are interned.
+    """
+
+    def __init__(self, nodes, links):
+        self.ids = []
+        self.index = {}
+        self.labels = []
+        self.names = []
+        self.external_ids = []
+        self.descriptions = []
+        self.label_sets = {}
+        for node in nodes:
+            self._append_node(node['id'], node['labels'], node['name'], node['external_id'], node['description'])
+
+        self.type_names = []
+        self.type_codes = {}
+        outgoing = []
+        incoming = []
+        for source, target, relationship in links:
+            s, t = self.index.get(source), self.index.get(target)
+            if s is None or t is None:
+                continue
+            code = self._type_code(relationship)
+            outgoing.append((s, t, code))
+            incoming.append((t, s, code))
+        self.base_count = len(self.ids)
+        self.out_offsets, self.out_targets, self.out_types = build_csr(self.base_count, outgoing)
+        self.in_offsets, self.in_sources, self.in_types = build_csr(self.base_count, incoming)
+        self.relationship_count = len(outgoing)
+
+        # Relationships patched in after the build: node -> [(neighbour, code)]
+        self.extra_out = {}
+        self.extra_in = {}
+        self.patches = 0
+
+        self.scenario_ids = sorted(self.ids[i] for i, labels in enumerate(self.labels) if 'ThreatScenario' in labels)
+
+    @classmethod
+    def load(cls, graph):
+        start = time.perf_counter()
+        nodes = graph.run(SNAPSHOT_NODES_QUERY)
+        links = ((r['source'], r['target'], r['relationship']) for r in graph.run(EXPORT_LINKS_QUERY))
+        snapshot = cls(nodes, links)
+        logger.info(
+            f"Graph snapshot built: {len(snapshot.ids)} nodes, {snapshot.relationship_count} relationships "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return snapshot
+
+    def _append_node(self, node_id, labels, name, external_id, description):
+        labels = tuple(labels or ())
+        self.index[node_id] = len(self.ids)
+        self.ids.append(node_id)
+        self.labels.append(self.label_sets.setdefault(labels, labels))
+        self.names.append(name)
+        self.external_ids.append(external_id or '')
+        self.descriptions.append(description or '')
+
+    def _type_code(self, relationship):
+        code = self.type_codes.get(relationship)
+        if code is None:
+            code = self.type_codes[relationship] = len(self.type_names)
+            self.type_names.append(relationship)
+        return code
+
+    # Patches
+
+    def add_node(self, node_id, labels, name, description='', external_id=''):
+        if node_id in self.index:
+            return
+        self._append_node(node_id, labels, name, external_id, description)
+        if 'ThreatScenario' in labels:
+            insort(self.scenario_ids, node_id)
+        self.patches += 1
+
+    def add_relationship(self, source_id, relationship, target_id):
+        """
+        Patches in one relationship. Returns False when an endpoint is not
+        in the snapshot.
+        """
+        s, t = self.index.get(source_id), self.index.get(target_id)
+        if s is None or t is None:
+            return False
+        code = self._type_code(relationship)
+        self.extra_out.setdefault(s, []).append((t, code))
+        self.extra_in.setdefault(t, []).append((s, code))
+        self.relationship_count += 1
+        self.patches += 1
+        return True
+
+    # Traversal
+
+    def outgoing(self, i):
+        """
+        Yields (neighbour, type code) for the relationships leaving node i.
+        """
+        if i < self.base_count:
+            for slot in range(self.out_offsets[i], self.out_offsets[i + 1]):
+                yield self.out_targets[slot], self.out_types[slot]
+        yield from self.extra_out.get(i, ())
+
+    def incoming(self, i):
+        if i < self.base_count:
+            for slot in range(self.in_offsets[i], self.in_offsets[i + 1]):
+                yield self.in_sources[slot], self.in_types[slot]
+        yield from self.extra_in.get(i, ())
+
+    def edges(self, i):
+        """
+        Yields (neighbour, source, target, type code) for every relationship
+        of node i in either direction, with its stored direction.
+        """
+        for j, code in self.outgoing(i):
+            yield j, i, j, code
+        for j, code in self.incoming(i):
+            yield j, j, i, code
+
+    def node_dict(self, i):
+        return {'id': self.ids[i], 'name': self.names[i], 'labels': list(self.labels[i])}
+
+    # Read endpoints
+
+    def related(self, node_ids):
+        """
+        related.fetch_related() answered from the snapshot.
+        """
+        rows = []
+        for seed in node_ids:
+            i = self.index.get(seed)
+            if i is None:
+                continue
+            for j, source, target, code in self.edges(i):
+                rows.append({
+                    'seed': seed,
+                    'id': self.ids[j],
+                    'name': self.names[j],
+                    'labels': self.labels[j],
+                    'source': self.ids[source],
+                    'target': self.ids[target],
+                    'relationship': self.type_names[code],
+                })
+        return related_result(rows)
+
+    def details(self, node_ids):
+        """
+        projection.fetch_node_details() answered from the snapshot.
+        """
+        rows = []
+        for node_id in node_ids:
+            i = self.index.get(node_id)
+            if i is not None:
+                rows.append({
+                    'id': node_id,
+                    'name': self.names[i],
+                    'labels': self.labels[i],
+                    'external_id': self.external_ids[i],
+                    'description': self.descriptions[i],
+                })
+        return details_result(rows, node_ids)
+
+    def neighborhood(self, options):
+        """
+        neighborhood.fetch_neighborhood() answered from the snapshot: the
+        same bounded breadth-first expansion, per-hop and total limits and
+        label and relationship filters.
+        """
+        seed = self.index.get(options['node_id'])
+        if seed is None:
+            return None
+        labels = set(options['labels'])
+        codes = {self.type_codes.get(t) for t in options['relationships']} if options['relationships'] else None
+        limit, hop_limit = options['limit'], options['hop_limit']
+
+        visited = {seed}
+        order = [seed]
+        frontier = [seed]
+        levels = []
+        edges = {}   # ordered set of (source, target, type code)
+        for _ in range(options['depth']):
+            found = []
+            found_set = set()
+            for f in frontier:
+                for j, source, target, code in self.edges(f):
+                    if codes is not None and code not in codes:
+                        continue
+                    if labels and labels.isdisjoint(self.labels[j]):
+                        continue
+                    edges[(source, target, code)] = None
+                    if j not in visited and j not in found_set:
+                        found_set.add(j)
+                        found.append(j)
+            found = found[:hop_limit][:max(limit - len(order), 0)]
+            visited.update(found)
+            order.extend(found)
+            levels.append([self.ids[j] for j in found])
+            frontier = found
+
+        record = {
+            'nodes': [self.node_dict(i) for i in order],
+            'levels': levels,
+            'links': [
+                {'source': self.ids[s], 'target': self.ids[t], 'relationship': self.type_names[code]}
+                for s, t, code in edges if s in visited and t in visited
+            ],
+        }
+        return neighborhood_result(record, options)
+
+    def _scenario(self, scenario_id):
+        """
+        Returns the scenario dict for scenario_id, or None when it uses no
+        technique (those are not listed, as in SCENARIO_PAGE_QUERY).
+        """
+        i = self.index[scenario_id]
+        uses = self.type_codes.get('USES_TECHNIQUE')
+        techniques = [
+            {'id': self.ids[j], 'name': self.names[j], 'description': self.descriptions[j], 'external_id': self.external_ids[j]}
+            for j, code in self.outgoing(i)
+            if code == uses and 'Technique' in self.labels[j]
+        ]
+        if not techniques:
+            return None
+        ts = {'id': scenario_id, 'name': self.names[i], 'description': self.descriptions[i]}
+        return scenario_to_dict(ts, techniques)
+
+    def iter_scenarios(self):
+        for scenario_id in list(self.scenario_ids):
+            scenario = self._scenario(scenario_id)
+            if scenario:
+                yield scenario
+
+    def scenario_page(self, after='', limit=50):
+        """
+        scenarios.scenario_page() answered from the snapshot.
+        """
+        scenarios = []
+        position = bisect_right(self.scenario_ids, after or '')
+        for scenario_id in self.scenario_ids[position:]:
+            scenario = self._scenario(scenario_id)
+            if scenario:
+                scenarios.append(scenario)
+                if len(scenarios) > limit:
+                    return scenarios[:limit], scenarios[limit - 1]['id']
+        return scenarios, None
+
+    def count_scenarios(self):
+        return sum(1 for scenario_id in self.scenario_ids if self._scenario(scenario_id))
+
+
+class SnapshotEngine:
+    """
+    Holds the current GraphSnapshot of an API process and keeps it in step
+    with the graph version. get() returns None when the engine is
+    disabled, so callers fall back to Cypher.
+    """
+
+    def __init__(self, enabled=None, max_patches=None):
+        self.enabled = SNAPSHOT_ENABLED if enabled is None else enabled
+        self.max_patches = MAX_PATCHES if max_patches is None else max_patches
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.version = None
+
+    def get(self, graph, version):
+        """
+        Returns the snapshot for graph version, rebuilding it first if the
+        graph has moved on.
+        """
+        if not self.enabled:
+            return None
+        if self.snapshot is None or self.version != version:
+            with self.lock:
+                if self.snapshot is None or self.version != version:
+                    self.snapshot = GraphSnapshot.load(graph)
+                    self.version = version
+        return self.snapshot
+
+    def _advance(self, version):
+        # Same rule as CoverageMatrix: only a one-step move is this
+        # process's own write; anything else forces a rebuild.
+        if version is None:
+            return
+        if self.version is not None and version == self.version + 1 and self.snapshot.patches < self.max_patches:
+            self.version = version
+        else:
+            self.version = None
+
+    def add_node(self, node_id, labels, name, description='', external_id='', version=None):
+        with self.lock:
+            if self.snapshot is None:
+                return
+            self.snapshot.add_node(node_id, labels, name, description, external_id)
+            self._advance(version)
+
+    def add_relationships(self, relationships, version=None):
+        """
+        Patches in (source id, type, target id) triples written together.
+        """
+        with self.lock:
+            if self.snapshot is None:
+                return
+            for source_id, relationship, target_id in relationships:
+                if not self.snapshot.add_relationship(source_id, relationship, target_id):
+                    self.version = None
+                    return
+            self._advance(version)
@@ -1,270 +1,1061 @@
+import argparse
+import csv
+import hashlib
 import json
 import logging
-from py2neo import Graph, Node, Relationship
-from stix2 import MemoryStore, Filter
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from py2neo import Node
+from py2neo.errors import TransientError
+from cache import bump_version
+import gateway
+from gateway import GraphGateway
+from schema import STIX_TYPE_LABELS, cypher_name, ensure_schema, relationship_types_in
+from stix_reader import iter_stix_objects
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Counters for summary
-node_count = 0
-relationship_count = 0
-warning_count = 0
+# Bulk ingestion settings: group writes into parameterized UNWIND batches
+# instead of one merge (and one round trip) per object.
+BULK_MODE = os.environ.get('STIX_BULK_MODE', 'true').lower() in ('1', 'true', 'yes')
+BATCH_SIZE = int(os.environ.get('STIX_BATCH_SIZE', '1000'))
 
-# Connect to Neo4j
+# Delta mode: only upsert objects whose content hash changed since the
+# previous load, and flag objects that disappeared from the bundle.
+DELTA_MODE = os.environ.get('STIX_DELTA_MODE', 'false').lower() in ('1', 'true', 'yes')
+
+# Parallel ingestion: bulk batches are spread over this many worker threads,
+# each with its own connection. Transient errors (lock conflicts, deadlocks)
+# are retried with exponential backoff.
+WORKERS = int(os.environ.get('STIX_WORKERS', '1'))
+MAX_RETRIES = int(os.environ.get('STIX_MAX_RETRIES', '5'))
+RETRY_BACKOFF = float(os.environ.get('STIX_RETRY_BACKOFF', '0.2'))
+
+# Offline export: when set, write neo4j-admin import CSV files to this
+# directory instead of connecting to Neo4j.
+EXPORT_DIR = os.environ.get('STIX_EXPORT_DIR', '')
+
+# Target database; defaults come from the gateway's NEO4J_* variables
+NEO4J_URI = gateway.NEO4J_URI
+NEO4J_AUTH = gateway.NEO4J_AUTH
+
+# Default input bundle(s)
+STIX_FILES = ['enterprise-attack.json']
+
+# JSON metrics report, written at the end of every run
+METRICS_FILE = os.environ.get('STIX_METRICS_FILE', 'stix_load_metrics.json')
+
+class LoadMetrics:
+    """
+    Counters, per-phase timings and a sampled warning summary for one run.
+    Individual warnings are only logged at DEBUG level; the summary keeps a
+    count per category and the first few messages of each.
+    """
+
+    SAMPLES_PER_CATEGORY = 5
+
+    def __init__(self):
+        self.nodes = 0
+        self.relationships = 0
+        self.nodes_by_label = Counter()
+        self.relationships_by_type = Counter()
+        self.warnings = Counter()
+        self.warning_samples = defaultdict(list)
+        self.phases = []
+
+    @property
+    def warning_count(self):
+        return sum(self.warnings.values())
+
+    def add_nodes(self, label, count=1):
+        self.nodes += count
+        self.nodes_by_label[label] += count
+
+    def add_relationships(self, relationship_type, count=1):
+        self.relationships += count
+        self.relationships_by_type[relationship_type] += count
+
+    def warn(self, category, message, count=1, level=logging.DEBUG):
+        """
+        Records count warnings of a category, keeping a few sample messages.
+        """
+        self.warnings[category] += count
+        if len(self.warning_samples[category]) < self.SAMPLES_PER_CATEGORY:
+            self.warning_samples[category].append(message)
+        logger.log(level, message)
+
+    @contextmanager
+    def phase(self, name, counter=None):
+        """
+        Times a phase. counter() returns the running number of items the
+        phase processes, used to compute its rate.
+        """
+        before = counter() if counter else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            count = (counter() - before) if counter else 0
+            rate = count / max(seconds, 1e-9)
+            self.phases.append({'phase': name, 'seconds': round(seconds, 3), 'count': count, 'rate': round(rate, 1)})
+            logger.info(f"Phase {name}: {count} in {seconds:.2f}s ({rate:.1f}/sec)")
+
+    def to_dict(self, **extra):
+        report = {
+            'nodes': self.nodes,
+            'relationships': self.relationships,
+            'warnings': self.warning_count,
+            'nodes_by_label': dict(self.nodes_by_label),
+            'relationships_by_type': dict(self.relationships_by_type),
+            'warnings_by_category': dict(self.warnings),
+            'warning_samples': dict(self.warning_samples),
+            'phases': self.phases,
+        }
+        if resource:
+            # ru_maxrss is reported in kilobytes on Linux
+            report['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        report.update(extra)
+        return report
+
+    def log_summary(self):
+        logger.info(f"Total nodes created or merged: {self.nodes}")
+        logger.info(f"Total relationships created or merged: {self.relationships}")
+        logger.info(f"Total warnings: {self.warning_count}")
+        for category, count in self.warnings.most_common():
+            samples = '; '.join(self.warning_samples[category][:3])
+            logger.warning(f"{count} x {category}, e.g. {samples}")
+        if resource:
+            logger.info(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+    def write_json(self, path, **extra):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(**extra), f, indent=2)
+        logger.info(f"Wrote metrics report to {path}")
+
+metrics = LoadMetrics()
+
+# Neo4j connection, opened by connect()
 graph = None
-try:
-    # Connect to the Neo4j graph database
-    graph = Graph("bolt://neo4j:7687", auth=("neo4j", "password"))
-    logger.info("Connected to Neo4j")
-except Exception as e:
-    logger.error(f"Failed to connect to Neo4j: {e}")
-    exit(1)
 
-# Path to the enterprise-attack.json file
-stix_file = 'enterprise-attack.json'
+def open_graph():
+    """
+    Opens a pooled gateway to the Neo4j graph database with one connection
+    per worker, plus one for the main thread, established up front.
+    """
+    connections = WORKERS + 1
+    target = GraphGateway(NEO4J_URI, NEO4J_AUTH, pool_size=connections)
+    target.warm(connections)
+    return target
 
-# Load the STIX data using stix2
-def load_stix_data(stix_file):
+# Connect to Neo4j
+def connect():
     """
-    Loads STIX data from a JSON file into a MemoryStore.
+    Connects the loader to Neo4j and makes sure the schema exists.
     """
-    logger.info(f"Loading STIX data from {stix_file}")
+    global graph
     try:
-        with open(stix_file, 'r', encoding='utf-8') as f:
-            bundle = json.load(f)
-            stix_objects = bundle['objects']
-            logger.info(f"Loaded {len(stix_objects)} STIX objects")
-            return MemoryStore(stix_data=stix_objects)
+        # Connect to the Neo4j graph database
+        graph = open_graph()
+        # Unique id constraints make every MERGE an index lookup
+        ensure_schema(graph)
     except Exception as e:
-        logger.error(f"Error loading STIX data: {e}")
+        logger.error(f"Failed to connect to Neo4j: {e}")
         exit(1)
 
+class NodeIndex:
+    """
+    Resolution index built once during node ingestion. Maps STIX ids to
+    their label and graph node identity, and tactic shortnames to tactic
+    ids, so relationship stages never have to look endpoints up in Neo4j.
+    """
+
+    def __init__(self):
+        self.labels = {}       # STIX id -> node label
+        self.identities = {}   # STIX id -> Neo4j internal node id
+        self.tactics = {}      # x_mitre_shortname -> tactic STIX id
+
+    def add(self, stix_id, label):
+        self.labels[stix_id] = label
+
+    def bind(self, stix_id, identity):
+        self.identities[stix_id] = identity
+
+    def add_tactic(self, shortname, stix_id):
+        self.tactics[shortname] = stix_id
+
+    def label(self, stix_id):
+        return self.labels.get(stix_id)
+
+    def identity(self, stix_id):
+        return self.identities.get(stix_id)
+
+    def tactic_id(self, shortname):
+        return self.tactics.get(shortname)
+
+# Compact link records collected while streaming the bundle. Only ids and
+# short strings are kept, never the full STIX objects.
+node_index = NodeIndex()
+stix_relationships = []        # (stix id, source_ref, RELATIONSHIP_TYPE, target_ref)
+retired_relationship_ids = []  # STIX ids of relationships whose edges must be dropped
+retired_link_sources = []      # (STIX id, derived relationship type) whose edges must be rebuilt
+data_component_links = []      # (data component id, data source ref)
+technique_phases = []          # (technique id, kill chain phase name)
+
+class DeltaTracker:
+    """
+    Tracks the content hash of every STIX-derived node already in the graph
+    and classifies incoming objects as new, changed or unchanged. Whatever
+    is left once the bundle has been streamed was removed upstream.
+    """
+
+    def __init__(self):
+        self.existing = {}   # STIX id -> (content_hash, node identity)
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def load(self):
+        """
+        Reads the id and content hash of every STIX-derived node.
+        """
+        query = """
+        MATCH (n)
+        WHERE n.stix_type IS NOT NULL AND coalesce(n.removed, false) = false
+        RETURN n.id AS id, n.content_hash AS content_hash, id(n) AS identity
+        """
+        for record in graph.run(query):
+            self.existing[record['id']] = (record['content_hash'], record['identity'])
+        logger.info(f"Delta mode: {len(self.existing)} STIX nodes already in the graph")
+
+    def classify(self, node_properties):
+        """
+        Returns ('new' | 'changed' | 'unchanged', existing node identity).
+        """
+        previous = self.existing.pop(node_properties['id'], None)
+        if previous is None:
+            self.new += 1
+            return 'new', None
+        content_hash, identity = previous
+        if content_hash != node_properties['content_hash']:
+            self.changed += 1
+            return 'changed', identity
+        self.unchanged += 1
+        return 'unchanged', identity
+
+delta = DeltaTracker()
+
 # Function to determine label from type
 def get_label_from_type(object_type):
     """
     Maps STIX object types to Neo4j node labels.
     """
-    type_mapping = {
-        'attack-pattern': 'Technique',
-        'x-mitre-tactic': 'Tactic',
-        'malware': 'Malware',
-        'tool': 'Tool',
-        'intrusion-set': 'IntrusionSet',
-        'campaign': 'Campaign',
-        'course-of-action': 'Mitigation',
-        'mitigation': 'Mitigation',
-        'x-mitre-data-component': 'DataComponent',
-        'x-mitre-data-source': 'DataSource',
-        'identity': 'Identity',
-        'infrastructure': 'Infrastructure',
-        'malware-analysis': 'MalwareAnalysis',
-        'note': 'Note',
-        'observed-data': 'ObservedData',
-        'opinion': 'Opinion',
-        'report': 'Report',
-        'threat-actor': 'ThreatActor',
-        'vulnerability': 'Vulnerability',
-        'indicator': 'Indicator',
-        'location': 'Location',
-        'relationship': 'Relationship',
-        # Add any new types discovered
-    }
     if object_type:
         object_type_clean = object_type.strip().lower()
-        label = type_mapping.get(object_type_clean, 'Unknown')
+        label = STIX_TYPE_LABELS.get(object_type_clean, 'Unknown')
         if label == 'Unknown':
-            logger.warning(f"Unknown object type encountered: '{object_type}'")
+            metrics.warn('unknown-type', f"Unknown object type encountered: '{object_type}'")
     else:
         label = 'Unknown'
-        logger.warning("Encountered object with no type")
+        metrics.warn('missing-type', "Encountered object with no type")
     return label
 
-# Load the STIX data into a MemoryStore
-stix_data = load_stix_data(stix_file)
+# Stream the STIX objects out of the bundles
+def load_stix_data(stix_files):
+    """
+    Yields STIX objects from one or more bundle files, one at a time, as
+    plain dicts.
+    """
+    for stix_file in stix_files:
+        logger.info(f"Streaming STIX data from {stix_file}")
+        loaded = 0
+        try:
+            for obj in iter_stix_objects(stix_file):
+                loaded += 1
+                yield obj
+        except Exception as e:
+            logger.error(f"Error loading STIX data: {e}")
+            exit(1)
+        logger.info(f"Loaded {loaded} STIX objects from {stix_file}")
+
+# Function to extract node properties from a STIX object
+def node_properties_from_stix(obj):
+    """
+    Builds the Neo4j node properties for a STIX object.
+    """
+    object_type = obj.get('type')
+    # Prepare properties for the node
+    node_properties = {
+        'id': obj.get('id'),
+        'name': obj.get('name', ''),
+        'description': obj.get('description', ''),
+        'revoked': obj.get('revoked', False),
+        'deprecated': obj.get('x_mitre_deprecated', False),
+        'stix_type': object_type,
+        # Clears the flag on objects that return after a delta load removed them
+        'removed': False,
+    }
+    # Add external_id for certain types
+    if 'external_references' in obj:
+        for ref in obj['external_references']:
+            if ref.get('source_name') == 'mitre-attack':
+                node_properties['external_id'] = ref.get('external_id')
+    # Add x_mitre_shortname for Tactics
+    if object_type == 'x-mitre-tactic':
+        node_properties['short_name'] = obj.get('x_mitre_shortname', '')
+    # Keep the column order of ATT&CK matrices
+    if object_type == 'x-mitre-matrix':
+        node_properties['tactic_refs'] = obj.get('tactic_refs', [])
+    # Add version if available
+    if 'x_mitre_version' in obj:
+        node_properties['version'] = obj.get('x_mitre_version')
+    # Change tracking for delta loads
+    node_properties['modified'] = obj.get('modified', '')
+    node_properties['content_hash'] = content_hash(obj)
+    return node_properties
 
-# Get all objects from the MemoryStore
-all_stix_objects = stix_data.query()
+# Hash the full content of a STIX object
+def content_hash(obj):
+    """
+    Returns a stable SHA-256 of a STIX object, independent of key order.
+    """
+    encoded = json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
 
-# Index objects by their 'id' for quick lookup
-objects_by_id = {obj['id']: obj for obj in all_stix_objects if 'id' in obj}
+# Decide whether a streamed object needs to be written
+def skip_unchanged(obj, label, node_properties):
+    """
+    In delta mode, binds unchanged objects to their existing node and returns
+    True so the caller skips the write. Changed and new objects have their
+    links recorded and return False.
+    """
+    status = 'new'
+    if DELTA_MODE:
+        status, identity = delta.classify(node_properties)
+        if status == 'unchanged':
+            node_index.bind(node_properties['id'], identity)
+    record_links(obj, label, status)
+    return status == 'unchanged'
+
+# Record the links an object contributes, for the relationship stages
+def record_links(obj, label, status='new'):
+    """
+    Keeps the id, label and outgoing references of a STIX object so the
+    relationship stages can run after the stream has been consumed. Links
+    of unchanged objects are already in the graph and are not recorded.
+    """
+    object_type = obj.get('type')
+    obj_id = obj.get('id')
+    node_index.add(obj_id, label)
+    if object_type == 'x-mitre-tactic':
+        node_index.add_tactic(obj.get('x_mitre_shortname'), obj_id)
+    if status == 'unchanged':
+        return
+    if object_type == 'relationship':
+        if status == 'changed':
+            # Drop the previous edge; endpoints or type may have changed
+            retired_relationship_ids.append(obj_id)
+        if DELTA_MODE and (obj.get('revoked') or obj.get('x_mitre_deprecated')):
+            return
+        stix_relationships.append((obj_id, obj.get('source_ref'), obj.get('relationship_type', '').upper(), obj.get('target_ref')))
+    elif object_type == 'x-mitre-data-component':
+        if status == 'changed':
+            # The data source ref may have changed; rebuild the link
+            retired_link_sources.append((obj_id, 'BELONGS_TO'))
+        if obj.get('x_mitre_data_source_ref'):
+            data_component_links.append((obj_id, obj.get('x_mitre_data_source_ref')))
+    elif object_type == 'attack-pattern':
+        if status == 'changed':
+            # Kill chain phases may have changed; rebuild the tactic links
+            retired_link_sources.append((obj_id, 'SUPPORTS'))
+        for phase in obj.get('kill_chain_phases', []):
+            if phase.get('kill_chain_name') == 'mitre-attack':
+                technique_phases.append((obj_id, phase.get('phase_name')))
 
 # Function to create nodes from STIX objects
 def create_nodes_from_stix(objects):
     """
     Create nodes in Neo4j from STIX objects.
     """
-    global node_count
     for obj in objects:
         object_type = obj.get('type')
         if not object_type:
             # Skip objects without a 'type' field
-            logger.warning(f"Object with ID {obj.get('id')} has no 'type' field. Skipping.")
+            metrics.warn('missing-type', f"Object with ID {obj.get('id')} has no 'type' field. Skipping.")
             continue
         label = get_label_from_type(object_type)
+        node_properties = node_properties_from_stix(obj)
+        if skip_unchanged(obj, label, node_properties):
+            continue
         try:
-            # Prepare properties for the node
-            node_properties = {
-                'id': obj.get('id'),
-                'name': obj.get('name', ''),
-                'description': obj.get('description', ''),
-                'revoked': obj.get('revoked', False),
-                'deprecated': obj.get('x_mitre_deprecated', False),
-                'stix_type': object_type,
-            }
-            # Add external_id for certain types
-            if 'external_references' in obj:
-                for ref in obj['external_references']:
-                    if ref.get('source_name') == 'mitre-attack':
-                        node_properties['external_id'] = ref.get('external_id')
-            # Add x_mitre_shortname for Tactics
-            if object_type == 'x-mitre-tactic':
-                node_properties['short_name'] = obj.get('x_mitre_shortname', '')
-            # Add version if available
-            if 'x_mitre_version' in obj:
-                node_properties['version'] = obj.get('x_mitre_version')
             # Create or merge the node in Neo4j
             node = Node(label, **node_properties)
             graph.merge(node, label, 'id')
-            node_count += 1
-            logger.info(f"Created/merged {label} node: {obj.get('name', '')}")
+            node_index.bind(node_properties['id'], node.identity)
+            metrics.add_nodes(label)
         except Exception as e:
-            logger.error(f"Error creating node {obj.get('id', '')}: {e}")
+            metrics.warn('node-write-error', f"Error creating node {obj.get('id', '')}: {e}", level=logging.ERROR)
 
-# Create nodes
-create_nodes_from_stix(all_stix_objects)
+# Merge a single relationship between two indexed nodes
+def merge_relationship(source_ref, relationship_type, target_ref, stix_id=None):
+    """
+    Merges a relationship between two nodes resolved through the node index.
+    Returns False when either endpoint was never written to the graph.
+    """
+    source_identity = node_index.identity(source_ref)
+    target_identity = node_index.identity(target_ref)
+    if source_identity is None or target_identity is None:
+        return False
+    statement = f"""
+    MATCH (s) WHERE id(s) = $source
+    MATCH (t) WHERE id(t) = $target
+    MERGE (s)-[r:{cypher_name(relationship_type)}]->(t)
+    SET r.stix_id = $stix_id
+    RETURN count(*) AS written
+    """
+    return bool(graph.run(statement, source=source_identity, target=target_identity, stix_id=stix_id).evaluate())
 
 # Function to create relationships from STIX relationships
 def create_relationships_from_stix(relationships):
     """
-    Create relationships in Neo4j from STIX relationship objects.
+    Create relationships in Neo4j from (source_ref, type, target_ref) records
+    of STIX relationship objects.
     """
-    global relationship_count, warning_count
-    for rel in relationships:
-        if rel.get('type') == 'relationship':
-            source_ref = rel.get('source_ref')
-            target_ref = rel.get('target_ref')
-            relationship_type = rel.get('relationship_type', '').upper()
-
-            source_obj = objects_by_id.get(source_ref)
-            target_obj = objects_by_id.get(target_ref)
+    for stix_id, source_ref, relationship_type, target_ref in relationships:
+        source_label = node_index.label(source_ref)
+        target_label = node_index.label(target_ref)
 
-            if not source_obj or not target_obj:
-                # Skip relationships if source or target object is not found
-                warning_count += 1
-                logger.warning(f"Source or target object not found for relationship: {source_ref} -> {relationship_type} -> {target_ref}")
-                continue
+        if not source_label or not target_label:
+            # Skip relationships if source or target object is not found
+            metrics.warn('missing-object', f"Source or target object not found for relationship: {source_ref} -> {relationship_type} -> {target_ref}")
+            continue
 
-            source_label = get_label_from_type(source_obj.get('type')) 
-            target_label = get_label_from_type(target_obj.get('type'))
+        try:
+            # Create or merge the relationship in Neo4j
+            if merge_relationship(source_ref, relationship_type, target_ref, stix_id):
+                metrics.add_relationships(relationship_type)
+            else:
+                metrics.warn('missing-node', f"Source or target node not found in graph for relationship: {source_ref} ({source_label}) -> {relationship_type} -> {target_ref} ({target_label})")
+        except Exception as e:
+            metrics.warn('relationship-write-error', f"Error creating relationship {relationship_type} between {source_ref} and {target_ref}: {e}", level=logging.ERROR)
 
-            source_node = graph.nodes.match(source_label, id=source_ref).first()
-            target_node = graph.nodes.match(target_label, id=target_ref).first()
+# Create relationships between Data Sources and Data Components
+def create_data_source_component_relationships(links):
+    """
+    Create relationships between Data Components and their associated Data
+    Sources from (data component id, data source ref) records.
+    """
+    for data_component_id, data_source_ref in links:
+        if not node_index.label(data_source_ref):
+            metrics.warn('missing-object', f"Data Source object not found for Data Component: {data_component_id} -> {data_source_ref}")
+            continue
 
-            if source_node and target_node:
-                try:
-                    # Create or merge the relationship in Neo4j
-                    relationship = Relationship(source_node, relationship_type, target_node)
-                    graph.merge(relationship)
-                    relationship_count += 1
-                    logger.info(f"Created/merged relationship {relationship_type} between {source_ref} and {target_ref}")
-                except Exception as e:
-                    warning_count += 1
-                    logger.error(f"Error creating relationship {relationship_type} between {source_ref} and {target_ref}: {e}")
+        try:
+            # Create or merge the BELONGS_TO relationship in Neo4j
+            if merge_relationship(data_component_id, 'BELONGS_TO', data_source_ref):
+                metrics.add_relationships('BELONGS_TO')
             else:
-                warning_count += 1
-                logger.warning(f"Source or target node not found in graph for relationship: {source_ref} ({source_label}) -> {relationship_type} -> {target_ref} ({target_label})")
+                metrics.warn('missing-node', f"Data Source or Data Component node not found in graph for relationship: {data_component_id} -> {data_source_ref}")
+        except Exception as e:
+            metrics.warn('relationship-write-error', f"Error creating relationship BELONGS_TO between Data Component {data_component_id} and Data Source {data_source_ref}: {e}", level=logging.ERROR)
 
-# Create relationships between Data Sources and Data Components
-def create_data_source_component_relationships(objects):
+# Create relationships between Tactics and Techniques
+def create_tactic_technique_relationships(phases):
+    """
+    Create relationships between Techniques and the Tactics they support from
+    (technique id, kill chain phase name) records.
+    """
+    for technique_id, tactic_ref in phases:
+        # Find the corresponding Tactic by shortname
+        tactic_id = node_index.tactic_id(tactic_ref)
+        if tactic_id:
+            try:
+                # Create or merge the SUPPORTS relationship in Neo4j
+                if merge_relationship(technique_id, 'SUPPORTS', tactic_id):
+                    metrics.add_relationships('SUPPORTS')
+                else:
+                    metrics.warn('missing-node', f"Tactic or Technique node not found in graph for relationship: {technique_id} -> {tactic_id}")
+            except Exception as e:
+                metrics.warn('relationship-write-error', f"Error creating relationship SUPPORTS between Technique {technique_id} and Tactic {tactic_id}: {e}", level=logging.ERROR)
+
+def worker_graph():
+    """
+    Returns the graph connection for worker tasks. The gateway's pool is
+    thread-safe and sized for the workers, so every transaction simply
+    borrows its own connection from it.
+    """
+    return graph
+
+class StagePool:
+    """
+    Runs the write tasks of one ingestion stage, on a thread pool when more
+    than one worker is configured and inline otherwise. Completion callbacks
+    always run on the main thread, so counters and the node index are never
+    touched concurrently. wait() is the barrier between stages.
+    """
+
+    def __init__(self, workers=None):
+        workers = workers or WORKERS
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.max_pending = workers * 2
+        self.pending = []
+
+    def submit(self, on_done, fn, *args):
+        """
+        Runs fn(*args) and hands the finished Future to on_done. At most
+        max_pending tasks are queued, bounding the rows held in memory.
+        """
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            on_done(future)
+            return
+        self.pending.append((self.executor.submit(fn, *args), on_done))
+        if len(self.pending) >= self.max_pending:
+            future, callback = self.pending.pop(0)
+            callback(future)
+
+    def wait(self):
+        """
+        Blocks until every submitted task has finished.
+        """
+        while self.pending:
+            future, callback = self.pending.pop(0)
+            callback(future)
+
+    def close(self):
+        self.wait()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+# Run a parameterized UNWIND statement over rows in batches
+def run_batches(statement, rows, batch_size=None):
+    """
+    Runs an UNWIND statement over rows in batches of batch_size inside a
+    single transaction on the calling thread's connection, retrying the
+    whole transaction on transient errors. Returns the records of every
+    batch.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    target = worker_graph()
+    for attempt in range(1, MAX_RETRIES + 1):
+        records = []
+        tx = target.begin()
+        try:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                records.extend(tx.run(statement, rows=batch).data())
+            target.commit(tx)
+            return records
+        except TransientError as e:
+            target.rollback(tx)
+            if attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+            logger.warning(f"Transient error on attempt {attempt}, retrying in {delay:.2f}s: {e}")
+            time.sleep(delay)
+        except Exception:
+            target.rollback(tx)
+            raise
+
+# Merge one batch of node rows sharing a label
+def merge_node_rows(label, rows, batch_size=None):
+    """
+    Merges a batch of node property rows for a single label and returns
+    the (id, identity) records.
+    """
+    statement = f"""
+    UNWIND $rows AS row
+    MERGE (n:{cypher_name(label)} {{id: row.id}})
+    SET n += row
+    RETURN row.id AS id, id(n) AS identity
+    """
+    return run_batches(statement, rows, batch_size)
+
+def write_node_batch(pool, label, rows, batch_size=None):
+    """
+    Submits a node batch to the pool and indexes the merged nodes.
+    """
+    def done(future):
+        try:
+            records = future.result()
+        except Exception as e:
+            metrics.warn('node-write-error', f"Error creating {label} nodes: {e}", count=len(rows), level=logging.ERROR)
+            return
+        for record in records:
+            node_index.bind(record['id'], record['identity'])
+        metrics.add_nodes(label, len(records))
+        logger.debug(f"Created/merged {len(records)} {label} nodes")
+
+    pool.submit(done, merge_node_rows, label, rows, batch_size)
+
+# Bulk create nodes, one UNWIND batch statement per label
+def bulk_create_nodes(objects, batch_size=None):
     """
-    Create relationships between Data Components and their associated Data Sources.
+    Groups streamed STIX objects by label and merges each label's rows once
+    batch_size of them have accumulated, so at most one batch per label is
+    held in memory. Full batches are spread over the worker pool; the call
+    returns only once every node has been written.
     """
-    global relationship_count, warning_count
+    batch_size = batch_size or BATCH_SIZE
+    pool = StagePool()
+    rows_by_label = defaultdict(list)
     for obj in objects:
-        if obj.get('type') == 'x-mitre-data-component':
-            data_source_ref = obj.get('x_mitre_data_source_ref')
-            if not data_source_ref:
-                # Skip if there is no reference to a data source
-                continue
+        object_type = obj.get('type')
+        if not object_type:
+            metrics.warn('missing-type', f"Object with ID {obj.get('id')} has no 'type' field. Skipping.")
+            continue
+        label = get_label_from_type(object_type)
+        node_properties = node_properties_from_stix(obj)
+        if skip_unchanged(obj, label, node_properties):
+            continue
+        rows = rows_by_label[label]
+        rows.append(node_properties)
+        if len(rows) >= batch_size:
+            write_node_batch(pool, label, rows, batch_size)
+            rows_by_label[label] = []
+
+    for label, rows in rows_by_label.items():
+        if rows:
+            write_node_batch(pool, label, rows, batch_size)
+    pool.close()
 
-            data_source_obj = objects_by_id.get(data_source_ref)
-            if not data_source_obj:
-                warning_count += 1
-                logger.warning(f"Data Source object not found for Data Component: {obj.get('id')} -> {data_source_ref}")
-                continue
+# Collect relationship rows for bulk creation
+def collect_relationship_rows():
+    """
+    Builds type -> [{source, target}] rows of graph node identities for STIX
+    relationships, Data Component -> Data Source and Technique -> Tactic
+    links, resolving every endpoint through the node index.
+    """
+    rows_by_type = defaultdict(list)
 
-            data_source_label = get_label_from_type(data_source_obj.get('type'))
-            data_component_label = get_label_from_type(obj.get('type'))
+    def add(source_ref, relationship_type, target_ref, stix_id=None):
+        source_identity = node_index.identity(source_ref)
+        target_identity = node_index.identity(target_ref)
+        if source_identity is None or target_identity is None:
+            metrics.warn('missing-node', f"Source or target node not found in graph for relationship: {source_ref} -> {relationship_type} -> {target_ref}")
+            return
+        rows_by_type[relationship_type].append({'source': source_identity, 'target': target_identity, 'stix_id': stix_id})
 
-            data_source_node = graph.nodes.match(data_source_label, id=data_source_ref).first()
-            data_component_node = graph.nodes.match(data_component_label, id=obj.get('id')).first()
+    for stix_id, source_ref, relationship_type, target_ref in stix_relationships:
+        if not node_index.label(source_ref) or not node_index.label(target_ref):
+            metrics.warn('missing-object', f"Source or target object not found for relationship: {source_ref} -> {relationship_type} -> {target_ref}")
+            continue
+        add(source_ref, relationship_type, target_ref, stix_id)
 
-            if data_source_node and data_component_node:
+    for data_component_id, data_source_ref in data_component_links:
+        if not node_index.label(data_source_ref):
+            metrics.warn('missing-object', f"Data Source object not found for Data Component: {data_component_id} -> {data_source_ref}")
+            continue
+        add(data_component_id, 'BELONGS_TO', data_source_ref)
+
+    for technique_id, phase_name in technique_phases:
+        tactic_id = node_index.tactic_id(phase_name)
+        if tactic_id:
+            add(technique_id, 'SUPPORTS', tactic_id)
+
+    return rows_by_type
+
+# Merge one batch of relationship rows sharing a type
+def merge_relationship_rows(relationship_type, rows, batch_size=None):
+    """
+    Merges a batch of relationships of one type, matching endpoints by graph
+    node identity. Returns the number of relationships written.
+    """
+    statement = f"""
+    UNWIND $rows AS row
+    MATCH (s) WHERE id(s) = row.source
+    MATCH (t) WHERE id(t) = row.target
+    MERGE (s)-[r:{cypher_name(relationship_type)}]->(t)
+    SET r.stix_id = row.stix_id
+    RETURN count(*) AS written
+    """
+    return sum(record['written'] for record in run_batches(statement, rows, batch_size))
+
+# Bulk create relationships, one UNWIND batch statement per type
+def bulk_create_relationships(rows_by_type, batch_size=None):
+    """
+    Merges relationships grouped by type, one transaction per batch, spread
+    over the worker pool. Must only run after the node stage has finished.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    pool = StagePool()
+    for relationship_type, rows in rows_by_type.items():
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+
+            def done(future, relationship_type=relationship_type, expected=len(batch)):
                 try:
-                    # Create or merge the BELONGS_TO relationship in Neo4j
-                    relationship = Relationship(data_component_node, 'BELONGS_TO', data_source_node)
-                    graph.merge(relationship)
-                    relationship_count += 1
-                    logger.info(f"Created/merged relationship BELONGS_TO between Data Component {obj.get('id')} and Data Source {data_source_ref}")
+                    written = future.result()
                 except Exception as e:
-                    warning_count += 1
-                    logger.error(f"Error creating relationship BELONGS_TO between Data Component {obj.get('id')} and Data Source {data_source_ref}: {e}")
-            else:
-                warning_count += 1
-                logger.warning(f"Data Source or Data Component node not found in graph for relationship: {obj.get('id')} -> {data_source_ref}")
+                    metrics.warn('relationship-write-error', f"Error creating {relationship_type} relationships: {e}", count=expected, level=logging.ERROR)
+                    return
+                metrics.add_relationships(relationship_type, written)
+                if written < expected:
+                    metrics.warn('missing-node', f"{expected - written} {relationship_type} relationships skipped: endpoint nodes not found in graph", count=expected - written)
+                logger.debug(f"Created/merged {written} {relationship_type} relationships")
 
-# Create relationships between Tactics and Techniques
-def create_tactic_technique_relationships(objects):
+            pool.submit(done, merge_relationship_rows, relationship_type, batch, batch_size)
+    pool.close()
+
+# Drop edges of STIX relationships that changed, were revoked or removed
+def detach_relationships(stix_ids, batch_size=None):
+    """
+    Deletes the edges created for the given STIX relationship ids. The old
+    edge's type and endpoints are unknown, so each relationship type is
+    tried in turn through its stix_id index (see schema.py).
+    """
+    if not stix_ids:
+        return 0
+    detached = 0
+    for relationship_type in relationship_types_in(graph):
+        statement = f"""
+        UNWIND $rows AS stix_id
+        MATCH ()-[r:{cypher_name(relationship_type)} {{stix_id: stix_id}}]->()
+        DELETE r
+        RETURN count(r) AS detached
+        """
+        detached += sum(record['detached'] for record in run_batches(statement, stix_ids, batch_size))
+    return detached
+
+# Drop the SUPPORTS / BELONGS_TO edges derived from changed objects
+def detach_derived_links(sources, batch_size=None):
+    """
+    Deletes the outgoing derived edges of the given (STIX id, relationship
+    type) records, resolving each node through the node index, so the
+    relationship stages rebuild them from the current object.
+    """
+    identities_by_type = defaultdict(list)
+    for stix_id, relationship_type in sources:
+        identity = node_index.identity(stix_id)
+        if identity is not None:
+            identities_by_type[relationship_type].append(identity)
+    detached = 0
+    for relationship_type, identities in identities_by_type.items():
+        statement = f"""
+        UNWIND $rows AS identity
+        MATCH (s)-[r:{cypher_name(relationship_type)}]->() WHERE id(s) = identity
+        DELETE r
+        RETURN count(r) AS detached
+        """
+        detached += sum(record['detached'] for record in run_batches(statement, identities, batch_size))
+    return detached
+
+# Drop every edge the changed objects will recreate
+def detach_changed(batch_size=None):
+    """
+    Runs before the relationship stages: drops the edges of changed STIX
+    relationships and the derived links of changed techniques and data
+    components.
+    """
+    detached = detach_relationships(retired_relationship_ids, batch_size)
+    detached += detach_derived_links(retired_link_sources, batch_size)
+    if detached:
+        logger.info(f"Detached {detached} relationships of changed objects")
+
+# Flag objects that are no longer in the bundle
+def flag_removed_nodes(batch_size=None):
     """
-    Create relationships between Techniques and the Tactics they support.
+    Marks every STIX node that was not seen in this bundle as removed and
+    drops the edges of removed STIX relationships. Nodes are flagged rather
+    than deleted so ThreatScenario links to them survive; the edges the
+    loader made to them are dropped, and the objects that defined those
+    edges lose their content hash so the next delta load re-links them
+    should the node come back.
+    """
+    removed_ids = list(delta.existing)
+    if not removed_ids:
+        return
+    statement = """
+    UNWIND $rows AS identity
+    MATCH (n) WHERE id(n) = identity
+    SET n.removed = true
+    RETURN count(n) AS flagged
+    """
+    identities = [identity for _, identity in delta.existing.values()]
+    delta.removed = sum(record['flagged'] for record in run_batches(statement, identities, batch_size))
+    detached = detach_relationships([stix_id for stix_id in removed_ids if stix_id.startswith('relationship--')], batch_size)
+    # Loader edges carry a stix_id or are derived; scenario and API edges are kept
+    statement = """
+    UNWIND $rows AS identity
+    MATCH (n)-[r]-() WHERE id(n) = identity AND (r.stix_id IS NOT NULL OR type(r) IN ['SUPPORTS', 'BELONGS_TO'])
+    WITH DISTINCT r
+    OPTIONAL MATCH (definition:Relationship {id: r.stix_id})
+    WITH r, coalesce(definition, startNode(r)) AS owner
+    SET owner.content_hash = null
+    DELETE r
+    RETURN count(r) AS detached
+    """
+    detached += sum(record['detached'] for record in run_batches(statement, identities, batch_size))
+    logger.info(f"Flagged {delta.removed} removed nodes and detached {detached} of their relationships")
+
+class CsvExporter:
+    """
+    Writes nodes and relationships as CSV files in the header format
+    expected by `neo4j-admin import`: one nodes_<Label>.csv per label and
+    one rels_<TYPE>.csv per relationship type.
+    """
+
+    # Property name -> neo4j-admin header field, in column order
+    NODE_COLUMNS = [
+        ('id', 'id:ID'),
+        ('name', 'name'),
+        ('description', 'description'),
+        ('revoked', 'revoked:boolean'),
+        ('deprecated', 'deprecated:boolean'),
+        ('stix_type', 'stix_type'),
+        ('external_id', 'external_id'),
+        ('short_name', 'short_name'),
+        ('tactic_refs', 'tactic_refs:string[]'),
+        ('version', 'version'),
+        ('modified', 'modified'),
+        ('content_hash', 'content_hash'),
+    ]
+    RELATIONSHIP_HEADER = [':START_ID', ':END_ID', ':TYPE', 'stix_id']
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+        self.writers = {}
+        self.node_ids = defaultdict(set)   # label -> ids written
+        self.relationship_keys = set()
+
+    def _writer(self, filename, header):
+        if filename not in self.writers:
+            f = open(os.path.join(self.directory, filename), 'w', encoding='utf-8', newline='')
+            self.files[filename] = f
+            self.writers[filename] = csv.writer(f)
+            self.writers[filename].writerow(header)
+        return self.writers[filename]
+
+    def write_node(self, label, node_properties):
+        """
+        Writes one node row. Returns False for an id already written under
+        label, e.g. the identity and marking objects that the enterprise,
+        mobile and ICS bundles share.
+        """
+        if node_properties['id'] in self.node_ids[label]:
+            return False
+        self.node_ids[label].add(node_properties['id'])
+        header = [field for _, field in self.NODE_COLUMNS] + [':LABEL']
+        row = []
+        for name, field in self.NODE_COLUMNS:
+            value = node_properties.get(name)
+            if field.endswith(':boolean'):
+                value = 'true' if value else 'false'
+            elif field.endswith('[]'):
+                value = ';'.join(value or [])
+            row.append(value)
+        self._writer(f'nodes_{label}.csv', header).writerow(row + [label])
+        return True
+
+    def write_relationship(self, relationship_type, source, target, stix_id=None):
+        """
+        Writes one relationship row. Returns False for duplicates, which the
+        MERGE-based loaders would collapse but neo4j-admin would not.
+        """
+        key = (source, relationship_type, target)
+        if key in self.relationship_keys:
+            return False
+        self.relationship_keys.add(key)
+        writer = self._writer(f'rels_{relationship_type}.csv', self.RELATIONSHIP_HEADER)
+        writer.writerow([source, target, relationship_type, stix_id])
+        return True
+
+    def import_command(self):
+        """
+        Returns the neo4j-admin command that loads the exported files.
+        """
+        arguments = []
+        for filename in sorted(self.files):
+            option = '--nodes' if filename.startswith('nodes_') else '--relationships'
+            arguments.append(f'{option}={os.path.join(self.directory, filename)}')
+        # ATT&CK descriptions span lines; write_node already drops repeated
+        # ids, skipping duplicates in the import is only a backstop
+        options = ['--database=neo4j', '--multiline-fields=true', '--skip-duplicate-nodes=true']
+        return 'neo4j-admin import ' + ' '.join(options + arguments)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+# Transform nodes and relationships without a database
+def load_offline(objects, exporter=None):
+    """
+    Runs the full transform with no database connection: the same label
+    mapping, property extraction and link resolution as the loaders, with
+    STIX ids standing in for node identities. Rows go to the exporter when
+    one is given; otherwise they are only counted (dry run).
     """
-    global relationship_count, warning_count
     for obj in objects:
-        if obj.get('type') == 'attack-pattern':
-            # Techniques may belong to multiple tactics through kill_chain_phases
-            kill_chain_phases = obj.get('kill_chain_phases', [])
-            for phase in kill_chain_phases:
-                if phase.get('kill_chain_name') == 'mitre-attack':
-                    tactic_ref = phase.get('phase_name')
-                    # Find the corresponding Tactic object by shortname
-                    tactic_obj = next((o for o in objects if o.get('x_mitre_shortname') == tactic_ref and o.get('type') == 'x-mitre-tactic'), None)
-                    if tactic_obj:
-                        tactic_label = get_label_from_type(tactic_obj.get('type'))
-                        technique_label = get_label_from_type(obj.get('type'))
-
-                        tactic_node = graph.nodes.match(tactic_label, id=tactic_obj.get('id')).first()
-                        technique_node = graph.nodes.match(technique_label, id=obj.get('id')).first()
-
-                        if tactic_node and technique_node:
-                            try:
-                                # Create or merge the SUPPORTS relationship in Neo4j
-                                relationship = Relationship(technique_node, 'SUPPORTS', tactic_node)
-                                graph.merge(relationship)
-                                relationship_count += 1
-                                logger.info(f"Created/merged relationship SUPPORTS between Technique {obj.get('id')} and Tactic {tactic_obj.get('id')}")
-                            except Exception as e:
-                                warning_count += 1
-                                logger.error(f"Error creating relationship SUPPORTS between Technique {obj.get('id')} and Tactic {tactic_obj.get('id')}: {e}")
-                        else:
-                            warning_count += 1
-                            logger.warning(f"Tactic or Technique node not found in graph for relationship: {obj.get('id')} -> {tactic_obj.get('id')}")
-
-# Get all relationships from the STIX data
-relationship_filter = Filter('type', '=', 'relationship')
-relationships = stix_data.query([relationship_filter])
-
-# Create relationships
-create_relationships_from_stix(relationships)
+        object_type = obj.get('type')
+        if not object_type:
+            metrics.warn('missing-type', f"Object with ID {obj.get('id')} has no 'type' field. Skipping.")
+            continue
+        label = get_label_from_type(object_type)
+        node_properties = node_properties_from_stix(obj)
+        record_links(obj, label)
+        node_index.bind(node_properties['id'], node_properties['id'])
+        if exporter is None or exporter.write_node(label, node_properties):
+            metrics.add_nodes(label)
 
-# Create relationships between Data Sources and Data Components
-create_data_source_component_relationships(all_stix_objects)
+    for relationship_type, rows in collect_relationship_rows().items():
+        for row in rows:
+            if exporter is None or exporter.write_relationship(relationship_type, row['source'], row['target'], row['stix_id']):
+                metrics.add_relationships(relationship_type)
 
-# Create relationships between Tactics and Techniques
-create_tactic_technique_relationships(all_stix_objects)
+# Export nodes and relationships for neo4j-admin import
+def export_csv(objects, directory):
+    """
+    Streams STIX objects into neo4j-admin import CSV files without touching
+    a database. In the import files a node is addressed by its STIX id.
+    """
+    exporter = CsvExporter(directory)
+    try:
+        load_offline(objects, exporter)
+    finally:
+        exporter.close()
+    logger.info(f"Wrote {len(exporter.files)} CSV files to {directory}")
+    logger.info(f"Import with: {exporter.import_command()}")
+    logger.info("Then run `python schema.py` against the new database to create constraints and indexes")
+
+# Clear per-run state
+def reset_state():
+    """
+    Clears the metrics, node index and link records so the loader stages
+    can be run again in the same process.
+    """
+    global metrics, node_index, delta
+    metrics = LoadMetrics()
+    node_index = NodeIndex()
+    delta = DeltaTracker()
+    del stix_relationships[:]
+    del retired_relationship_ids[:]
+    del retired_link_sources[:]
+    del data_component_links[:]
+    del technique_phases[:]
+
+def parse_args(argv=None):
+    """
+    Parses the command line. Every option defaults to its STIX_* environment
+    variable so container deployments keep working unchanged.
+    """
+    parser = argparse.ArgumentParser(description='Load MITRE ATT&CK STIX bundles into Neo4j.')
+    parser.add_argument('stix_files', nargs='*', default=STIX_FILES,
+                        help='STIX bundle file(s) to load (default: enterprise-attack.json)')
+    parser.add_argument('--uri', default=NEO4J_URI, help='Neo4j bolt URI')
+    parser.add_argument('--user', default=NEO4J_AUTH[0], help='Neo4j user')
+    parser.add_argument('--password', default=NEO4J_AUTH[1], help='Neo4j password')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows per UNWIND statement')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker threads for bulk writes')
+    parser.add_argument('--per-object', action='store_true', default=not BULK_MODE,
+                        help='merge one object per round trip instead of batching')
+    parser.add_argument('--delta', action='store_true', default=DELTA_MODE,
+                        help='only upsert objects that changed since the previous load')
+    parser.add_argument('--export-dir', default=EXPORT_DIR,
+                        help='write neo4j-admin import CSV files here instead of loading Neo4j')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='parse and transform the bundles without writing anywhere')
+    parser.add_argument('--metrics', default=METRICS_FILE,
+                        help='write the JSON metrics report to this file (default: stix_load_metrics.json)')
+    parser.add_argument('--log-level', default='INFO', help='DEBUG shows every individual warning')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Loads the STIX bundles into Neo4j, into CSV files in export mode, or
+    nowhere in dry-run mode, then reports per-phase metrics.
+    """
+    global BATCH_SIZE, WORKERS, BULK_MODE, DELTA_MODE, EXPORT_DIR, NEO4J_URI, NEO4J_AUTH
+    args = parse_args(argv)
+    logging.getLogger().setLevel(args.log_level.upper())
+    BATCH_SIZE = args.batch_size
+    WORKERS = args.workers
+    BULK_MODE = not args.per_object
+    EXPORT_DIR = args.export_dir
+    NEO4J_URI = args.uri
+    NEO4J_AUTH = (args.user, args.password)
+    DELTA_MODE = args.delta
+
+    offline = args.dry_run or bool(EXPORT_DIR)
+    if offline and DELTA_MODE:
+        logger.warning("Delta mode needs a database; transforming everything")
+        DELTA_MODE = False
+    if not BULK_MODE and WORKERS > 1:
+        logger.warning("--workers only applies to bulk mode; loading serially")
+
+    mode = 'dry-run' if args.dry_run else 'export' if EXPORT_DIR else 'bulk' if BULK_MODE else 'per-object'
+    logger.info(f"Mode: {mode}, batch size {BATCH_SIZE}, {WORKERS} worker(s), delta {'on' if DELTA_MODE else 'off'}")
+
+    if not offline:
+        with metrics.phase('connect'):
+            connect()
+
+    # Stream the STIX objects; nothing is materialized up front
+    stix_objects = load_stix_data(args.stix_files)
+
+    if DELTA_MODE:
+        with metrics.phase('delta-scan', lambda: len(delta.existing)):
+            delta.load()
+
+    if offline:
+        with metrics.phase('transform', lambda: metrics.nodes + metrics.relationships):
+            if args.dry_run:
+                load_offline(stix_objects)
+            else:
+                export_csv(stix_objects, EXPORT_DIR)
+    elif BULK_MODE:
+        with metrics.phase('nodes', lambda: metrics.nodes):
+            bulk_create_nodes(stix_objects, BATCH_SIZE)
+        with metrics.phase('detach-changed'):
+            detach_changed(BATCH_SIZE)
+        with metrics.phase('relationships', lambda: metrics.relationships):
+            bulk_create_relationships(collect_relationship_rows(), BATCH_SIZE)
+    else:
+        with metrics.phase('nodes', lambda: metrics.nodes):
+            create_nodes_from_stix(stix_objects)
+        with metrics.phase('detach-changed'):
+            detach_changed(BATCH_SIZE)
+        with metrics.phase('relationships', lambda: metrics.relationships):
+            # Create relationships
+            create_relationships_from_stix(stix_relationships)
+
+            # Create relationships between Data Sources and Data Components
+            create_data_source_component_relationships(data_component_links)
+
+            # Create relationships between Tactics and Techniques
+            create_tactic_technique_relationships(technique_phases)
+
+    if DELTA_MODE:
+        with metrics.phase('flag-removed'):
+            flag_removed_nodes(BATCH_SIZE)
+
+    if not offline:
+        # Invalidate the API response caches
+        bump_version(graph)
+
+    # Summary logging
+    metrics.log_summary()
+    extra = {'mode': mode, 'stix_files': args.stix_files, 'batch_size': BATCH_SIZE, 'workers': WORKERS}
+    if DELTA_MODE:
+        extra['delta'] = {'new': delta.new, 'changed': delta.changed, 'unchanged': delta.unchanged, 'removed': delta.removed}
+        logger.info(f"Delta summary: {delta.new} new, {delta.changed} changed, {delta.unchanged} unchanged, {delta.removed} removed")
+    metrics.write_json(args.metrics, **extra)
 
-# Summary logging
-logger.info(f"Total nodes created or merged: {node_count}")
-logger.info(f"Total relationships created or merged: {relationship_count}")
-logger.info(f"Total warnings: {warning_count}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
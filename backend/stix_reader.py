@@ -0,0 +1,115 @@
+import json
+
+# Characters JSON allows between tokens
+WHITESPACE = ' \t\n\r'
+
+# Default number of characters read from disk at a time
+CHUNK_SIZE = 1 << 16
+
+
+class StixBundleReader:
+    """
+    Incremental reader for STIX bundles.
+
+    Walks the top-level bundle object and decodes the entries of its
+    'objects' array one at a time, so only the current object and one read
+    chunk are held in memory regardless of bundle size.
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """
+        Reads the next chunk into the buffer, dropping consumed text.
+        Returns False once the file is exhausted.
+        """
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """
+        Skips whitespace and returns the next character ('' at end of file).
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Malformed STIX bundle: expected '{char}', found '{found or 'EOF'}'")
+        self.pos += 1
+
+    def _decode(self):
+        """
+        Decodes the next complete JSON value, reading more of the file when
+        the value runs past the end of the buffer.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number that ends exactly at the buffer edge may be truncated
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def __iter__(self):
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            if key == 'objects':
+                yield from self._iter_array()
+            else:
+                # Bundle metadata ('type', 'id', 'spec_version') is small
+                self._decode()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect('}')
+            return
+
+    def _iter_array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._decode()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect(']')
+            return
+
+
+def iter_stix_objects(stix_file, chunk_size=CHUNK_SIZE):
+    """
+    Yields the objects of a STIX bundle file as plain dicts, one at a time.
+    """
+    with open(stix_file, 'r', encoding='utf-8') as f:
+        yield from StixBundleReader(f, chunk_size)
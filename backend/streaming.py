@@ -0,0 +1,50 @@
+import json
+
+NDJSON_TYPE = 'application/x-ndjson'
+
+# Both queries are plain scans with no aggregation or ORDER BY, so Neo4j
+# streams rows as it finds them and nothing is held in memory on either
+# side. The :GraphVersion bookkeeping node has no place in an export.
+EXPORT_NODES_QUERY = """
+MATCH (n)
+WHERE n.id IS NOT NULL AND NOT n:GraphVersion
+RETURN n.id AS id, labels(n) AS labels, properties(n) AS properties
+"""
+
+EXPORT_LINKS_QUERY = """
+MATCH (s)-[r]->(t)
+WHERE s.id IS NOT NULL AND t.id IS NOT NULL
+RETURN s.id AS source, t.id AS target, type(r) AS relationship
+"""
+
+
+def wants_ndjson(accept, format_param):
+    """
+    True when a request asks for newline-delimited JSON, either with
+    format=ndjson or an Accept header naming application/x-ndjson.
+    """
+    if (format_param or '').lower() == 'ndjson':
+        return True
+    return NDJSON_TYPE in (accept or '')
+
+
+def ndjson_lines(records):
+    """
+    Serializes an iterable of JSON-compatible records one line at a time.
+    """
+    for record in records:
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def iter_graph_export(graph):
+    """
+    Yields every node, then every relationship, of the graph as export
+    records: {'kind': 'node', id, labels, properties} and
+    {'kind': 'link', source, target, relationship}.
+    """
+    # Streamed through the driver with no timeout: an export of a large
+    # graph is allowed to take as long as the client takes to read it
+    for record in graph.stream(EXPORT_NODES_QUERY, timeout=0):
+        yield {'kind': 'node', 'id': record['id'], 'labels': list(record['labels']), 'properties': dict(record['properties'])}
+    for record in graph.stream(EXPORT_LINKS_QUERY, timeout=0):
+        yield {'kind': 'link', 'source': record['source'], 'target': record['target'], 'relationship': record['relationship']}
@@ -0,0 +1,188 @@
+import heapq
+import logging
+import re
+import threading
+from bisect import bisect_left, insort
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 1000
+
+# Nodes worth suggesting: everything with a name except STIX relationship objects
+LOAD_QUERY = """
+MATCH (n)
+WHERE n.name IS NOT NULL AND NOT n:Relationship AND NOT coalesce(n.removed, false)
+RETURN n.id AS id, n.name AS name, n.external_id AS external_id, labels(n) AS labels
+"""
+
+TOKEN = re.compile(r'[\w.]+')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower()) if text else []
+
+
+class TypeaheadIndex:
+    """
+    In-memory prefix index over node names and ATT&CK external ids for
+    search suggestions. Every word of a name, and the external id, is kept
+    in one sorted token list, so the nodes matching a prefix are a bisected
+    range of it. Each API process holds its own copy: it is filled at
+    startup, updated by the writes that process makes, and reloaded when
+    the graph version moves past what it has applied (a load, or another
+    process).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.entries = {}   # node id -> (name, external_id, labels)
+        self.tokens = []    # sorted (token, node id)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, graph, version=None):
+        """
+        Replaces the index contents with every suggestible node in the graph.
+        """
+        self._fill(graph.run(LOAD_QUERY), version)
+
+    async def load_async(self, async_graph, version=None):
+        """
+        load() through an AsyncGraphGateway.
+        """
+        self._fill(await async_graph.run(LOAD_QUERY), version)
+
+    def _fill(self, records, version):
+        entries = {}
+        tokens = []
+        for record in records:
+            entries[record['id']] = (record['name'], record['external_id'] or '', tuple(record['labels']))
+            tokens.extend((token, record['id']) for token in self._tokens_for(record['name'], record['external_id']))
+        tokens.sort()
+        with self.lock:
+            self.entries = entries
+            self.tokens = tokens
+            self.version = version
+        logger.info(f"Typeahead index loaded: {len(entries)} nodes, {len(tokens)} tokens")
+
+    def stale(self, version):
+        return self.version is None or self.version != version
+
+    def refresh(self, graph, version):
+        """
+        Reloads the index unless it already reflects graph version.
+        """
+        if self.stale(version):
+            self.load(graph, version)
+
+    async def refresh_async(self, async_graph, version):
+        if self.stale(version):
+            await self.load_async(async_graph, version)
+
+    def _advance(self, version):
+        # Same rule as CoverageMatrix: only a one-step move is this
+        # process's own write; anything else forces a reload.
+        if version is None:
+            return
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+        else:
+            self.version = None
+
+    @staticmethod
+    def _tokens_for(name, external_id):
+        tokens = set(tokenize(name))
+        if external_id:
+            tokens.add(external_id.lower())
+        return tokens
+
+    def add(self, node_id, name, external_id=None, labels=(), version=None):
+        """
+        Adds or replaces one node, e.g. after create_threat_scenario.
+        """
+        with self.lock:
+            if node_id in self.entries:
+                self._remove(node_id)
+            self.entries[node_id] = (name or '', external_id or '', tuple(labels))
+            for token in self._tokens_for(name, external_id):
+                insort(self.tokens, (token, node_id))
+            self._advance(version)
+
+    def add_relationship(self, source_id, relationship_type, target_id, version=None):
+        """
+        Relationships do not change suggestions; only moves the applied
+        version along with the write.
+        """
+        with self.lock:
+            self._advance(version)
+
+    def remove(self, node_id):
+        with self.lock:
+            if node_id in self.entries:
+                self._remove(node_id)
+
+    def _remove(self, node_id):
+        name, external_id, _labels = self.entries.pop(node_id)
+        for token in self._tokens_for(name, external_id):
+            position = bisect_left(self.tokens, (token, node_id))
+            if position < len(self.tokens) and self.tokens[position] == (token, node_id):
+                del self.tokens[position]
+
+    def _prefix_matches(self, prefix):
+        """
+        Returns the ids of nodes with a token starting with prefix.
+        """
+        matches = set()
+        position = bisect_left(self.tokens, (prefix,))
+        while position < len(self.tokens) and self.tokens[position][0].startswith(prefix):
+            matches.add(self.tokens[position][1])
+            position += 1
+        return matches
+
+    def suggest(self, query, types=None, limit=DEFAULT_LIMIT):
+        """
+        Returns up to limit nodes whose name words (or external id) start
+        with every word of query, best first: exact external id, exact
+        name, name prefix, then word prefix; shorter names first within each.
+        An empty query returns every node, ignoring limit, in alphabetical
+        order, so pickers get the complete list. types restricts the labels.
+        """
+        words = tokenize(query)
+        types = set(types or [])
+        with self.lock:
+            if words:
+                # Drive from the most selective word, then check the others
+                candidate_sets = sorted((self._prefix_matches(word) for word in words), key=len)
+                candidates = set.intersection(*candidate_sets)
+            else:
+                candidates = self.entries.keys()
+            entries = [(node_id, self.entries[node_id]) for node_id in candidates]
+
+        query_lower = query.strip().lower()
+
+        def rank(item):
+            node_id, (name, external_id, _labels) = item
+            name_lower = name.lower()
+            if external_id and external_id.lower() == query_lower:
+                tier = 0
+            elif name_lower == query_lower:
+                tier = 1
+            elif name_lower.startswith(query_lower):
+                tier = 2
+            else:
+                tier = 3
+            return (tier, len(name), name_lower, node_id)
+
+        if types:
+            entries = [entry for entry in entries if types.intersection(entry[1][2])]
+        if words:
+            best = heapq.nsmallest(limit, entries, key=rank)
+        else:
+            best = sorted(entries, key=lambda item: (item[1][0].lower(), item[0]))
+        return [
+            {'id': node_id, 'name': name, 'labels': list(labels), 'external_id': external_id}
+            for node_id, (name, external_id, labels) in best
+        ]
@@ -36,8 +36,17 @@ function App() {
   const fetchGraphData = async () => {
     setLoading(true);
     try {
-      const response = await axios.get(`${API_BASE_URL}/threat_scenarios`);
-      const data = transformData(response.data);
+      // Scenarios are paged; follow the cursor header until the last page
+      const scenarios = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(`${API_BASE_URL}/threat_scenarios`, {
+          params: cursor ? { cursor } : {},
+        });
+        scenarios.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      const data = transformData(scenarios);
       setGraphData(data);
       setFilteredData(data);
     } catch (error) {
@@ -66,10 +75,11 @@ function App() {
     return { nodes: uniqueNodes, links };
   };
 
-  const fetchRelatedNodes = async (nodeId) => {
+  // Accepts one node id or an array of them; all are fetched in one request
+  const fetchRelatedNodes = async (nodeIds) => {
     try {
       const response = await axios.get(`${API_BASE_URL}/related_nodes`, {
-        params: { nodeId },
+        params: { nodeId: [].concat(nodeIds).join(',') },
       });
   
       const newNodes = response.data?.nodes || []; // Fallback to empty array if undefined
@@ -140,39 +150,19 @@ function App() {
     return { nodes, links: [] };
   };
 
-  const handleCreateThreat = async (threat) => {
-    try {
-      const response = await axios.post(`${API_BASE_URL}/threat_scenarios`, {
-        name: threat.name,
-        description: threat.description,
-      });
-      const newThreat = response.data;
-
-      setGraphData((prevData) => ({
-        nodes: [...prevData.nodes, { id: newThreat.id, name: newThreat.name, group: 'ThreatScenario' }],
-        links: prevData.links,
-      }));
-
-      if (threat.relatedNodes && threat.relatedNodes.length > 0) {
-        const relationshipPromises = threat.relatedNodes.map((nodeId) =>
-          axios.post(`${API_BASE_URL}/create_relationship`, {
-            sourceId: newThreat.id,
-            targetId: nodeId,
-            relationship: 'USES_TECHNIQUE',
-          })
-        );
-        await Promise.all(relationshipPromises);
-
-        threat.relatedNodes.forEach((nodeId) => {
-          fetchRelatedNodes({ id: newThreat.id });
-        });
-      }
+  // Called with the response of /threat_scenarios/bulk, which has already
+  // created the scenario and its relationships
+  const handleCreateThreat = async (newThreat) => {
+    setGraphData((prevData) => ({
+      nodes: [...prevData.nodes, { id: newThreat.id, name: newThreat.name, group: 'ThreatScenario' }],
+      links: prevData.links,
+    }));
 
-      alert('Threat Scenario created successfully!');
-    } catch (error) {
-      console.error('Error creating threat scenario:', error);
-      alert('Failed to create Threat Scenario.');
+    if (newThreat.created.length > 0) {
+      fetchRelatedNodes(newThreat.id);
     }
+
+    alert('Threat Scenario created successfully!');
   };
 
   const toggleNodeVisibility = (newVisibility) => {
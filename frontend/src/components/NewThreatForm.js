@@ -9,16 +9,17 @@ function NewThreatForm({ onCreate }) {
   const [description, setDescription] = useState('');
   const [relatedNodes, setRelatedNodes] = useState([]);
   const [availableNodes, setAvailableNodes] = useState([]);
+  const [submitting, setSubmitting] = useState(false);
 
   const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:5001/api';
 
   useEffect(() => {
     let isMounted = true; // Flag to track if component is mounted
 
-    // Fetch only Technique nodes to associate with the new threat scenario
+    // Fetch every Technique node, sorted by name, to associate with the new threat scenario
     const fetchAvailableNodes = async () => {
       try {
-        const response = await axios.get(`${API_BASE_URL}/search`, {
+        const response = await axios.get(`${API_BASE_URL}/suggest`, {
           params: { query: '', type: 'Technique' },
         });
         if (isMounted) {
@@ -43,26 +44,27 @@ function NewThreatForm({ onCreate }) {
       alert('Name is required.');
       return;
     }
+    // Ignore a second click while the first request is still in flight
+    if (submitting) {
+      return;
+    }
+    setSubmitting(true);
 
     try {
-      // Create the new threat scenario
-      const response = await axios.post(`${API_BASE_URL}/threat_scenarios`, { name, description });
+      // Create the scenario and its technique relationships in one request
+      const response = await axios.post(`${API_BASE_URL}/threat_scenarios/bulk`, {
+        name,
+        description,
+        targets: relatedNodes,
+        relationship: 'USES_TECHNIQUE',
+      });
       const newThreat = response.data;
-
-      // Create relationships with selected related nodes
-      if (relatedNodes.length > 0) {
-        const relationshipPromises = relatedNodes.map((nodeId) =>
-          axios.post(`${API_BASE_URL}/create_relationship`, {
-            sourceId: newThreat.id,
-            targetId: nodeId,
-            relationship: 'USES_TECHNIQUE', // Adjust relationship type as needed
-          })
-        );
-        await Promise.all(relationshipPromises);
+      if (newThreat.missing.length > 0) {
+        console.warn('Techniques not found:', newThreat.missing.map((m) => m.target));
       }
 
       // Notify the parent component and reset form fields
-      onCreate({ ...newThreat, relatedNodes });
+      onCreate(newThreat);
       setName('');
       setDescription('');
       setRelatedNodes([]);
@@ -70,6 +72,8 @@ function NewThreatForm({ onCreate }) {
     } catch (error) {
       console.error('Error creating threat scenario:', error);
       alert('Failed to create threat scenario.');
+    } finally {
+      setSubmitting(false);
     }
   };
 
@@ -121,7 +125,7 @@ function NewThreatForm({ onCreate }) {
             ))}
           </select>
         </div>
-        <button type="submit">Create Threat Scenario</button>
+        <button type="submit" disabled={submitting}>Create Threat Scenario</button>
       </form>
     </div>
   );
@@ -1,6 +1,40 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
+import axios from 'axios';
 
 function NodeDetails({ node }) {
+  const [details, setDetails] = useState(null);
+
+  const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:5001/api';
+
+  useEffect(() => {
+    let isMounted = true; // Flag to track if component is mounted
+    setDetails(null);
+    if (!node) {
+      return undefined;
+    }
+
+    // Graph data leaves descriptions out; fetch them only for the selected node
+    const fetchDetails = async () => {
+      try {
+        const response = await axios.get(`${API_BASE_URL}/nodes`, {
+          params: { nodeId: node.id },
+        });
+        if (isMounted && response.data.length > 0) {
+          setDetails(response.data[0]);
+        }
+      } catch (error) {
+        console.error('Error fetching node details:', error);
+      }
+    };
+
+    fetchDetails();
+
+    // Cleanup function to set isMounted to false when component unmounts
+    return () => {
+      isMounted = false;
+    };
+  }, [API_BASE_URL, node]);
+
   if (!node) {
     return (
       <div className="node-details">
@@ -14,11 +48,14 @@ function NodeDetails({ node }) {
       <h2>Node Details</h2>
       <p><strong>Name:</strong> {node.name}</p>
       <p><strong>Type:</strong> {node.group}</p>
-      {/* Add more details as needed */}
-      {/* Example: */}
-      {/* <p><strong>Description:</strong> {node.description}</p> */}
+      {details && details.external_id && (
+        <p><strong>ATT&amp;CK ID:</strong> {details.external_id}</p>
+      )}
+      {details && details.description && (
+        <p><strong>Description:</strong> {details.description}</p>
+      )}
     </div>
   );
 }
 
-export default NodeDetails;
\ No newline at end of file
+export default NodeDetails;